@@ -4,14 +4,20 @@ import os
 
 load_dotenv()
 api_key = os.getenv("SearchAPI_KEY")
+geo = "US"
 
 url = "https://www.searchapi.io/api/v1/search"
+
+# The news token comes from the trending-now response (one per trend). The Google pipeline chains this
+# automatically with news=True (Streamlit/google_analyzer.py).
+trending = requests.get(url, params={"engine": "google_trends_trending_now", "geo": geo, "api_key": api_key}, timeout=60).json()
+news_token = next((trend["news_token"] for trend in trending.get("trends", []) if trend.get("news_token")), None)
+
 params = {
   "engine": "google_trends_trending_now_news",
-  "news_token": "W1szNzg1OTAzODk1LCJlbiIsIlVTIl0sWzM4MTg0MzM4NzMsImVuIiwiVVMiXSxbMzc5MTEyNDM2OCwiZW4iLCJVUyJdLFszODE4NzIwNDYwLCJlbiIsIlVTIl0sWzM4MDY4MTQ0OTUsImVuIiwiVVMiXSxbMzgxNzAyNjkxNCwiZW4iLCJVUyJdLFszNzg5ODA4NzA2LCJlbiIsIlVTIl0sWzM4MTQ2OTg3MDcsImVuIiwiVVMiXSxbMzc5ODU4OTQ0NiwiZW4iLCJVUyJdXQ==",  
-  # Replace with your actual news token (will be obtained from by running google trends trending now API)
+  "news_token": news_token,
   "api_key": api_key
 }
 
-response = requests.get(url, params=params)
+response = requests.get(url, params=params, timeout=60)
 print(response.text)
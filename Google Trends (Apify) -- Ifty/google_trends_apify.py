@@ -1,26 +1,35 @@
+import argparse
 import os
 import json
 from apify_client import ApifyClient
 from dotenv import load_dotenv
 
+# Single-run prototype. For hundreds of terms (batched into concurrent multi-term runs and unpacked into
+# a terms x time array), use Streamlit/trend_interest.py.
 def main():
+    parser = argparse.ArgumentParser(description="Run the Google Trends scraper for a few search terms.")
+    parser.add_argument("terms", nargs="*", default=["webscraping"])
+    parser.add_argument("--geo", default="IN")
+    parser.add_argument("--time-range", default="now 1-d")
+    parser.add_argument("--output", default="google_trends_apify.json")
+    args = parser.parse_args()
     load_dotenv()
     apify_api_key = os.getenv("APIFY_KEY")
 
     client = ApifyClient(apify_api_key)
 
     run_input = {
-        "geo": "IN",                    # The geographic region for the search (IN = India).
-        "isMultiple": False,            # Set to true if you are comparing multiple search terms.
+        "geo": args.geo,                # The geographic region for the search (e.g. IN = India).
+        "isMultiple": False,            # False scrapes each term separately, so each keeps its own 0-100 scale.
         "isPublic": False,              # Determines if the run's results are publicly visible on Apify.
-        "searchTerms": ["webscraping"], # The list of keywords to search for on Google Trends.
+        "searchTerms": args.terms,      # The list of keywords to search for on Google Trends.
         "skipDebugScreen": False,       # A developer option to bypass a debugging screen on the scraper.
-        "timeRange": "now 1-d",         # The time frame for the trend data (last 24 hours).
-        "viewedFrom": "in",             # The country code to simulate viewing the results from.
+        "timeRange": args.time_range,   # The time frame for the trend data (e.g. now 1-d = last 24 hours).
+        "viewedFrom": args.geo.lower(), # The country code to simulate viewing the results from.
     }
 
     try:
-        print("Starting the Google Trends scraper...")
+        print(f"Starting the Google Trends scraper for {len(args.terms)} terms...")
         actor_run = client.actor("emastra/google-trends-scraper").call(run_input=run_input)
 
         print("Scraping finished. Fetching results...")
@@ -29,10 +38,9 @@ def main():
         if not dataset_items:
             print("No results found.")
         else:
-            print("\n--- Scraped Data ---")
-            for item in dataset_items:
-                print(json.dumps(item, indent=4))
-            print("--------------------\n")
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(dataset_items, f, ensure_ascii=False, indent=4)
+            print(f"Saved {len(dataset_items)} results to {args.output}")
 
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -1,3 +1,4 @@
+import os
 import requests
 
 # Requirements: 
@@ -9,12 +10,13 @@ import requests
 # Has trends api:  GET /trends/keywords/{region}/top/{trend_type} 
 # here region is the location (e.g. US,CA) and trend_type are keywords like (e.g. growth, mothly, yearly)
 # headers uses bearer token
+# For all regions and trend types concurrently, with token refresh and pagination, use Streamlit/pinterest_trends.py.
 
-bearer_token = '<your_bearer_token_here>'  #this token should be obtained after setting up the app and getting it approved
+bearer_token = os.getenv('PINTEREST_ACCESS_TOKEN')  #this token should be obtained after setting up the app and getting it approved
 
 
 region = 'US'  # Example region
-trend_type = 'growth'  # Example trend type
+trend_type = 'growing'  # Example trend type (growing, monthly, yearly or seasonal)
 
 
 headers = {
@@ -23,8 +25,11 @@ headers = {
     'Accept': 'application/json',
 }
 
-response = requests.get('https://api.pinterest.com/v5/trends/keywords/{region}/top/{trend_type}?region={region}&trend_type={trend_type}', headers=headers)
+response = requests.get(f'https://api.pinterest.com/v5/trends/keywords/{region}/top/{trend_type}', headers=headers, timeout=30)
 if response.status_code == 200:
     data = response.json()
     print(data)
+else:
+    print(f"Error: {response.status_code}")
+    print(response.text)
     
\ No newline at end of file
@@ -2,21 +2,39 @@ import streamlit as st
 import os
 import json
 import asyncio
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Import the modularized analysis pipelines
 from google_analyzer import run_google_analysis_pipeline
 from youtube_analyzer import run_youtube_analysis_pipeline
+from caption_fetcher import proxies_from_env
+from budget import BudgetManager
+from trend_index import TrendIndex
+from history_store import HistoryStore
+from snapshot_store import SnapshotStore
+from tiktok_analyzer import run_tiktok_analysis_pipeline, APAC_REGIONS
+from pipeline_report import RunOptions
 
 # --- Streamlit Page Configuration ---
 st.set_page_config(layout="wide", page_title="Trend Analyzer")
 st.title("Trend Analyzer")
 st.info("Select an analysis type, configure the options in the sidebar, and click 'Start Analysis'.")
 
+# Trends from every run in this session are indexed together to find topics trending on several platforms
+if 'trend_index' not in st.session_state:
+    st.session_state['trend_index'] = TrendIndex()
+# Finished reports are indexed for the search panel at the bottom of the page
+if 'history' not in st.session_state:
+    st.session_state['history'] = HistoryStore()
+# Trending lists are kept as snapshots so topics rising fast across runs can be flagged and analyzed first
+if 'snapshots' not in st.session_state:
+    st.session_state['snapshots'] = SnapshotStore()
+
 # --- Sidebar for Configuration ---
 with st.sidebar:
     st.header("⚙️ Configuration")
-    analysis_type = st.selectbox("1. Select Analysis Type", ["Google Trends", "YouTube Trends"])
+    analysis_type = st.selectbox("1. Select Analysis Type", ["Google Trends", "YouTube Trends", "TikTok Trends"])
     
     st.divider()
 
@@ -24,10 +42,23 @@ with st.sidebar:
         st.subheader("Google Trends Settings")
         geo_param = st.text_input("Geographic Location (geo)", value="NZ", help="Country code, e.g., US, UK, NZ, BD")
         time_frame_param = st.selectbox("Time Frame", ["past_4_hours", "past_12_hours", "past_24_hours", "past_7_days"], index=2)
+        news_param = st.checkbox("Use Google Trends news headlines", value=False,
+                                 help="Analyze trends from their news headlines when there are enough, and search with Firecrawl only for the rest.")
+    elif analysis_type == "TikTok Trends":
+        st.subheader("TikTok Trends Settings")
+        geo_param = st.text_input("Region Codes", value="NZ", help="Comma-separated country codes, e.g., NZ, AU, JP, or APAC for all Asia-Pacific regions. Regions are fetched concurrently.")
+        limit_param = st.number_input("Number of Videos per Region", min_value=1, max_value=500, value=10)
     else: # YouTube Trends
         st.subheader("YouTube Trends Settings")
         geo_param = st.text_input("Country Code (gl)", value="NZ", help="Country code for YouTube trends, e.g., US, UK, NZ, BD")
         hl_param = st.text_input("Language Code (hl)", value="en", help="Language for the YouTube trends, e.g., en, es, fr")
+        analysis_mode_param = st.selectbox("Analysis Mode", ["two_hop", "fused"], index=0,
+                                           help="two_hop: transcript then OpenAI analysis. fused: Gemini analyzes the video in a single call.")
+
+    deadline_param = st.number_input("Deadline (seconds, 0 = none)", min_value=0, value=0, step=30,
+                                     help="Stop at this time bound and return the highest-priority trends finished so far.")
+    budget_param = st.checkbox("Enforce token/cost budget", value=True,
+                               help="Degrade to shorter content, then title-only analysis, then skip items as the per-run and daily budget runs out.")
 
     start_button = st.button("Start Analysis", type="primary", use_container_width=True)
 
@@ -39,39 +70,69 @@ if start_button:
     firecrawl_api_key = os.getenv("FIRECRAWL_API_KEY")
     openai_api_key = os.getenv("OPENAI_API_KEY")
     gemini_api_key = os.getenv("GEMINI_API_KEY")
+    apify_api_key = os.getenv("APIFY_KEY")
+    # The analysis router runs on whichever of OpenAI, Gemini and a local OpenAI-compatible server is configured
+    analysis_backend_key = any([openai_api_key, gemini_api_key, os.getenv("LOCAL_LLM_BASE_URL")])
 
     st.session_state['analysis_type'] = analysis_type
     
     with st.spinner(f"Analyzing {analysis_type}... Please check your terminal for detailed logs."):
         report_data = None
+        run_options = RunOptions(
+            deadline_seconds=deadline_param or None,
+            budget=BudgetManager() if budget_param else None,
+            trend_index=st.session_state['trend_index'],
+            history=st.session_state['history'],
+            snapshots=st.session_state['snapshots']
+        )
         if analysis_type == "Google Trends":
-            if not all([searchapi_key, firecrawl_api_key, openai_api_key]):
-                st.error("Error: API keys for SearchAPI, Firecrawl, and OpenAI not found in .env file.")
+            if not all([searchapi_key, firecrawl_api_key, analysis_backend_key]):
+                st.error("Error: API keys for SearchAPI and Firecrawl, and at least one analysis backend key "
+                         "(OPENAI_API_KEY, GEMINI_API_KEY or LOCAL_LLM_BASE_URL), are required in the .env file.")
             else:
                 report_data = asyncio.run(run_google_analysis_pipeline(
                     searchapi_key=searchapi_key, 
                     firecrawl_api_key=firecrawl_api_key, 
                     openai_api_key=openai_api_key,
                     geo=geo_param, 
-                    time=time_frame_param
+                    time=time_frame_param,
+                    gemini_api_key=gemini_api_key,
+                    news=news_param,
+                    options=run_options
+                ))
+        elif analysis_type == "TikTok Trends":
+            if not all([apify_api_key, openai_api_key]):
+                st.error("Error: API keys for Apify and OpenAI not found in .env file.")
+            else:
+                report_data = asyncio.run(run_tiktok_analysis_pipeline(
+                    apify_api_key=apify_api_key,
+                    openai_api_key=openai_api_key,
+                    gemini_api_key=gemini_api_key,
+                    regions=APAC_REGIONS if geo_param.strip().upper() == "APAC" else [code.strip().upper() for code in geo_param.split(",") if code.strip()],
+                    limit=limit_param,
+                    options=run_options
                 ))
         else: # YouTube Trends
-            if not all([searchapi_key, openai_api_key, gemini_api_key]):
-                st.error("Error: API keys for SearchAPI, OpenAI, and Gemini not found in .env file.")
+            # Gemini transcribes (two_hop) or analyzes (fused) the videos, so it also covers the analysis backend
+            if not all([searchapi_key, gemini_api_key]):
+                st.error("Error: API keys for SearchAPI and Gemini not found in .env file.")
             else:
                 report_data = asyncio.run(run_youtube_analysis_pipeline(
                     searchapi_key=searchapi_key,
                     openai_api_key=openai_api_key,
                     gemini_api_key=gemini_api_key,
                     gl=geo_param,
-                    hl=hl_param
+                    hl=hl_param,
+                    analysis_mode=analysis_mode_param,
+                    caption_proxies=proxies_from_env(os.getenv("YOUTUBE_PROXIES")),
+                    options=run_options
                 ))
 
-    if report_data:
+    if report_data and report_data.get("final_report"):
         st.success(f"✔️ Analysis complete! Displaying results below.")
         st.session_state['report_data'] = report_data
     else:
-        st.error("Analysis did not complete successfully or returned no data.")
+        st.error(f"Analysis did not complete successfully or returned no data. {(report_data or {}).get('error', '')}".strip())
 
 # --- Report Display ---
 if 'report_data' in st.session_state:
@@ -88,9 +149,28 @@ if 'report_data' in st.session_state:
         mime="application/json"
     )
 
+    cross_platform = st.session_state['report_data'].get("cross_platform")
+    if cross_platform:
+        with st.expander(f"🌐 Topics trending on several platforms ({len(cross_platform)})"):
+            for entry in cross_platform:
+                st.markdown(f"**{entry['topic']}** — {', '.join(entry['platforms'])} (score {entry['score']})")
+
+    rising = st.session_state['report_data'].get("rising")
+    if rising:
+        with st.expander(f"📈 Rising fast since recent runs ({len(rising)})"):
+            for entry in rising:
+                movement = "new on the list" if entry["is_new"] else f"rank change {entry['rank_delta']:+d}" if entry["rank_delta"] is not None else "back on the list"
+                st.markdown(f"**{entry.get('title') or entry['topic']}** — rank {entry['rank'] + 1}, {movement}, z-score {entry['z']}")
+
+    if st.session_state['report_data'].get("partial"):
+        st.warning("⏰ Partial report: the deadline was reached before every trend was processed. Lower-priority trends are missing.")
+    failed_count = (st.session_state['report_data'].get("schedule") or {}).get("failed")
+    if failed_count:
+        st.warning(f"⚠️ {failed_count} items failed and are listed as errors in the report.")
+
     # --- Display Logic for GOOGLE TRENDS ---
     if st.session_state.get('analysis_type') == "Google Trends":
-        report_items = st.session_state['report_data']
+        report_items = st.session_state['report_data'].get("final_report", [])
         for item in report_items:
             analysis = item.get("llm_analysis", {})
             if analysis and analysis.get("context") != "Error during analysis.":
@@ -107,9 +187,11 @@ if 'report_data' in st.session_state:
                         st.markdown(item.get("scraped_content", "No scraped data available."))
                     with st.expander("View Original Trend Query"):
                         st.code(item.get("trend_query", "No query found."))
+            elif item.get("error"):
+                st.error(f"❌ {item.get('trend_query', 'Unknown trend')}: {item['error']}")
 
-    # --- Display Logic for YOUTUBE TRENDS ---
-    elif st.session_state.get('analysis_type') == "YouTube Trends":
+    # --- Display Logic for YOUTUBE and TIKTOK TRENDS ---
+    elif st.session_state.get('analysis_type') in ("YouTube Trends", "TikTok Trends"):
         report_items = st.session_state['report_data'].get("final_report", [])
         for item in report_items:
             analysis = item.get("llm_analysis", {})
@@ -126,4 +208,28 @@ if 'report_data' in st.session_state:
                 else:
                     st.markdown("- No summary points were generated.")
                 with st.expander("View Video URL"):
-                    st.markdown(item.get("video_url", "No URL available."))
\ No newline at end of file
+                    st.markdown(item.get("video_url", "No URL available."))
+
+# --- Search Past Analyses ---
+st.divider()
+st.header("🔎 Search Past Analyses")
+search_col, source_col = st.columns([4, 1])
+search_text = search_col.text_input("Topic or keywords", placeholder="e.g. air india crash")
+search_source = source_col.selectbox("Source", ["All", "google", "youtube", "tiktok"])
+if search_text:
+    history = st.session_state['history']
+    topic = history.topic_history(search_text)
+    if topic["matches"]:
+        last_seen = datetime.fromtimestamp(topic["last_seen"]).strftime("%Y-%m-%d %H:%M")
+        first_seen = datetime.fromtimestamp(topic["first_seen"]).strftime("%Y-%m-%d %H:%M")
+        st.caption(f"{topic['matches']} matching items. Last trended {last_seen}, first seen {first_seen}.")
+    results = history.search(search_text, None if search_source == "All" else search_source)
+    if not results:
+        st.info("No past analyses match this search.")
+    for result in results:
+        with st.container(border=True):
+            seen = datetime.fromtimestamp(result["created_at"]).strftime("%Y-%m-%d %H:%M")
+            st.markdown(f"**{result['title']}** · {result['source']} · {seen}")
+            st.markdown(result["context"] or "No analysis available.")
+            st.caption(f"Category: {result['category'] or 'N/A'}")
+            st.markdown(f"…{result['snippet']}…")
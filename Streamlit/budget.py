@@ -0,0 +1,195 @@
+import argparse
+import datetime
+import json
+import math
+import os
+from llm_backends import ROUTES, MODEL_TIERS, select_route, estimate_cost
+
+# Per-run and per-day spend limits. Usage is recorded from provider responses where they report it
+# (analysis calls); Gemini video transcription and OpenAI audio transcription are charged by estimate from
+# the media length.
+RUN_LIMITS = {"tokens": 500_000, "cost_usd": 1.00, "calls": 600}
+DAILY_LIMITS = {"tokens": 5_000_000, "cost_usd": 10.00, "calls": 6000}
+LEDGER_PATH = os.getenv("BUDGET_LEDGER", "budget_ledger.json")
+CHARS_PER_TOKEN = 4
+PROMPT_OVERHEAD_TOKENS = 150
+VIDEO_TOKENS_PER_SECOND = 263 # Gemini's default video sampling rate
+REDUCED_CONTENT_CHARS = 4000
+AUDIO_PRICES_PER_MINUTE = {"gpt-4o-mini-transcribe": 0.003, "gpt-4o-transcribe": 0.006, "whisper-1": 0.006}
+TYPICAL_AUDIO_SECONDS = 60 # Assumed length of a short-form video whose duration is not known yet
+# Degradation steps by the smallest remaining share of any limit: full content, a shorter content budget,
+# title-only analysis, then skipping the item.
+DEGRADE_STEPS = [(0.5, "full"), (0.25, "reduced"), (0.1, "title_only")]
+STEP_ORDER = ["full", "reduced", "title_only", "skip"]
+
+def empty_usage() -> dict:
+    return {"tokens": 0, "cost_usd": 0.0, "calls": 0}
+
+def estimate_tokens(chars: int) -> int:
+    return math.ceil(chars / CHARS_PER_TOKEN)
+
+def estimate_analysis(item_kind: str, content_chars: int) -> dict:
+    """
+    Pre-dispatch estimate for one analysis call, priced at the OpenAI model of the route it would take.
+    """
+    route = ROUTES[select_route(item_kind, content_chars)]
+    input_tokens = estimate_tokens(content_chars) + PROMPT_OVERHEAD_TOKENS
+    output_tokens = route["max_tokens"]
+    return {"tokens": input_tokens + output_tokens, "calls": 1,
+            "cost_usd": estimate_cost(MODEL_TIERS["openai"][route["tier"]], input_tokens, output_tokens)}
+
+def estimate_video_transcription(duration_seconds: int, output_chars: int = 15000) -> dict:
+    input_tokens = (duration_seconds or 600) * VIDEO_TOKENS_PER_SECOND
+    output_tokens = estimate_tokens(output_chars)
+    return {"tokens": input_tokens + output_tokens, "calls": 1,
+            "cost_usd": estimate_cost(MODEL_TIERS["gemini"]["large"], input_tokens, output_tokens)}
+
+def estimate_audio_transcription(duration_seconds: float, model: str = "gpt-4o-mini-transcribe") -> dict:
+    minutes = (duration_seconds or TYPICAL_AUDIO_SECONDS) / 60
+    return {"tokens": 0, "calls": 1, "cost_usd": minutes * AUDIO_PRICES_PER_MINUTE.get(model, 0.0)}
+
+def load_ledger(path: str) -> dict:
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"days": {}, "runs": []}
+
+class BudgetManager:
+    """
+    Tracks a run's spend against `run_limits` and the day's spend (persisted in the ledger file) against
+    `daily_limits`, and decides how far to degrade each item before it is dispatched.
+    """
+
+    def __init__(self, run_limits: dict = None, daily_limits: dict = None, ledger_path: str = LEDGER_PATH):
+        self.run_limits = {**RUN_LIMITS, **(run_limits or {})}
+        self.daily_limits = {**DAILY_LIMITS, **(daily_limits or {})}
+        self.ledger_path = ledger_path
+        self.ledger = load_ledger(ledger_path)
+        self.today = datetime.date.today().isoformat()
+        self.day_before_run = {**empty_usage(), **self.ledger["days"].get(self.today, {})}
+        self.run = empty_usage()
+        self._saved = empty_usage()
+        self._pending_runs = []
+        self.by_provider = {}
+        self.steps = {step: 0 for step in STEP_ORDER}
+
+    def _totals(self) -> list:
+        day = {key: self.day_before_run[key] + self.run[key] for key in self.run}
+        return [(self.run, self.run_limits), (day, self.daily_limits)]
+
+    def remaining_share(self) -> float:
+        return min(max(0.0, (limits[key] - spent[key]) / limits[key]) for spent, limits in self._totals() for key in limits)
+
+    def can_afford(self, estimate: dict) -> bool:
+        return all(spent[key] + estimate.get(key, 0) <= limits[key] for spent, limits in self._totals() for key in limits)
+
+    def allow_call(self, provider: str) -> bool:
+        """
+        Gate for calls without token usage (e.g. Firecrawl searches); counts the call if allowed.
+        """
+        if not self.can_afford({"calls": 1}):
+            self.steps["skip"] += 1
+            return False
+        self.record(provider)
+        return True
+
+    def plan_analysis(self, item_kind: str, content_chars: int) -> tuple:
+        """
+        Returns (step, content_chars_to_send) for the next analysis: the first step at or below the one the
+        remaining budget share allows whose estimated cost still fits.
+        """
+        share = self.remaining_share()
+        step = next((name for threshold, name in DEGRADE_STEPS if share > threshold), "skip")
+        if item_kind == "title_only" and step in ("full", "reduced"):
+            step = "title_only"
+        for candidate in STEP_ORDER[STEP_ORDER.index(step):]:
+            chars = {"full": content_chars, "reduced": min(content_chars, REDUCED_CONTENT_CHARS), "title_only": 0}.get(candidate)
+            if candidate == "skip" or self.can_afford(estimate_analysis("title_only" if candidate == "title_only" else item_kind, chars)):
+                self.steps[candidate] += 1
+                return candidate, chars
+        return "skip", 0
+
+    def record(self, provider: str, input_tokens: int = 0, output_tokens: int = 0, cost_usd: float = 0.0, calls: int = 1):
+        usage = self.by_provider.setdefault(provider, empty_usage())
+        for totals in (self.run, usage):
+            totals["tokens"] += input_tokens + output_tokens
+            totals["cost_usd"] += cost_usd
+            totals["calls"] += calls
+
+    def record_run(self, source: str, config: dict, items: int, content_chars: int, wall_seconds: float):
+        """
+        Stores the run's size and spend so the dry-run estimator can calibrate from history.
+        """
+        self._pending_runs.append({"date": self.today, "source": source, "config": config, "items": items,
+                                   "content_chars": content_chars, "wall_seconds": round(wall_seconds, 1), **self.run})
+
+    def save(self):
+        """
+        Adds this run's spend since the last save to the ledger on disk, re-reading it first so that
+        concurrent runs (e.g. jobs of the HTTP service) do not overwrite each other's totals.
+        """
+        self.ledger = load_ledger(self.ledger_path)
+        day = {**empty_usage(), **self.ledger["days"].get(self.today, {})}
+        self.ledger["days"][self.today] = {key: day[key] + self.run[key] - self._saved[key] for key in self.run}
+        self.ledger["runs"] = (self.ledger["runs"] + self._pending_runs)[-200:]
+        self._saved = dict(self.run)
+        self._pending_runs = []
+        if self.ledger_path:
+            with open(self.ledger_path, "w", encoding="utf-8") as f:
+                json.dump(self.ledger, f, indent=4)
+
+    def report(self) -> dict:
+        return {"run": {**self.run, "cost_usd": round(self.run["cost_usd"], 5)}, "run_limits": self.run_limits,
+                "remaining_share": round(self.remaining_share(), 3), "degradation_steps": self.steps,
+                "providers": {name: {**usage, "cost_usd": round(usage["cost_usd"], 5)} for name, usage in self.by_provider.items()}}
+
+# Defaults for the dry-run estimate when the ledger has no comparable run yet.
+TYPICAL_TRENDS = {"past_4_hours": 15, "past_12_hours": 25, "past_24_hours": 40, "past_7_days": 60}
+TYPICAL_CONTENT_CHARS = {"google": 12000, "youtube": 15000, "tiktok": 1000}
+TYPICAL_SECONDS = {"google": 45.0, "youtube": 90.0, "tiktok": 60.0}
+
+def dry_run_estimate(source: str, geo: str = "NZ", time: str = "past_24_hours", video_limit: int = 10,
+                     ledger_path: str = LEDGER_PATH) -> dict:
+    """
+    Predicts tokens, cost, calls and wall time for a configuration without calling any provider. Uses the
+    average of past runs of the same source and configuration from the ledger, else typical sizes.
+    """
+    config = {"geo": geo, "time": time} if source == "google" else {"geo": geo, "video_limit": video_limit}
+    history = [run for run in load_ledger(ledger_path)["runs"] if run["source"] == source and run["config"] == config]
+    if history:
+        averages = {key: sum(run[key] for run in history) / len(history)
+                    for key in ["items", "content_chars", "wall_seconds", "tokens", "cost_usd", "calls"]}
+        return {"source": source, "config": config, "based_on_runs": len(history),
+                "items": round(averages["items"]), "tokens": round(averages["tokens"]), "calls": round(averages["calls"]),
+                "cost_usd": round(averages["cost_usd"], 4), "wall_seconds": round(averages["wall_seconds"], 1)}
+
+    if source == "google":
+        items = TYPICAL_TRENDS.get(time, 40)
+    else:
+        items = video_limit * (len(geo.split(",")) if source == "tiktok" else 1) # TikTok's limit is per region
+    content_chars = TYPICAL_CONTENT_CHARS[source]
+    per_item = estimate_analysis("scraped" if source == "google" else "transcript", content_chars)
+    # Google: one search per trend. YouTube: assume a third of the videos need Gemini transcription.
+    # TikTok: every video's audio is transcribed.
+    if source == "google":
+        extra = {"tokens": 0, "cost_usd": 0.0, "calls": items}
+    elif source == "tiktok":
+        extra = {key: value * items for key, value in estimate_audio_transcription(TYPICAL_AUDIO_SECONDS).items()}
+    else:
+        extra = {key: value * math.ceil(items / 3) for key, value in estimate_video_transcription(600, content_chars).items()}
+    return {"source": source, "config": config, "based_on_runs": 0, "items": items,
+            "tokens": per_item["tokens"] * items + extra["tokens"], "calls": per_item["calls"] * items + extra["calls"],
+            "cost_usd": round(per_item["cost_usd"] * items + extra["cost_usd"], 4),
+            "wall_seconds": TYPICAL_SECONDS[source]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dry-run estimate of a sweep's token use, cost and wall time.")
+    parser.add_argument("source", choices=["google", "youtube", "tiktok"])
+    parser.add_argument("--geo", default="NZ", help="Region code; for TikTok, the comma-separated regions of the run.")
+    parser.add_argument("--time", default="past_24_hours")
+    parser.add_argument("--video-limit", type=int, default=10)
+    args = parser.parse_args()
+    estimate = dry_run_estimate(args.source, args.geo, args.time, args.video_limit)
+    print(json.dumps(estimate, indent=4))
+    within = BudgetManager().can_afford(estimate)
+    print(f"{'✅' if within else '⚠️'} Estimate is {'within' if within else 'over'} the per-run and remaining daily budget.")
@@ -0,0 +1,135 @@
+import re
+import zlib
+import numpy as np
+from cpu_pool import get_cpu_executor
+
+# Extractive pre-compression: keeps the most informative sentences of long content, spread over the whole
+# document, so the prompt shrinks without dropping everything past the first N characters.
+COMPRESS_TARGET_CHARS = 6000
+HASH_DIM = 2 ** 12
+COVERAGE_BUCKETS = 10
+REDUNDANCY_THRESHOLD = 0.8
+MAX_SENTENCE_WORDS = 40 # Unpunctuated caption text is cut into windows of this many words
+TEXTRANK_MAX_SENTENCES = 1500 # Above this the n x n similarity matrix gets expensive; centroid scoring only
+_TOKEN = re.compile(r"[a-z0-9']+")
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def clean_markdown(text: str) -> str:
+    """
+    Strips images, link targets, bare URLs and markdown markup that carry no meaning for the analysis.
+    """
+    text = re.sub(r"!\[[^\]]*\]\([^)]*\)", " ", text)
+    text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"https?://\S+", " ", text)
+    text = re.sub(r"^[#>*\-\s|]+", "", text, flags=re.MULTILINE)
+    text = re.sub(r"[ \t]+", " ", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def split_sentences(text: str) -> list:
+    sentences = []
+    for sentence in _SENTENCE_BOUNDARY.split(text):
+        words = sentence.split()
+        for start in range(0, len(words), MAX_SENTENCE_WORDS):
+            window = " ".join(words[start:start + MAX_SENTENCE_WORDS])
+            if len(window) > 20:
+                sentences.append(window)
+    return sentences
+
+def hashed_term_vectors(sentences: list, dim: int = HASH_DIM) -> np.ndarray:
+    """
+    TF-IDF sentence vectors over hashed terms (crc32, so the hashing is stable across worker processes), L2-normalized.
+    """
+    rows, cols, counts = [], [], []
+    for i, sentence in enumerate(sentences):
+        for token in _TOKEN.findall(sentence.lower()):
+            rows.append(i)
+            cols.append(zlib.crc32(token.encode()) % dim)
+            counts.append(1.0)
+    matrix = np.zeros((len(sentences), dim), dtype=np.float32)
+    np.add.at(matrix, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), np.array(counts, dtype=np.float32))
+    matrix = np.log1p(matrix)
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)).astype(np.float32) + 1.0
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-8)
+
+def _textrank(vectors: np.ndarray, damping: float = 0.85, iterations: int = 30) -> np.ndarray:
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    np.clip(similarity, 0.0, None, out=similarity)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, row_sums, out=np.zeros_like(similarity), where=row_sums > 0)
+    n = len(vectors)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        scores = (1 - damping) / n + damping * (transition.T @ scores)
+    return scores
+
+def _rescale(values: np.ndarray) -> np.ndarray:
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+
+def score_sentences(vectors: np.ndarray) -> np.ndarray:
+    """
+    Centroid similarity, blended with TextRank centrality when the document is small enough.
+    """
+    centroid = vectors.mean(axis=0)
+    centroid /= max(np.linalg.norm(centroid), 1e-8)
+    scores = _rescale(vectors @ centroid)
+    if len(vectors) <= TEXTRANK_MAX_SENTENCES:
+        scores = 0.5 * scores + 0.5 * _rescale(_textrank(vectors))
+    return scores
+
+def compress_text(text: str, target_chars: int = COMPRESS_TARGET_CHARS) -> str:
+    """
+    Selects high-scoring, non-redundant sentences up to `target_chars`, first taking the best sentence of
+    each positional bucket so that the later parts of the document are represented, then returns them in
+    document order.
+    """
+    if len(text) <= target_chars:
+        return text
+    sentences = split_sentences(text)
+    if len(sentences) < 2:
+        return text[:target_chars]
+    vectors = hashed_term_vectors(sentences)
+    scores = score_sentences(vectors)
+
+    buckets = np.minimum((np.arange(len(sentences)) * COVERAGE_BUCKETS) // len(sentences), COVERAGE_BUCKETS - 1)
+    bucket_leaders = [int(np.flatnonzero(buckets == b)[np.argmax(scores[buckets == b])]) for b in np.unique(buckets)]
+    ranked = [int(i) for i in np.argsort(-scores)]
+
+    selected = []
+    used = 0
+    for index in bucket_leaders + ranked:
+        if index in selected:
+            continue
+        length = len(sentences[index]) + 1
+        if used + length > target_chars:
+            continue
+        if selected and float(np.max(vectors[selected] @ vectors[index])) > REDUNDANCY_THRESHOLD:
+            continue
+        selected.append(index)
+        used += length
+    return " ".join(sentences[i] for i in sorted(selected))
+
+def compress_for_prompt(text: str, target_chars: int = COMPRESS_TARGET_CHARS, is_markdown: bool = False) -> tuple:
+    """
+    Returns (compressed_text, compression_ratio) where the ratio is compressed length over original length.
+    """
+    cleaned = clean_markdown(text) if is_markdown else text
+    compressed = compress_text(cleaned, target_chars)
+    return compressed, (len(compressed) / len(text)) if text else 1.0
+
+async def compress_many(texts: list, target_chars: int = COMPRESS_TARGET_CHARS, is_markdown: bool = False) -> list:
+    """
+    Compresses texts on the CPU executor in chunked batches, keeping the event loop free. Returns (text, ratio) pairs.
+    """
+    return await get_cpu_executor().map(compress_for_prompt, [(text, target_chars, is_markdown) for text in texts], chunk_size=2)
+
+def print_compression_summary(results: list, original_lengths: list):
+    original = sum(original_lengths)
+    compressed = sum(len(text) for text, _ in results)
+    ratio = compressed / original if original else 1.0
+    print(f"🗜️ Compressed {len(results)} items: {original} → {compressed} characters (ratio {ratio:.2f})")
+    return round(ratio, 3)
@@ -0,0 +1,132 @@
+import asyncio
+import functools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Text-heavy transforms (markdown cleaning, caption parsing, compression, report encoding) run here instead of
+# on the event-loop thread, so they cannot delay in-flight network calls.
+DEFAULT_CHUNK_SIZE = 8
+
+_default_executor = None
+
+def _apply_chunk(func, chunk: list) -> list:
+    # Runs in the worker: one round trip per chunk instead of per item.
+    return [func(*args) for args in chunk]
+
+class CpuExecutor:
+    """
+    Pluggable executor for CPU-bound work. `kind` is "process" (default), "thread" (for functions that cannot
+    be pickled, or to debug), or "inline" (runs on the calling thread; for tests and tiny inputs).
+    """
+
+    def __init__(self, kind: str = "process", max_workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.kind = kind
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        if kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        elif kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        elif kind == "inline":
+            self._pool = None
+        else:
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+    async def run(self, func, *args):
+        if self._pool is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+
+    async def map(self, func, arg_tuples: list, chunk_size: int = None) -> list:
+        """
+        Applies `func(*args)` to every tuple in `arg_tuples`, batched into chunks, and returns results in order.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        chunks = [arg_tuples[i:i + chunk_size] for i in range(0, len(arg_tuples), chunk_size)]
+        chunk_results = await asyncio.gather(*[self.run(_apply_chunk, func, chunk) for chunk in chunks])
+        return [result for chunk in chunk_results for result in chunk]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+def get_cpu_executor() -> CpuExecutor:
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = CpuExecutor(kind=os.getenv("CPU_EXECUTOR_KIND", "process"))
+    return _default_executor
+
+def set_cpu_executor(executor: CpuExecutor):
+    """
+    Replaces the process-wide executor, e.g. with CpuExecutor("inline") in environments without multiprocessing.
+    """
+    global _default_executor
+    if _default_executor is not None and _default_executor is not executor:
+        _default_executor.shutdown()
+    _default_executor = executor
+
+async def dumps_offloaded(data, **kwargs) -> str:
+    """
+    json.dumps on the CPU executor; large reports otherwise block the loop while encoding.
+    """
+    return await get_cpu_executor().run(_dumps, data, kwargs)
+
+def _dumps(data, kwargs: dict) -> str:
+    return json.dumps(data, **kwargs)
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a periodic `asyncio.sleep(interval)` wakes up. A responsive loop
+    stays near zero; blocking work on the loop thread shows up directly as lag.
+
+    Usage:
+        async with LoopLagMonitor() as lag:
+            ...
+        print(lag.report())
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _sample(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._sample())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def report(self) -> dict:
+        if not self.samples:
+            return {"samples": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self.samples)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return {"samples": len(ordered),
+                "mean_ms": round(1000 * sum(ordered) / len(ordered), 2),
+                "p95_ms": round(1000 * p95, 2),
+                "max_ms": round(1000 * ordered[-1], 2)}
+
+def monitor_loop_lag(pipeline):
+    """
+    Decorator for async pipelines: runs them under a LoopLagMonitor and prints the lag report at the end.
+    """
+    @functools.wraps(pipeline)
+    async def wrapper(*args, **kwargs):
+        async with LoopLagMonitor() as lag_monitor:
+            result = await pipeline(*args, **kwargs)
+        print(f"⏱️ Event-loop lag during {pipeline.__name__}: {lag_monitor.report()}")
+        return result
+    return wrapper
@@ -1,9 +1,31 @@
 import asyncio
+import base64
 import json
+import math
 import os
 import requests
 from firecrawl import AsyncFirecrawlApp, ScrapeOptions
-from openai import AsyncOpenAI
+from resilience import call_with_retries, call_with_retries_sync, start_run_budget, CircuitOpenError, HedgePolicy, hedged_call
+from llm_backends import AnalysisRouter, build_analysis_router, error_analysis, skipped_analysis
+from budget import BudgetManager
+from trend_index import TrendIndex, records_from_google_trends
+from snapshot_store import snapshot_items_from_google_trends
+from trend_velocity import trend_momentum, rising_topics, momentum_boost
+from cpu_pool import monitor_loop_lag
+from compression import compress_many, print_compression_summary, COMPRESS_TARGET_CHARS
+from map_reduce import map_reduce_analysis, map_reduce_options, needs_map_reduce, MAP_REDUCE_THRESHOLD, CHUNK_CHARS, MAX_FAN_OUT
+from scheduler import DeadlineScheduler, JobFailed, succeeded, trend_priority
+from pipeline_report import RunOptions, empty_report, finalize_report
+
+HEDGE_FRACTION = 0.1 # At most this share of a run's searches may get a backup request
+# Google Trends news chaining: each trend's news_token (base64 JSON of [article_id, language, geo] entries) is
+# trimmed, several trends' entries are merged into one google_trends_trending_now_news request (articles are matched
+# back to trends by article id), and trends with enough headlines are analyzed from them instead of a Firecrawl
+# search-and-scrape.
+NEWS_ARTICLES_PER_TREND = 8
+NEWS_ARTICLE_ID_FIELDS = ["article_id", "id", "news_id"] # Fields that may carry a token entry's article id
+NEWS_BATCH_TRENDS = 5
+MIN_NEWS_ARTICLES = 3
 
 def fetch_google_trends(api_key: str, geo: str, time: str) -> dict:
     url = "https://www.searchapi.io/api/v1/search"
@@ -14,14 +36,97 @@ def fetch_google_trends(api_key: str, geo: str, time: str) -> dict:
         "api_key": api_key
     }
     print(f"Fetching Google Trends for geo='{geo}' and time='{time}'...")
-    try:
-        response = requests.get(url, params=params)
+    def fetch():
+        response = requests.get(url, params=params, timeout=60)
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.RequestException as e:
+    try:
+        return call_with_retries_sync("searchapi", fetch)
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
         print(f"❌ An error occurred during the API request: {e}")
     return {}
 
+def decode_news_token(token: str) -> list:
+    try:
+        return json.loads(base64.b64decode(token))
+    except (ValueError, TypeError):
+        return []
+
+def encode_news_token(entries: list) -> str:
+    return base64.b64encode(json.dumps(entries, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+def fetch_news_articles(api_key: str, news_token: str) -> list:
+    params = {"engine": "google_trends_trending_now_news", "news_token": news_token, "api_key": api_key}
+    def fetch():
+        response = requests.get("https://www.searchapi.io/api/v1/search", params=params, timeout=60)
+        response.raise_for_status()
+        return response.json()
+    data = call_with_retries_sync("searchapi", fetch)
+    return data.get("news") or data.get("news_results") or []
+
+def news_markdown(articles: list) -> str:
+    sections = []
+    for article in articles:
+        byline = " · ".join(str(part) for part in [article.get("source"), article.get("date")] if part)
+        snippet = article.get("snippet") or article.get("description") or ""
+        sections.append("\n".join(part for part in [f"### {article.get('title', '')}", byline, snippet, article.get("link")] if part))
+    return "\n\n".join(sections)
+
+async def fetch_trend_news(api_key: str, trends: list, articles_per_trend: int = NEWS_ARTICLES_PER_TREND,
+                           batch_size: int = NEWS_BATCH_TRENDS, budget: BudgetManager = None) -> list:
+    """
+    News articles for each trend (aligned with `trends`). The first `articles_per_trend` entries of each
+    trend's news_token are merged `batch_size` trends per request, and each article is matched back to its
+    trends by the article id it carries. The response order is not documented, so a batch with any article
+    lacking a known id falls back to one request per trend. If the first batch lacks ids, batching is
+    turned off for the rest of the run.
+    """
+    entries = [decode_news_token(trend.get("news_token") or "")[:articles_per_trend] for trend in trends]
+    with_news = [i for i, trend_entries in enumerate(entries) if trend_entries]
+    results = [[] for _ in trends]
+
+    async def request(news_entries: list) -> list:
+        if budget and not budget.allow_call("searchapi"):
+            return []
+        try:
+            return await asyncio.to_thread(fetch_news_articles, api_key, encode_news_token(news_entries))
+        except (requests.exceptions.RequestException, CircuitOpenError) as e:
+            print(f"❌ Google Trends news request failed: {e}")
+            return []
+
+    def article_id(article: dict) -> str:
+        value = next((article[field] for field in NEWS_ARTICLE_ID_FIELDS if article.get(field) is not None), None)
+        return None if value is None else str(value)
+
+    async def fetch_one_by_one(batch: list):
+        per_trend = await asyncio.gather(*(request(entries[i]) for i in batch))
+        for i, trend_articles in zip(batch, per_trend):
+            results[i] = trend_articles
+
+    # Returns False when the batch's articles could not be attributed (and were fetched one by one instead).
+    async def fetch_batch(batch: list) -> bool:
+        if len(batch) == 1:
+            await fetch_one_by_one(batch)
+            return True
+        articles = await request([entry for i in batch for entry in entries[i]])
+        by_id = {article_id(article): article for article in articles}
+        if not articles or None in by_id:
+            print(f"↪️ News batch articles carry no article id to match them to trends; requesting its {len(batch)} trends one by one.")
+            await fetch_one_by_one(batch)
+            return False
+        for i in batch:
+            ids = dict.fromkeys(str(entry[0]) for entry in entries[i] if entry)
+            results[i] = [by_id[key] for key in ids if key in by_id]
+        return True
+
+    batches = [with_news[start:start + batch_size] for start in range(0, len(with_news), batch_size)]
+    if batches and not await fetch_batch(batches[0]):
+        batches = [[i] for batch in batches[1:] for i in batch]
+    else:
+        batches = batches[1:]
+    await asyncio.gather(*(fetch_batch(batch) for batch in batches))
+    return results
+
 def generate_trend_queries(trends_data: dict) -> list:
     if "trends" not in trends_data or not trends_data["trends"]:
         print("No trends to process.")
@@ -37,20 +142,71 @@ def generate_trend_queries(trends_data: dict) -> list:
     print(f"✅ Successfully generated {len(all_queries)} queries.")
     return all_queries
 
-async def search_and_scrape_task(app: AsyncFirecrawlApp, semaphore: asyncio.Semaphore, query: str) -> dict:
+def trend_query_priorities(trends_data: dict, trend_index: TrendIndex = None, momentum: dict = None) -> list:
+    """
+    Scheduling priority for each query from `generate_trend_queries`, in the same order. With a `trend_index`,
+    trends also seen on other platforms are boosted; with `momentum` (from `trend_momentum`), so are trends
+    rising fast across recent snapshots.
+    """
+    priorities = []
+    for rank, trend in enumerate(trends_data.get("trends") or []):
+        if trend.get("keywords"):
+            boost = trend_index.priority_boost(f"google:{trend.get('query') or rank}") if trend_index else 1.0
+            boost *= momentum_boost(momentum, (trend.get("query") or "").strip().lower())
+            priorities.append(trend_priority(trend) * boost)
+    return priorities
+
+def first_markdown(results: dict) -> str:
+    """
+    Returns the markdown of the highest-ranked search result that has any, or None.
+    """
+    for rank, item in enumerate((results or {}).get('data') or []):
+        markdown = (item.get('markdown') or "").strip()
+        if markdown:
+            if rank > 0:
+                print(f"↪️ Result 1 had no markdown; using result {rank + 1} instead.")
+            return markdown
+    return None
+
+async def search_and_scrape_task(app: AsyncFirecrawlApp, semaphore: asyncio.Semaphore, query: str, hedge_policy: HedgePolicy = None,
+                                 budget: BudgetManager = None) -> dict:
+    """
+    Searches and scrapes one trend query. With a `hedge_policy`, a slow search gets a backup request and
+    the first one to return usable markdown wins. With a `budget`, the search is skipped once calls run out.
+    """
     actual_query = query.split("=")[1].strip("'")
     async with semaphore:
+        if budget and not budget.allow_call("firecrawl"):
+            print(f"💸 Budget exhausted; not scraping '{actual_query}'")
+            return None
         print(f"🔎 Scraping for: '{actual_query}'")
         try:
             options = ScrapeOptions(formats=['markdown'])
-            results = await app.search(query=actual_query, scrape_options=options)
-            if results and results.get('data') and results['data'][0].get('markdown'):
-                return {"trend_query": actual_query, "scraped_content": results['data'][0]['markdown']}
+            if hedge_policy:
+                results = await hedged_call("firecrawl", hedge_policy, app.search, query=actual_query, scrape_options=options,
+                                            accept=lambda r: bool(first_markdown(r)))
+            else:
+                results = await call_with_retries("firecrawl", app.search, query=actual_query, scrape_options=options)
+            markdown = first_markdown(results)
+            if markdown:
+                return {"trend_query": actual_query, "scraped_content": markdown}
         except Exception as e:
             print(f"❌ Error scraping query '{actual_query}': {e}")
     return None
 
-async def analyze_scraped_content(client: AsyncOpenAI, semaphore: asyncio.Semaphore, trend_data: dict) -> dict:
+def failed_trend_item(trend_query: str, priority: float, error: Exception) -> dict:
+    """
+    Report entry for a trend whose scrape raised, with the error analysis the app shows for failed items.
+    """
+    return {"trend_query": trend_query, "scraped_content": "Scraped content not available.", "llm_analysis": error_analysis(),
+            "priority": round(priority, 3), "error": str(error)}
+
+async def analyze_scraped_content(router: AnalysisRouter, semaphore: asyncio.Semaphore, trend_data: dict, map_reduce: dict = None,
+                                  budget: BudgetManager = None) -> dict:
+    """
+    Analyzes one scraped trend. With a `budget`, the content is shortened, replaced by the trend query alone,
+    or the item is skipped as the budget runs low.
+    """
     async with semaphore:
         print(f"🧠 Analyzing trend: '{trend_data['trend_query']}'")
         function_definition = {
@@ -65,59 +221,147 @@ async def analyze_scraped_content(client: AsyncOpenAI, semaphore: asyncio.Semaph
                 }, "required": ["context", "summary", "category"]
             }
         }
+        content = trend_data.get('analysis_content', trend_data['scraped_content'])
+        step = "full"
+        if budget:
+            step, max_chars = budget.plan_analysis("scraped", len(content) if map_reduce else min(len(content), 15000))
+            if step == "skip":
+                print(f"💸 Budget exhausted; skipping analysis of '{trend_data['trend_query']}'")
+                return skipped_analysis()
+            content = content[:max_chars]
         try:
+            if step == "title_only":
+                print(f"💸 Budget low; analyzing the trend query only for '{trend_data['trend_query']}'")
+                prompt = (f"Content for the trending search '{trend_data['trend_query']}' is not available. "
+                          "Based SOLELY on these search terms, infer the likely topic and provide a one-sentence context summary. "
+                          "Then, generate up to 5 bullet points speculating on the key aspects of the topic. "
+                          "Finally, classify the topic into a single category.")
+                return await router.analyze(prompt, function_definition, "title_only")
+            if step == "full" and needs_map_reduce(content, map_reduce):
+                return await map_reduce_analysis(router, function_definition, f"the trend '{trend_data['trend_query']}'",
+                                                 content, map_reduce)
             prompt = (
                 f"Please analyze the following content about the trend '{trend_data['trend_query']}'. "
                 "Provide a one-sentence, instantly understandable context summary. "
                 "Then, provide a more detailed summary as 5 distinct bullet points. "
                 "Finally, classify the topic into a single category.\n\n"
-                f"Content:\n{trend_data['scraped_content'][:15000]}"
+                f"Content:\n{content[:15000]}"
             )
-            response = await client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                functions=[function_definition],
-                function_call={"name": "format_trend_analysis"},
-            )
-            return json.loads(response.choices[0].message.function_call.arguments)
+            return await router.analyze(prompt, function_definition)
         except Exception as e:
-            print(f"❌ Error analyzing trend '{trend_data['trend_query']}' with OpenAI: {e}")
-            return {"context": "Error during analysis.", "summary": ["Could not generate summary points."], "category": "Error"}
+            print(f"❌ Error analyzing trend '{trend_data['trend_query']}': {e}")
+            return error_analysis()
 
-async def run_google_analysis_pipeline(searchapi_key: str, firecrawl_api_key: str, openai_api_key: str, geo: str, time: str):
-    trends_data = fetch_google_trends(api_key=searchapi_key, geo=geo, time=time)
+@monitor_loop_lag
+async def run_google_analysis_pipeline(searchapi_key: str, firecrawl_api_key: str, openai_api_key: str, geo: str, time: str,
+                                       gemini_api_key: str = None, map_reduce: bool = False,
+                                       map_reduce_threshold: int = MAP_REDUCE_THRESHOLD, chunk_chars: int = CHUNK_CHARS,
+                                       fan_out: int = MAX_FAN_OUT, compress: bool = False,
+                                       compress_target_chars: int = COMPRESS_TARGET_CHARS, hedge: bool = False,
+                                       hedge_fraction: float = HEDGE_FRACTION, news: bool = False,
+                                       news_batch_size: int = NEWS_BATCH_TRENDS, options: RunOptions = None):
+    """
+    Runs the Google Trends pipeline. Analysis is routed across OpenAI, Gemini (when `gemini_api_key` is given)
+    and a local OpenAI-compatible server (LOCAL_LLM_BASE_URL) with health-based failover.
+    With `map_reduce`, content longer than `map_reduce_threshold` is analyzed in full by map-reduce.
+    With `compress`, scraped markdown is extractively compressed to `compress_target_chars` before analysis.
+    With `hedge`, searches slower than the observed p90 get one backup request, for at most `hedge_fraction` of queries.
+    Scraping and analysis start with the highest search volume and increase first.
+    `options` (RunOptions) carries the deadline, budget, trend index, history and snapshot stores and progress
+    callback; the budget covers searches and analyses.
+    With `news`, each trend's Google Trends news headlines (fetched `news_batch_size` trends per request) are
+    the analysis input when there are at least MIN_NEWS_ARTICLES; Firecrawl is searched only for the rest.
+    Returns {"final_report": [...], "partial": bool, "schedule": {...}}; when nothing could be fetched the
+    report is empty and "error" says why.
+    """
+    options = options or RunOptions()
+    budget, trend_index, snapshots, progress = options.budget, options.trend_index, options.snapshots, options.progress
+    scheduler = DeadlineScheduler(options.deadline_seconds)
+    start_run_budget()
+    trends_data = await asyncio.to_thread(fetch_google_trends, api_key=searchapi_key, geo=geo, time=time)
     if not trends_data:
-        print("Could not fetch trends data. Aborting pipeline.")
-        return []
+        return empty_report(scheduler, "Could not fetch trends data.")
 
     all_queries = generate_trend_queries(trends_data)
     if not all_queries:
-        print("No queries were generated. Aborting pipeline.")
-        return []
+        return empty_report(scheduler, "No queries were generated.")
+    progress("queries", {"count": len(all_queries)})
+    if trend_index:
+        trend_index.add(records_from_google_trends(trends_data))
+    momentum = {}
+    if snapshots:
+        region = f"{geo}/{time}"
+        await asyncio.to_thread(snapshots.record, "google", region, snapshot_items_from_google_trends(trends_data))
+        momentum = await asyncio.to_thread(trend_momentum, snapshots, "google", region)
+        print(f"📈 {len(rising_topics(momentum))} of {len(momentum)} trends rising fast.")
 
     app = AsyncFirecrawlApp(api_key=firecrawl_api_key)
     scrape_semaphore = asyncio.Semaphore(15)
-    scrape_tasks = [search_and_scrape_task(app, scrape_semaphore, query) for query in all_queries]
-    scraped_results = await asyncio.gather(*scrape_tasks)
+    priorities = trend_query_priorities(trends_data, trend_index, momentum)
+    news_content = [None] * len(all_queries)
+    if news:
+        query_trends = [trend for trend in trends_data["trends"] if trend.get("keywords")]
+        trend_news = await fetch_trend_news(searchapi_key, query_trends, batch_size=news_batch_size, budget=budget)
+        news_content = [news_markdown(articles) if len(articles) >= MIN_NEWS_ARTICLES else None for articles in trend_news]
+        print(f"📰 Google Trends news covers {sum(1 for content in news_content if content)} of {len(all_queries)} trends; "
+              "Firecrawl is searched for the rest.")
+    to_scrape = [query for query, content in zip(all_queries, news_content) if not content]
+    hedge_policy = HedgePolicy(max_hedges=math.ceil(hedge_fraction * len(to_scrape))) if hedge else None
+    scrape_jobs = [(priority, lambda query=query: search_and_scrape_task(app, scrape_semaphore, query, hedge_policy, budget))
+                   for query, priority, content in zip(all_queries, priorities, news_content) if not content]
+    scraped = iter(await scheduler.run("scrape", scrape_jobs, concurrency=15))
+    scraped_results = [{"trend_query": query.split("=")[1].strip("'"), "scraped_content": content, "content_source": "news"}
+                       if content else next(scraped) for query, content in zip(all_queries, news_content)]
+    failed_items = [] # Trends whose scrape or analysis raised, reported as errors
+    for i, (res, priority) in enumerate(zip(scraped_results, priorities)):
+        if isinstance(res, JobFailed):
+            failed_items.append(failed_trend_item(all_queries[i].split("=")[1].strip("'"), priority, res.error))
+            scraped_results[i] = None
+        elif res:
+            res["priority"] = round(priority, 3)
     scraped_results = [res for res in scraped_results if res] # Filter out None results
+    if hedge_policy:
+        print(f"🪃 Search hedging: {hedge_policy.report()}")
     
-    if not scraped_results:
-        print("Scraping did not yield any results. Aborting analysis.")
-        return []
+    if not scraped_results and not failed_items:
+        return empty_report(scheduler, "Scraping did not yield any results.")
+    progress("scraped", {"count": len(scraped_results), "queries": len(all_queries)})
 
-    client = AsyncOpenAI(api_key=openai_api_key)
+    if compress:
+        originals = [item["scraped_content"] for item in scraped_results]
+        compressed = await compress_many(originals, compress_target_chars, is_markdown=True)
+        for item, (text, ratio) in zip(scraped_results, compressed):
+            item["analysis_content"] = text
+            item["compression_ratio"] = round(ratio, 3)
+        print_compression_summary(compressed, [len(text) for text in originals])
+
+    router = build_analysis_router(openai_api_key=openai_api_key, gemini_api_key=gemini_api_key, budget=budget)
     analysis_semaphore = asyncio.Semaphore(10)
-    analysis_tasks = [analyze_scraped_content(client, analysis_semaphore, item) for item in scraped_results]
-    llm_analyses = await asyncio.gather(*analysis_tasks)
+    mr_options = map_reduce_options(map_reduce_threshold, chunk_chars, fan_out) if map_reduce else None
+    analysis_jobs = [(item["priority"], lambda item=item: analyze_scraped_content(router, analysis_semaphore, item, mr_options, budget))
+                     for item in scraped_results]
+    llm_analyses = await scheduler.run("analysis", analysis_jobs, concurrency=10)
+    progress("analysed", {"count": sum(1 for analysis in llm_analyses if succeeded(analysis))})
     
     final_report = []
     for i, item in enumerate(scraped_results):
+        if llm_analyses[i] is None: # Not analyzed before the deadline
+            continue
         report_item = {
             "trend_query": item["trend_query"], 
             "scraped_content": item.get("scraped_content", "Scraped content not available."), 
-            "llm_analysis": llm_analyses[i]
+            "llm_analysis": error_analysis() if isinstance(llm_analyses[i], JobFailed) else llm_analyses[i],
+            "priority": item["priority"]
         }
+        if isinstance(llm_analyses[i], JobFailed):
+            report_item["error"] = str(llm_analyses[i].error)
+        if "compression_ratio" in item:
+            report_item["compression_ratio"] = item["compression_ratio"]
+        if news:
+            report_item["content_source"] = item.get("content_source", "firecrawl")
         final_report.append(report_item)
-        
-    print(f"✅ Google analysis pipeline complete. Returning {len(final_report)} items.")
-    return final_report
\ No newline at end of file
+    final_report.extend(failed_items)
+
+    return await finalize_report("google", scheduler, options, final_report, {"geo": geo, "time": time}, {"geo": geo, "time": time},
+                                 len(all_queries), [item["scraped_content"] for item in scraped_results], router=router,
+                                 rising=rising_topics(momentum) if snapshots else None)
\ No newline at end of file
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Every finished run's analyses, scraped markdown and transcripts go into one SQLite file with an FTS5 index,
+# so past results can be searched (BM25-ranked) without re-running a pipeline.
+HISTORY_DB_PATH = os.getenv("TREND_HISTORY_DB", "trend_history.db")
+# BM25 column weights: title, analysis (context, summary and category), body (scraped markdown or transcript).
+BM25_WEIGHTS = (10.0, 4.0, 1.0)
+_QUERY_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+
+def fts_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 query that matches all words, quoting each so user input cannot break the syntax.
+    The last word also matches as a prefix.
+    """
+    tokens = _QUERY_TOKEN.findall(text.lower())
+    if not tokens:
+        return ""
+    return " ".join(f'"{token}"' for token in tokens[:-1]) + (" " if len(tokens) > 1 else "") + f'"{tokens[-1]}"*'
+
+def report_rows(source: str, report: dict) -> list:
+    """
+    Flattens a pipeline result into (title, url, context, summary, category, body) rows. A bare list of
+    report items is accepted too, and an empty or missing report gives no rows.
+    """
+    items = report if isinstance(report, list) else (report or {}).get("final_report") or []
+    rows = []
+    for item in items:
+        analysis = item.get("llm_analysis") or {}
+        title = item.get("trend_query") or item.get("title") or ""
+        body = item.get("scraped_content") if source == "google" else item.get("transcript")
+        rows.append((title, item.get("video_url"), analysis.get("context", ""), "\n".join(analysis.get("summary") or []),
+                     analysis.get("category", ""), body or ""))
+    return rows
+
+class HistoryStore:
+    def __init__(self, path: str = HISTORY_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY, source TEXT, params TEXT, created_at REAL
+                )""")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY, run_id INTEGER REFERENCES runs(id), source TEXT, title TEXT, url TEXT,
+                    context TEXT, summary TEXT, category TEXT, created_at REAL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS items_created ON items (created_at)")
+            self._conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+                    title, analysis, body, tokenize = 'unicode61 remove_diacritics 2'
+                )""")
+
+    def ingest(self, source: str, params: dict, report) -> int:
+        """
+        Adds one finished run; returns the number of items indexed.
+        """
+        rows = report_rows(source, report)
+        if not rows:
+            return 0
+        now = time.time()
+        with self._lock, self._conn:
+            run_id = self._conn.execute("INSERT INTO runs (source, params, created_at) VALUES (?, ?, ?)",
+                                        (source, json.dumps(params), now)).lastrowid
+            for title, url, context, summary, category, body in rows:
+                item_id = self._conn.execute(
+                    "INSERT INTO items (run_id, source, title, url, context, summary, category, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, source, title, url, context, summary, category, now)).lastrowid
+                self._conn.execute("INSERT INTO items_fts (rowid, title, analysis, body) VALUES (?, ?, ?, ?)",
+                                   (item_id, title, f"{context}\n{summary}\n{category}", body))
+        print(f"🗄️ Indexed {len(rows)} {source} items into the history store.")
+        return len(rows)
+
+    def search(self, text: str, source: str = None, limit: int = 20, since: float = None) -> list:
+        """
+        BM25-ranked matches for `text`, best first, each with a highlighted snippet.
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        sql = f"""SELECT items.*, bm25(items_fts, {', '.join(map(str, BM25_WEIGHTS))}) AS rank,
+                         snippet(items_fts, -1, '**', '**', '…', 16) AS snippet
+                  FROM items_fts JOIN items ON items.id = items_fts.rowid
+                  WHERE items_fts MATCH ?"""
+        args = [query]
+        if source:
+            sql += " AND items.source = ?"
+            args.append(source)
+        if since:
+            sql += " AND items.created_at >= ?"
+            args.append(since)
+        sql += " ORDER BY rank LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, args).fetchall()]
+
+    def topic_history(self, text: str, limit: int = 10) -> dict:
+        """
+        When did this topic last trend and what did we say: match count, first and last time seen, and the
+        most recent matching analyses.
+        """
+        query = fts_query(text)
+        if not query:
+            return {"matches": 0, "first_seen": None, "last_seen": None, "recent": []}
+        with self._lock:
+            stats = self._conn.execute("""SELECT COUNT(*), MIN(items.created_at), MAX(items.created_at)
+                                          FROM items_fts JOIN items ON items.id = items_fts.rowid
+                                          WHERE items_fts MATCH ?""", (query,)).fetchone()
+            recent = self._conn.execute("""SELECT items.source, items.title, items.url, items.context, items.summary,
+                                                  items.category, items.created_at
+                                           FROM items_fts JOIN items ON items.id = items_fts.rowid
+                                           WHERE items_fts MATCH ? ORDER BY items.created_at DESC LIMIT ?""",
+                                        (query, limit)).fetchall()
+        return {"matches": stats[0], "first_seen": stats[1], "last_seen": stats[2], "recent": [dict(row) for row in recent]}
+
+    def close(self):
+        self._conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search past trend analyses.")
+    parser.add_argument("query")
+    parser.add_argument("--source", choices=["google", "youtube", "tiktok"])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--db", default=HISTORY_DB_PATH)
+    args = parser.parse_args()
+    store = HistoryStore(args.db)
+    started = time.perf_counter()
+    results = store.search(args.query, args.source, args.limit)
+    print(f"🔎 {len(results)} results in {1000 * (time.perf_counter() - started):.1f} ms")
+    for result in results:
+        seen = time.strftime("%Y-%m-%d %H:%M", time.localtime(result["created_at"]))
+        print(f"\n[{result['source']}] {seen}  {result['title']}\n   {result['context']}\n   …{result['snippet']}")
@@ -0,0 +1,218 @@
+import json
+import os
+import time
+from openai import AsyncOpenAI
+import google.generativeai as genai
+from resilience import call_with_retries, get_breaker
+
+# Size-aware routing: small inputs go to the cheap, fast tier; long content gets the heavier tier.
+LONG_CONTENT_CHARS = 6000
+ROUTES = {
+    "title_only": {"tier": "small", "max_tokens": 400, "timeout": 20},
+    "short_content": {"tier": "small", "max_tokens": 600, "timeout": 45},
+    "long_content": {"tier": "large", "max_tokens": 900, "timeout": 90},
+}
+MODEL_TIERS = {
+    "openai": {"small": "gpt-4.1-nano", "large": "gpt-4o-mini"},
+    "gemini": {"small": "gemini-1.5-flash-8b", "large": "gemini-1.5-flash"},
+}
+# USD per 1M (input, output) tokens, used for the per-route cost report. Unknown models count as free.
+MODEL_PRICES = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+
+def select_route(item_kind: str, prompt_chars: int) -> str:
+    """
+    Picks a route from the item type ("title_only", "scraped", "transcript", "chunk") and the prepared prompt size.
+    Map-reduce chunks always take the small tier; only the reduce step may need the larger one.
+    """
+    if item_kind == "title_only":
+        return "title_only"
+    if item_kind == "chunk":
+        return "short_content"
+    return "long_content" if prompt_chars > LONG_CONTENT_CHARS else "short_content"
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+def error_analysis() -> dict:
+    return {"context": "Error during analysis.", "summary": ["Could not generate summary points."], "category": "Error"}
+
+def skipped_analysis() -> dict:
+    return {"context": "Skipped: the analysis budget is exhausted.", "summary": [], "category": "Skipped"}
+
+def to_gemini_schema(schema: dict) -> dict:
+    """
+    Converts an OpenAI function `parameters` schema into the Gemini response-schema dialect (upper-case types).
+    """
+    converted = {}
+    for key, value in schema.items():
+        if key == "type":
+            converted[key] = value.upper()
+        elif key == "properties":
+            converted[key] = {name: to_gemini_schema(prop) for name, prop in value.items()}
+        elif key == "items":
+            converted[key] = to_gemini_schema(value)
+        else:
+            converted[key] = value
+    return converted
+
+def normalize_analysis(analysis: dict) -> dict:
+    """
+    Coerces any backend's output into the exact `llm_analysis` shape the report and Streamlit app expect.
+    """
+    summary = analysis.get("summary") or []
+    if isinstance(summary, str):
+        summary = [line.strip("-• ").strip() for line in summary.splitlines() if line.strip()]
+    return {
+        "context": str(analysis.get("context", "")),
+        "summary": [str(point) for point in summary],
+        "category": str(analysis.get("category", "")),
+    }
+
+class OpenAIBackend:
+    """
+    OpenAI, or any OpenAI-compatible server (vLLM, llama.cpp, Ollama) when `base_url` is given.
+    """
+
+    def __init__(self, api_key: str, models: dict = None, base_url: str = None, name: str = "openai"):
+        self.name = name
+        self.models = models or MODEL_TIERS["openai"]
+        # Retries are handled by the resilience layer, so the SDK's own retry loop is disabled.
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+    async def analyze(self, prompt: str, function_definition: dict, route: dict) -> tuple:
+        """
+        Returns (analysis, usage) where usage holds the model and its input/output token counts.
+        """
+        model = self.models[route["tier"]]
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            functions=[function_definition],
+            function_call={"name": function_definition["name"]},
+            max_tokens=route["max_tokens"],
+            timeout=route["timeout"],
+        )
+        usage = getattr(response, "usage", None)
+        return json.loads(response.choices[0].message.function_call.arguments), {
+            "model": model,
+            "input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        }
+
+class GeminiBackend:
+    def __init__(self, api_key: str, models: dict = None, name: str = "gemini"):
+        self.name = name
+        self.models = models or MODEL_TIERS["gemini"]
+        genai.configure(api_key=api_key)
+        self.clients = {tier: genai.GenerativeModel(model) for tier, model in self.models.items()}
+
+    async def analyze(self, prompt: str, function_definition: dict, route: dict) -> tuple:
+        response = await self.clients[route["tier"]].generate_content_async(
+            prompt,
+            generation_config={"response_mime_type": "application/json",
+                               "response_schema": to_gemini_schema(function_definition["parameters"]),
+                               "max_output_tokens": route["max_tokens"]},
+            request_options={"timeout": route["timeout"]},
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return json.loads(response.text), {
+            "model": self.models[route["tier"]],
+            "input_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        }
+
+class AnalysisRouter:
+    """
+    Routes `format_trend_analysis` requests across backends. Backends whose circuit breaker is open are
+    skipped, measured backends are tried fastest-first by moving-average latency ahead of unmeasured ones
+    (which keep their configured order), and a failing backend fails over to the next one.
+    """
+
+    def __init__(self, backends: list, latency_smoothing: float = 0.2, budget=None):
+        if not backends:
+            raise ValueError("AnalysisRouter needs at least one backend.")
+        self.backends = backends
+        self.budget = budget
+        self.latency_smoothing = latency_smoothing
+        self.latency = {}
+        self.failovers = 0
+        self.route_stats = {}
+
+    def candidates(self) -> list:
+        healthy = [b for b in self.backends if get_breaker(b.name).state != "open"]
+        ordered = sorted(enumerate(healthy), key=lambda pair: (self.latency.get(pair[1].name, float("inf")), pair[0]))
+        return [backend for _, backend in ordered]
+
+    def _record_latency(self, name: str, seconds: float):
+        previous = self.latency.get(name)
+        self.latency[name] = seconds if previous is None else (1 - self.latency_smoothing) * previous + self.latency_smoothing * seconds
+
+    def _record_route(self, backend_name: str, route_name: str, seconds: float, usage: dict):
+        stats = self.route_stats.setdefault(route_name, {"calls": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0})
+        cost = estimate_cost(usage["model"], usage["input_tokens"], usage["output_tokens"])
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        stats["input_tokens"] += usage["input_tokens"]
+        stats["output_tokens"] += usage["output_tokens"]
+        stats["cost_usd"] += cost
+        if self.budget:
+            self.budget.record(backend_name, usage["input_tokens"], usage["output_tokens"], cost)
+
+    async def analyze(self, prompt: str, function_definition: dict, item_kind: str = "scraped") -> dict:
+        """
+        Runs one analysis on the route chosen from `item_kind` and the prompt size, failing over across backends.
+        """
+        route_name = select_route(item_kind, len(prompt))
+        route = ROUTES[route_name]
+        last_error = None
+        for backend in self.candidates():
+            started = time.monotonic()
+            try:
+                result, usage = await call_with_retries(backend.name, backend.analyze, prompt, function_definition, route, max_attempts=2)
+            except Exception as e:
+                last_error = e
+                self.failovers += 1
+                print(f"⚠️ Analysis backend '{backend.name}' failed ({type(e).__name__}); failing over.")
+                continue
+            elapsed = time.monotonic() - started
+            self._record_latency(backend.name, elapsed)
+            self._record_route(backend.name, route_name, elapsed, usage)
+            return normalize_analysis(result)
+        raise last_error or RuntimeError("No healthy analysis backend is available.")
+
+    def report(self) -> dict:
+        routes = {}
+        for name, stats in self.route_stats.items():
+            routes[name] = {"calls": stats["calls"],
+                            "avg_latency_seconds": round(stats["seconds"] / stats["calls"], 2),
+                            "input_tokens": stats["input_tokens"],
+                            "output_tokens": stats["output_tokens"],
+                            "cost_usd": round(stats["cost_usd"], 5)}
+        return {"latency_ewma_seconds": {name: round(value, 2) for name, value in self.latency.items()},
+                "failovers": self.failovers, "routes": routes}
+
+def build_analysis_router(openai_api_key: str = None, gemini_api_key: str = None, local_base_url: str = None,
+                          local_model: str = None, budget=None) -> AnalysisRouter:
+    """
+    Builds a router over every backend we have credentials for, in preference order: OpenAI, Gemini, local.
+    The local OpenAI-compatible server defaults to LOCAL_LLM_BASE_URL / LOCAL_LLM_MODEL.
+    Token usage and cost of every call are recorded against `budget` (a BudgetManager) when given.
+    """
+    local_base_url = local_base_url or os.getenv("LOCAL_LLM_BASE_URL")
+    local_model = local_model or os.getenv("LOCAL_LLM_MODEL", "llama3.1")
+    backends = []
+    if openai_api_key:
+        backends.append(OpenAIBackend(openai_api_key))
+    if gemini_api_key:
+        backends.append(GeminiBackend(gemini_api_key))
+    if local_base_url:
+        backends.append(OpenAIBackend(os.getenv("LOCAL_LLM_API_KEY", "local"), models={"small": local_model, "large": local_model},
+                                      base_url=local_base_url, name="local"))
+    return AnalysisRouter(backends, budget=budget)
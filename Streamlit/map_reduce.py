@@ -0,0 +1,83 @@
+import asyncio
+import re
+
+# Content longer than this is analyzed by map-reduce instead of being cut at the prompt budget.
+MAP_REDUCE_THRESHOLD = 15000
+CHUNK_CHARS = 8000
+MAX_FAN_OUT = 6
+MAX_MISSING_SHARE = 0.5 # Above this share of failed map calls, the reduce step would misrepresent the content
+
+def map_reduce_options(threshold: int = MAP_REDUCE_THRESHOLD, chunk_chars: int = CHUNK_CHARS, fan_out: int = MAX_FAN_OUT) -> dict:
+    return {"threshold": threshold, "chunk_chars": chunk_chars, "fan_out": fan_out}
+
+def needs_map_reduce(content: str, options: dict) -> bool:
+    return bool(options) and len(content) > options["threshold"]
+
+def chunk_text(text: str, chunk_chars: int) -> list:
+    """
+    Splits text into chunks of at most `chunk_chars`, breaking on paragraph or sentence boundaries where possible.
+    """
+    pieces = [p for p in re.split(r"(?<=[.!?])\s+|\n{2,}", text) if p.strip()]
+    chunks = []
+    current = ""
+    for piece in pieces:
+        while len(piece) > chunk_chars:
+            # A single run-on piece (e.g. caption text without punctuation) is hard-split.
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(piece[:chunk_chars])
+            piece = piece[chunk_chars:]
+        if current and len(current) + len(piece) + 1 > chunk_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def _map_chunk(router, semaphore: asyncio.Semaphore, function_definition: dict, subject: str, chunk: str, index: int, total: int) -> dict:
+    async with semaphore:
+        prompt = (f"The following is part {index + 1} of {total} of the content about {subject}. "
+                  "Provide a one-sentence context summary of this part only. "
+                  "Then, list up to 5 bullet points with the key facts from this part. "
+                  "Finally, classify the topic into a single category.\n\n"
+                  f"Content:\n{chunk}")
+        return await router.analyze(prompt, function_definition, "chunk")
+
+async def map_reduce_analysis(router, function_definition: dict, subject: str, content: str, options: dict) -> dict:
+    """
+    Map: summarizes the chunks of `content` concurrently (at most `fan_out` in flight).
+    Reduce: merges the partial summaries into the final context/summary/category structure, which also gets
+    "map_reduce": {"parts", "missing_parts"}. Fails when more than MAX_MISSING_SHARE of the map calls failed.
+    """
+    chunks = chunk_text(content, options["chunk_chars"])
+    print(f"🧩 Map-reduce analysis of {subject}: {len(content)} characters in {len(chunks)} chunks")
+    semaphore = asyncio.Semaphore(options["fan_out"])
+    partials = await asyncio.gather(*[
+        _map_chunk(router, semaphore, function_definition, subject, chunk, i, len(chunks)) for i, chunk in enumerate(chunks)
+    ], return_exceptions=True)
+    parts = [(i, p) for i, p in enumerate(partials) if not isinstance(p, Exception)]
+    missing = len(chunks) - len(parts)
+    if not parts or missing > MAX_MISSING_SHARE * len(chunks):
+        raise RuntimeError(f"{missing} of {len(chunks)} map calls failed for {subject}.")
+
+    notes = "\n\n".join(
+        f"Part {i + 1}: {p['context']}\n" + "\n".join(f"- {point}" for point in p["summary"]) for i, p in parts
+    )
+    if missing:
+        print(f"⚠️ {missing} of {len(chunks)} parts of {subject} could not be summarized; reducing the rest.")
+        missing_numbers = ", ".join(str(i + 1) for i, p in enumerate(partials) if isinstance(p, Exception))
+        coverage = (f"covering {len(parts)} of its {len(chunks)} parts (missing: {missing_numbers}); "
+                    "do not present the analysis as complete")
+    else:
+        coverage = "covering all of it"
+    prompt = (f"The following are summaries of consecutive parts of the content about {subject}, {coverage}. "
+              "Combine them into one analysis of the whole. "
+              "Provide a one-sentence, instantly understandable context summary. "
+              "Then, provide a more detailed summary as 5 distinct bullet points. "
+              "Finally, classify the topic into a single category.\n\n"
+              f"Part summaries:\n{notes}")
+    analysis = await router.analyze(prompt, function_definition, "scraped")
+    return {**analysis, "map_reduce": {"parts": len(chunks), "missing_parts": missing}}
@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import quote
+import aiohttp
+from dotenv import load_dotenv
+from resilience import call_with_retries, RetryableError, RateLimiter
+from trend_index import TrendIndex, trend_record
+
+# Pinterest Trends API (v5): GET /trends/keywords/{region}/top/{trend_type}. Needs an approved app on a
+# business account; the OAuth access token is cached on disk and refreshed with the refresh token.
+API_BASE = "https://api.pinterest.com/v5"
+TOKEN_URL = f"{API_BASE}/oauth/token"
+TRENDS_PATH = "/trends/keywords/{region}/top/{trend_type}"
+TREND_TYPES = ["growing", "monthly", "yearly", "seasonal"]
+DEFAULT_TREND_TYPES = ["growing", "monthly", "yearly"]
+PAGE_SIZE = 50 # Largest page the trends endpoint returns
+TOKEN_CACHE_PATH = os.getenv("PINTEREST_TOKEN_CACHE", "pinterest_token.json")
+TOKEN_REFRESH_MARGIN = 300 # Refresh this many seconds before the access token expires
+# (requests per minute, burst) per endpoint. The trends burst lets a whole region x trend-type matrix go out at once.
+ENDPOINT_LIMITS = {"trends": (300, 24), "oauth": (10, 1)}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenStore:
+    """
+    Pinterest OAuth token, cached in `path` and refreshed shortly before it expires (or after a 401).
+    A static `access_token` without refresh credentials is used until Pinterest rejects it.
+    """
+
+    def __init__(self, client_id: str = None, client_secret: str = None, refresh_token: str = None,
+                 access_token: str = None, path: str = TOKEN_CACHE_PATH):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.path = path
+        cached = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        self.access_token = cached.get("access_token") or access_token
+        self.expires_at = cached.get("expires_at") if cached.get("access_token") else None
+        self.refresh_token = cached.get("refresh_token") or refresh_token
+        self._lock = asyncio.Lock()
+
+    def _valid(self) -> bool:
+        return bool(self.access_token) and (self.expires_at is None or self.expires_at - TOKEN_REFRESH_MARGIN > time.time())
+
+    async def get(self, session: aiohttp.ClientSession, limiter: RateLimiter) -> str:
+        async with self._lock:
+            if not self._valid():
+                await call_with_retries("pinterest_oauth", self._refresh, session, limiter)
+            return self.access_token
+
+    def invalidate(self, token: str):
+        if token == self.access_token:
+            self.expires_at = 0
+
+    async def _refresh(self, session: aiohttp.ClientSession, limiter: RateLimiter):
+        if not (self.refresh_token and self.client_id and self.client_secret):
+            raise RuntimeError("Pinterest access token is missing or expired and no refresh credentials are configured.")
+        print("🔑 Refreshing the Pinterest access token...")
+        async with limiter:
+            async with session.post(TOKEN_URL, data={"grant_type": "refresh_token", "refresh_token": self.refresh_token},
+                                    auth=aiohttp.BasicAuth(self.client_id, self.client_secret)) as response:
+                if response.status in RETRYABLE_STATUSES:
+                    raise RetryableError(f"HTTP {response.status} from the Pinterest token endpoint")
+                response.raise_for_status()
+                body = await response.json(content_type=None)
+        self.access_token = body["access_token"]
+        self.expires_at = time.time() + body.get("expires_in", 3600)
+        self.refresh_token = body.get("refresh_token") or self.refresh_token # Pinterest may rotate it
+        self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"access_token": self.access_token, "expires_at": self.expires_at, "refresh_token": self.refresh_token}, f)
+        os.replace(temp_path, self.path)
+
+def pinterest_records(region: str, trend_type: str, trends: list) -> list:
+    """
+    Common trend records (plus "region", "trend_type" and week/month/year growth) from one trends response.
+    """
+    return [{**trend_record("pinterest", f"{region}/{trend_type}/{trend['keyword']}", trend["keyword"], rank,
+                            url=f"https://www.pinterest.com/search/pins/?q={quote(trend['keyword'])}"),
+             "region": region, "trend_type": trend_type,
+             "growth": {"wow": trend.get("pct_growth_wow"), "mom": trend.get("pct_growth_mom"), "yoy": trend.get("pct_growth_yoy")}}
+            for rank, trend in enumerate(trends) if trend.get("keyword")]
+
+class PinterestTrendsClient:
+    """
+    Async Pinterest Trends client sharing one pooled HTTP session, with a rate limiter per endpoint.
+
+    Usage:
+        async with PinterestTrendsClient(TokenStore(...)) as client:
+            matrix = await client.trends_matrix(["US", "CA"], ["growing", "monthly"])
+    """
+
+    def __init__(self, tokens: TokenStore, max_connections: int = 20, timeout: float = 30.0, endpoint_limits: dict = None):
+        self.tokens = tokens
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.limiters = {endpoint: RateLimiter(rate, per=60.0, burst=burst)
+                         for endpoint, (rate, burst) in {**ENDPOINT_LIMITS, **(endpoint_limits or {})}.items()}
+        self._session = None
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(TokenStore(os.getenv("PINTEREST_CLIENT_ID"), os.getenv("PINTEREST_CLIENT_SECRET"),
+                              os.getenv("PINTEREST_REFRESH_TOKEN"), os.getenv("PINTEREST_ACCESS_TOKEN")), **kwargs)
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+                                              timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                              headers={"Accept": "application/json"})
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+
+    async def _get_json(self, endpoint: str, path: str, params: dict) -> dict:
+        # A rejected token is refreshed and the request repeated once here, outside the retry and
+        # circuit-breaker accounting, since it says nothing about the API's health.
+        for attempt in range(2):
+            token = await self.tokens.get(self._session, self.limiters["oauth"])
+            async with self.limiters[endpoint]:
+                async with self._session.get(f"{API_BASE}{path}", params=params, headers={"Authorization": f"Bearer {token}"}) as response:
+                    if response.status == 401 and attempt == 0:
+                        self.tokens.invalidate(token)
+                        continue
+                    if response.status in RETRYABLE_STATUSES:
+                        raise RetryableError(f"HTTP {response.status} from {path}")
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+
+    async def top_keywords(self, region: str, trend_type: str, limit: int = PAGE_SIZE, **filters) -> list:
+        """
+        Top trending keywords for one region and trend type, following `bookmark` pages up to `limit`.
+        `filters` are passed as query parameters (e.g. interests="beauty,food_and_drinks").
+        """
+        path = TRENDS_PATH.format(region=region, trend_type=trend_type)
+        trends = []
+        bookmark = None
+        while len(trends) < limit:
+            params = {"limit": min(PAGE_SIZE, limit - len(trends)), **filters}
+            if bookmark:
+                params["bookmark"] = bookmark
+            page = await call_with_retries("pinterest", self._get_json, "trends", path, params)
+            trends.extend(page.get("trends") or [])
+            bookmark = page.get("bookmark")
+            if not bookmark or not page.get("trends"):
+                break
+        return trends[:limit]
+
+    async def trends_matrix(self, regions: list, trend_types: list = DEFAULT_TREND_TYPES, limit: int = PAGE_SIZE, **filters) -> dict:
+        """
+        Every region x trend type at once. Returns {"records": [...], "cells": {"US/growing": count}, "failed": {cell: error}}.
+        """
+        cells = [(region, trend_type) for region in regions for trend_type in trend_types]
+        results = await asyncio.gather(*(self.top_keywords(region, trend_type, limit, **filters) for region, trend_type in cells),
+                                       return_exceptions=True)
+        matrix = {"records": [], "cells": {}, "failed": {}}
+        for (region, trend_type), result in zip(cells, results):
+            if isinstance(result, Exception):
+                print(f"❌ An error occurred while fetching Pinterest {trend_type} trends for '{region}': {result}")
+                matrix["failed"][f"{region}/{trend_type}"] = str(result)
+                continue
+            records = pinterest_records(region, trend_type, result)
+            matrix["records"].extend(records)
+            matrix["cells"][f"{region}/{trend_type}"] = len(records)
+        return matrix
+
+async def collect_pinterest_trends(regions: list, trend_types: list = DEFAULT_TREND_TYPES, limit: int = PAGE_SIZE,
+                                   trend_index: TrendIndex = None, **filters) -> dict:
+    """
+    Fetches the region x trend-type matrix with credentials from the environment; with a `trend_index`,
+    the records are added to it.
+    """
+    async with PinterestTrendsClient.from_env() as client:
+        matrix = await client.trends_matrix(regions, trend_types, limit, **filters)
+    if trend_index:
+        trend_index.add(matrix["records"])
+    print(f"✅ {len(matrix['records'])} Pinterest trends from {len(matrix['cells'])} of {len(regions) * len(trend_types)} region/type pairs.")
+    return matrix
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect Pinterest trending keywords as structured JSON.")
+    parser.add_argument("regions", nargs="*", default=["US"], help="e.g. US CA GB AU")
+    parser.add_argument("--trend-types", nargs="+", choices=TREND_TYPES, default=DEFAULT_TREND_TYPES)
+    parser.add_argument("--limit", type=int, default=PAGE_SIZE)
+    parser.add_argument("--output", help="Write the JSON here instead of stdout.")
+    args = parser.parse_args()
+    load_dotenv()
+    collected = asyncio.run(collect_pinterest_trends(args.regions, args.trend_types, args.limit))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(collected, f, ensure_ascii=False, indent=4)
+        print(f"✅ Saved to {args.output}")
+    else:
+        print(json.dumps(collected, ensure_ascii=False, indent=4))
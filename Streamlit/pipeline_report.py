@@ -0,0 +1,74 @@
+import asyncio
+from resilience import print_resilience_summary
+from scheduler import DeadlineScheduler
+
+# The result shape every analysis pipeline returns, on success and on early aborts alike:
+# {"final_report": [...], "partial": bool, "schedule": {...}} plus optional sections (budget, rising, ...).
+# The run-wide options (deadline, budget, trend index, history and snapshot stores, progress callback) travel
+# together in one RunOptions, and finalize_report does the bookkeeping every pipeline ends with.
+SOURCE_LABELS = {"google": "Google", "youtube": "YouTube", "tiktok": "TikTok"}
+
+class RunOptions:
+    """
+    Options every pipeline takes, none of them required:
+    - `deadline_seconds`: work not finished by then is cancelled or skipped and the report is marked `partial`.
+    - `budget` (BudgetManager): paid calls are checked against its per-run and per-day limits and degrade step
+      by step as it runs low; the report then includes the budget summary.
+    - `trend_index` (TrendIndex): fetched trends are added to it, trends also trending on other platforms are
+      prioritized, and the report includes the cross-platform topics.
+    - `history` (HistoryStore): the finished report is indexed for full-text search.
+    - `snapshots` (SnapshotStore): the trending list is recorded as a snapshot, trends rising fast against
+      recent snapshots are prioritized, and the report lists them under "rising".
+    - `progress(stage, detail)`: called as each stage finishes.
+    """
+
+    def __init__(self, deadline_seconds: float = None, budget=None, trend_index=None, history=None, snapshots=None,
+                 progress=None):
+        self.deadline_seconds = deadline_seconds
+        self.budget = budget
+        self.trend_index = trend_index
+        self.history = history
+        self.snapshots = snapshots
+        self.progress = progress or (lambda stage, detail: None)
+
+def empty_report(scheduler: DeadlineScheduler, error: str) -> dict:
+    """
+    Result of a run that stopped before it had anything to analyze; `error` says why.
+    """
+    print(f"{error} Aborting pipeline.")
+    return {"final_report": [], "partial": scheduler.partial, "schedule": scheduler.report(), "error": error}
+
+async def finalize_report(source: str, scheduler: DeadlineScheduler, options: RunOptions, final_report: list, run_params: dict,
+                          history_params: dict, trend_count: int, contents: list, router=None, transcript_stats: dict = None,
+                          rising: list = None) -> dict:
+    """
+    Assembles a pipeline's result and does the end-of-run bookkeeping: records the run against the budget
+    (`trend_count` trends, average length of the analyzed `contents`) and indexes the report in the history store.
+    `run_params` describe the run to the budget and `history_params` to the history store; `rising` is added
+    when given.
+    """
+    scheduler_report = scheduler.report()
+    print_resilience_summary()
+    if router:
+        print(f"🧭 Analysis routing: {router.report()}")
+    print(f"🗓️ Schedule: {scheduler_report}")
+    result = {"final_report": final_report}
+    if transcript_stats is not None:
+        result["transcript_stats"] = transcript_stats
+    result.update({"partial": scheduler.partial, "schedule": scheduler_report})
+    if options.trend_index:
+        result["cross_platform"] = options.trend_index.leaderboard(min_platforms=2)
+    if rising is not None:
+        result["rising"] = rising
+    if options.budget:
+        options.budget.record_run(source, run_params, trend_count,
+                                  round(sum(len(content or "") for content in contents) / max(1, len(contents))),
+                                  scheduler_report["elapsed_seconds"])
+        options.budget.save()
+        result["budget"] = options.budget.report()
+        print(f"💰 Budget: {result['budget']}")
+    if options.history:
+        await asyncio.to_thread(options.history.ingest, source, history_params, result)
+    print(f"✅ {SOURCE_LABELS.get(source, source)} analysis pipeline complete{' (partial)' if scheduler.partial else ''}. "
+          f"Returning {len(final_report)} items.")
+    return result
@@ -0,0 +1,334 @@
+import asyncio
+import contextvars
+import random
+import re
+import time
+
+# Exception class names (anywhere in the MRO) that mean "try again later" across the SDKs we call:
+# openai, google.api_core, requests, aiohttp and the standard library.
+RETRYABLE_ERROR_NAMES = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests",
+    "ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout",
+    "ClientConnectionError", "ClientPayloadError", "ServerDisconnectedError",
+    "TimeoutError", "RetryableError",
+}
+# Errors that guarantee the provider never processed the request, so even non-idempotent calls may be retried.
+NOT_PROCESSED_ERROR_NAMES = {
+    "RateLimitError", "ResourceExhausted", "TooManyRequests",
+    "ConnectTimeout", "ClientConnectorError", "ConnectionRefusedError",
+}
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+_STATUS_IN_MESSAGE = re.compile(r"\b(?:status(?: code)?:?\s*)(\d{3})\b", re.IGNORECASE)
+
+class RetryableError(Exception):
+    """
+    Raised by provider wrappers for failures the SDK does not classify itself (e.g. a captcha page).
+    """
+
+class CircuitOpenError(Exception):
+    """
+    Raised without calling the provider while its circuit breaker is open.
+    """
+
+class RetryBudget:
+    """
+    Caps the total number of retries a single run may spend across all providers.
+    """
+
+    def __init__(self, max_retries: int = 100):
+        self.max_retries = max_retries
+        self.spent = 0
+
+    def try_spend(self) -> bool:
+        if self.spent >= self.max_retries:
+            return False
+        self.spent += 1
+        return True
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive provider failures and rejects calls for `reset_timeout`
+    seconds. After that a single trial call is let through (half-open); success closes the circuit again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"🔌 Circuit opened for provider '{self.name}' after {self.consecutive_failures} consecutive failures.")
+            self.opened_at = time.monotonic()
+
+_breakers = {}
+_run_budget = contextvars.ContextVar("retry_budget", default=None)
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """
+    Returns the process-wide breaker for a provider, so a provider outage is remembered across runs.
+    """
+    if provider not in _breakers:
+        _breakers[provider] = CircuitBreaker(provider)
+    return _breakers[provider]
+
+def start_run_budget(max_retries: int = 100) -> RetryBudget:
+    """
+    Installs a fresh retry budget for the current run. Tasks created afterwards inherit it.
+    """
+    budget = RetryBudget(max_retries)
+    _run_budget.set(budget)
+    return budget
+
+def _error_names(exc: Exception) -> set:
+    return {cls.__name__ for cls in type(exc).__mro__}
+
+def _status_of(exc: Exception):
+    for value in [getattr(exc, "status_code", None), getattr(exc, "status", None), getattr(exc, "code", None),
+                  getattr(getattr(exc, "response", None), "status_code", None)]:
+        if isinstance(value, int):
+            return value
+    match = _STATUS_IN_MESSAGE.search(str(exc))
+    return int(match.group(1)) if match else None
+
+def is_retryable(exc: Exception, idempotent: bool = True) -> bool:
+    """
+    Decides whether a failed call may be retried. Non-idempotent calls are only retried when the error
+    proves the provider rejected the request before doing any work.
+    """
+    names = _error_names(exc)
+    status = _status_of(exc)
+    if not idempotent:
+        return bool(names & NOT_PROCESSED_ERROR_NAMES) or status == 429
+    return bool(names & RETRYABLE_ERROR_NAMES) or status in RETRYABLE_STATUSES
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    # Exponential backoff with full jitter.
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+def _should_retry(exc, provider, breaker, attempt, max_attempts, idempotent) -> bool:
+    retryable = is_retryable(exc, idempotent)
+    if retryable:
+        # Only provider-side failures count towards the breaker; a bad request says nothing about provider health.
+        breaker.record_failure()
+    else:
+        breaker.trial_in_flight = False
+    if not retryable or attempt == max_attempts - 1 or breaker.state != "closed":
+        return False
+    budget = _run_budget.get()
+    if budget is not None and not budget.try_spend():
+        print(f"⚠️ Retry budget exhausted; not retrying {provider} error: {exc}")
+        return False
+    return True
+
+async def call_with_retries(provider: str, func, *args, idempotent: bool = True, max_attempts: int = 3,
+                            base_delay: float = 1.0, max_delay: float = 30.0, **kwargs):
+    """
+    Awaits `func(*args, **kwargs)` with exponential backoff, the run's retry budget and the provider's
+    circuit breaker. Raises CircuitOpenError without calling the provider while its circuit is open,
+    otherwise re-raises the last error once retrying stops.
+    """
+    breaker = get_breaker(provider)
+    for attempt in range(max_attempts):
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for provider '{provider}'; failing fast.")
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            # A cancelled call (e.g. the losing side of a hedge) says nothing about provider health.
+            breaker.trial_in_flight = False
+            raise
+        except Exception as e:
+            if not _should_retry(e, provider, breaker, attempt, max_attempts, idempotent):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"🔁 {provider} call failed ({type(e).__name__}); retrying in {delay:.1f}s (attempt {attempt + 2}/{max_attempts})")
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+def call_with_retries_sync(provider: str, func, *args, idempotent: bool = True, max_attempts: int = 3,
+                           base_delay: float = 1.0, max_delay: float = 30.0, **kwargs):
+    """
+    Blocking counterpart of `call_with_retries` for the synchronous `requests` and Apify clients.
+    """
+    breaker = get_breaker(provider)
+    for attempt in range(max_attempts):
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for provider '{provider}'; failing fast.")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if not _should_retry(e, provider, breaker, attempt, max_attempts, idempotent):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"🔁 {provider} call failed ({type(e).__name__}); retrying in {delay:.1f}s (attempt {attempt + 2}/{max_attempts})")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+async def run_apify_actor(client, actor_id: str, run_input: dict, provider: str = "apify") -> dict:
+    """
+    Starts an Apify actor run and waits for it to finish. Each start is a billed run, so it is only retried
+    when the request was provably not processed; waiting on the started run is retried freely.
+    Returns the finished run (as `actor(...).call` does), or None.
+    """
+    run = await call_with_retries(provider, client.actor(actor_id).start, run_input=run_input, idempotent=False)
+    return await call_with_retries(provider, client.run(run["id"]).wait_for_finish)
+
+class HedgePolicy:
+    """
+    Decides when to send a backup request: once a call has been outstanding longer than the observed
+    `quantile` latency (the default delay until `min_samples` latencies are known). At most `max_hedges`
+    backup requests are sent per run.
+    """
+
+    def __init__(self, max_hedges: int, quantile: float = 0.9, default_delay: float = 10.0, min_samples: int = 5):
+        self.max_hedges = max_hedges
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.latencies = []
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def delay(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+
+    def record(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def try_hedge(self) -> bool:
+        if self.hedges_sent >= self.max_hedges:
+            return False
+        self.hedges_sent += 1
+        return True
+
+    def report(self) -> dict:
+        return {"hedge_delay_seconds": round(self.delay(), 2), "hedges_sent": self.hedges_sent,
+                "hedges_won": self.hedges_won, "max_hedges": self.max_hedges}
+
+async def hedged_call(provider: str, policy: HedgePolicy, func, *args, accept=None, **kwargs):
+    """
+    Runs `call_with_retries(provider, func, ...)` and, if it is still outstanding after `policy.delay()`,
+    a second identical call; returns the first result that `accept(result)` approves and cancels the other.
+    Only for idempotent calls. Raises the last error (or returns the last unaccepted result) if none qualifies.
+    """
+    accept = accept or (lambda result: True)
+    started = time.monotonic()
+    primary = asyncio.create_task(call_with_retries(provider, func, *args, **kwargs))
+    tasks = [primary]
+    last_error = None
+    last_result = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=policy.delay())
+        if not done and policy.try_hedge():
+            print(f"🪃 {provider} call outstanding after {policy.delay():.1f}s; sending a hedge request.")
+            tasks.append(asyncio.create_task(call_with_retries(provider, func, *args, **kwargs)))
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+                last_result = task.result()
+                if accept(last_result):
+                    policy.record(time.monotonic() - started)
+                    if task is not primary:
+                        policy.hedges_won += 1
+                    return last_result
+    finally:
+        for task in tasks:
+            task.cancel()
+    if last_error is not None and last_result is None:
+        raise last_error
+    return last_result
+
+class RateLimiter:
+    """
+    Async token bucket: at most `rate` calls per `per` seconds on average, with bursts of up to `burst`.
+    Use as `async with limiter:` or `await limiter.acquire()`; waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, per: float = 60.0, burst: int = 1):
+        self.interval = per / rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waited_seconds = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+            self.updated = now
+            if self.tokens < 1:
+                wait = (1 - self.tokens) * self.interval
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+                self.tokens = 1.0
+                self.updated = time.monotonic()
+            self.tokens -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+def resilience_report() -> dict:
+    """
+    Summarizes breaker states and the current run's retry spend.
+    """
+    budget = _run_budget.get()
+    return {
+        "retries_spent": budget.spent if budget else 0,
+        "retry_budget": budget.max_retries if budget else None,
+        "providers": {name: {"state": b.state, "consecutive_failures": b.consecutive_failures, "rejected_calls": b.rejected}
+                      for name, b in _breakers.items()},
+    }
+
+def print_resilience_summary():
+    report = resilience_report()
+    print(f"\n🛡️ Retries spent: {report['retries_spent']}/{report['retry_budget']}")
+    for provider, status in report["providers"].items():
+        print(f"   {provider:<16} {status['state']:<9} rejected={status['rejected_calls']}")
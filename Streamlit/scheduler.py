@@ -0,0 +1,105 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+# Priority scheduling under an optional run deadline: the most important trends start first, and work still
+# queued or running when the deadline passes is skipped or cancelled so the run returns a partial report.
+
+class JobFailed:
+    """
+    Result of a job that raised, so callers can report it as an error; jobs the deadline cut off leave None.
+    """
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"JobFailed({self.error!r})"
+
+def succeeded(result) -> bool:
+    return result is not None and not isinstance(result, JobFailed)
+
+def trend_priority(trend: dict) -> float:
+    """
+    Google trending-now priority: log search volume plus half the log percentage increase, so a
+    50K-search trend outranks a 2K-search one even with a smaller spike.
+    """
+    volume = trend.get("search_volume") or 0
+    increase = trend.get("percentage_increase") or 0
+    return math.log10(1 + volume) + 0.5 * math.log10(1 + increase)
+
+def position_priority(position: int) -> float:
+    """
+    Priority from a 0-based rank on a trending list (e.g. YouTube trending position); the top spot is 1.0.
+    """
+    return 1.0 / (1 + position)
+
+class DeadlineScheduler:
+    """
+    Runs stages of prioritized jobs against one shared deadline (None means no time bound).
+    """
+
+    def __init__(self, deadline_seconds: float = None):
+        self.deadline_seconds = deadline_seconds
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline_seconds if deadline_seconds else None
+        self.stages = {}
+
+    def remaining(self) -> float:
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    async def run(self, stage: str, jobs: list, concurrency: int = None) -> list:
+        """
+        `jobs` is a list of (priority, coroutine_factory). Jobs start highest priority first, at most
+        `concurrency` at a time (all at once when None, still started in priority order). Returns the results
+        in input order, with None for jobs skipped or cancelled at the deadline and a JobFailed for jobs
+        that raised (counted as "failed" in the stage stats).
+        """
+        results = [None] * len(jobs)
+        waiting = deque(sorted(range(len(jobs)), key=lambda i: -jobs[i][0]))
+        running = set()
+        completed = 0
+        failed = 0
+
+        async def lane():
+            nonlocal completed, failed
+            while waiting and not self.expired:
+                index = waiting.popleft()
+                running.add(index)
+                try:
+                    results[index] = await jobs[index][1]()
+                    completed += 1
+                except Exception as e:
+                    print(f"❌ A {stage} job failed: {e}")
+                    results[index] = JobFailed(e)
+                    failed += 1
+                running.discard(index)
+
+        lanes = [asyncio.create_task(lane()) for _ in range(min(concurrency or len(jobs), len(jobs)))]
+        if lanes:
+            _, late = await asyncio.wait(lanes, timeout=self.remaining())
+            for task in late:
+                task.cancel()
+            await asyncio.gather(*lanes, return_exceptions=True)
+
+        self.stages[stage] = {"completed": completed, "failed": failed, "cancelled": len(running), "skipped": len(waiting)}
+        if running or waiting:
+            print(f"⏰ Deadline reached during {stage}: cancelled {len(running)} running and skipped {len(waiting)} lower-priority items.")
+        return results
+
+    @property
+    def partial(self) -> bool:
+        return any(stats["cancelled"] or stats["skipped"] for stats in self.stages.values())
+
+    @property
+    def failed(self) -> int:
+        return sum(stats["failed"] for stats in self.stages.values())
+
+    def report(self) -> dict:
+        return {"deadline_seconds": self.deadline_seconds, "elapsed_seconds": round(time.monotonic() - self.started, 2),
+                "partial": self.partial, "failed": self.failed, "stages": self.stages}
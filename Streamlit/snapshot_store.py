@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+# Every fetched trending list is kept as a timestamped snapshot (topic, rank, volume) so rank and volume
+# movement can be analyzed over time. Loading is windowed and returns topic-by-time NumPy arrays.
+SNAPSHOT_DB_PATH = os.getenv("TREND_SNAPSHOT_DB", "trend_snapshots.db")
+
+def snapshot_items_from_google_trends(trends_data: dict) -> list:
+    """
+    (topic, rank, volume) rows from a google_trends_trending_now response; the topic is the lower-cased query.
+    """
+    return [((trend.get("query") or "").strip().lower(), rank, trend.get("search_volume"))
+            for rank, trend in enumerate(trends_data.get("trends") or []) if trend.get("query")]
+
+def snapshot_items_from_youtube(videos: list) -> list:
+    """
+    (topic, rank, volume) rows from `fetch_trending_videos` output; the topic is the video link.
+    """
+    return [(video["link"], rank, None) for rank, video in enumerate(videos) if video.get("link")]
+
+class SnapshotStore:
+    def __init__(self, path: str = SNAPSHOT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS topics (
+                    id INTEGER PRIMARY KEY, source TEXT, region TEXT, topic TEXT, UNIQUE (source, region, topic)
+                )""")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    topic_id INTEGER REFERENCES topics(id), taken_at REAL, rank INTEGER, volume REAL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS snapshots_taken ON snapshots (taken_at)")
+
+    def record(self, source: str, region: str, items: list, taken_at: float = None) -> int:
+        """
+        Stores one snapshot of a trending list as (topic, rank, volume) rows; returns the number stored.
+        """
+        taken_at = taken_at or time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO topics (source, region, topic) VALUES (?, ?, ?)",
+                                   [(source, region, topic) for topic, _, _ in items])
+            ids = dict(self._conn.execute("SELECT topic, id FROM topics WHERE source = ? AND region = ?", (source, region)).fetchall())
+            self._conn.executemany("INSERT INTO snapshots (topic_id, taken_at, rank, volume) VALUES (?, ?, ?, ?)",
+                                   [(ids[topic], taken_at, rank, volume) for topic, rank, volume in items])
+        return len(items)
+
+    def load(self, source: str, region: str, since: float = None) -> dict:
+        """
+        Snapshots since `since` as arrays: "topics" (N), "times" (T, ascending) and "ranks"/"volumes" (N x T),
+        NaN where a topic was not on that snapshot's list.
+        """
+        with self._lock:
+            rows = self._conn.execute("""SELECT snapshots.topic_id, snapshots.taken_at, snapshots.rank, snapshots.volume
+                                         FROM snapshots JOIN topics ON topics.id = snapshots.topic_id
+                                         WHERE topics.source = ? AND topics.region = ? AND snapshots.taken_at >= ?""",
+                                      (source, region, since or 0)).fetchall()
+            names = dict(self._conn.execute("SELECT id, topic FROM topics WHERE source = ? AND region = ?", (source, region)).fetchall())
+        if not rows:
+            return {"topics": [], "times": np.empty(0), "ranks": np.empty((0, 0)), "volumes": np.empty((0, 0))}
+        data = np.array(rows, dtype=float) # None volumes become NaN
+        topic_ids, row_index = np.unique(data[:, 0], return_inverse=True)
+        times, column_index = np.unique(data[:, 1], return_inverse=True)
+        ranks = np.full((len(topic_ids), len(times)), np.nan)
+        volumes = np.full_like(ranks, np.nan)
+        ranks[row_index, column_index] = data[:, 2]
+        volumes[row_index, column_index] = data[:, 3]
+        return {"topics": [names[int(topic_id)] for topic_id in topic_ids], "times": times, "ranks": ranks, "volumes": volumes}
+
+    def prune(self, older_than: float) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM snapshots WHERE taken_at < ?", (older_than,)).rowcount
+
+    def close(self):
+        self._conn.close()
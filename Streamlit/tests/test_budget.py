@@ -0,0 +1,22 @@
+from budget import BudgetManager, dry_run_estimate
+
+def test_dry_run_without_history_uses_typical_sizes(tmp_path):
+    ledger = str(tmp_path / "ledger.json")
+    youtube = dry_run_estimate("youtube", geo="NZ", video_limit=10, ledger_path=ledger)
+    tiktok = dry_run_estimate("tiktok", geo="NZ,AU", video_limit=10, ledger_path=ledger)
+    assert youtube["based_on_runs"] == 0 and youtube["items"] == 10
+    assert tiktok["items"] == 20 # The TikTok limit is per region
+    assert tiktok["cost_usd"] > 0 and tiktok["tokens"] > 0
+
+def test_dry_run_calibrates_from_recorded_runs_of_the_same_configuration(tmp_path):
+    ledger = str(tmp_path / "ledger.json")
+    for items, seconds in [(10, 30.0), (20, 50.0)]:
+        budget = BudgetManager(ledger_path=ledger)
+        budget.record("openai", input_tokens=1000 * items, cost_usd=0.01 * items)
+        budget.record_run("google", {"geo": "NZ", "time": "past_24_hours"}, items, 4000, seconds)
+        budget.save()
+    estimate = dry_run_estimate("google", geo="NZ", time="past_24_hours", ledger_path=ledger)
+    assert estimate["based_on_runs"] == 2
+    assert estimate["items"] == 15 and estimate["wall_seconds"] == 40.0
+    assert estimate["cost_usd"] == 0.15
+    assert dry_run_estimate("google", geo="AU", ledger_path=ledger)["based_on_runs"] == 0
@@ -0,0 +1,28 @@
+from history_store import HistoryStore
+
+def report(*items):
+    return {"final_report": list(items), "partial": False}
+
+def video(title, context, transcript, category="News"):
+    return {"title": title, "video_url": f"https://example.com/{title}", "transcript": transcript,
+            "llm_analysis": {"context": context, "summary": ["point"], "category": category}}
+
+def test_search_ranks_title_matches_first_and_filters_by_source(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.ingest("youtube", {}, report(video("Election results", "Votes counted", "a long speech"),
+                                       video("Cooking show", "A recipe", "talk about the election at the end")))
+    store.ingest("google", {}, report({"trend_query": "election", "scraped_content": "news",
+                                       "llm_analysis": {"context": "Polls open", "summary": [], "category": "Politics"}}))
+    results = store.search("election", source="youtube")
+    assert [result["title"] for result in results] == ["Election results", "Cooking show"]
+    assert {result["source"] for result in store.search("election")} == {"youtube", "google"}
+    assert store.search("elect")[0]["title"] in ("Election results", "election") # The last word matches as a prefix
+    assert store.search("  ") == []
+
+def test_ingest_accepts_empty_and_list_reports(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    assert store.ingest("google", {}, {"final_report": [], "partial": False, "error": "No queries were generated."}) == 0
+    assert store.ingest("google", {}, []) == 0
+    assert store.ingest("google", {}, None) == 0
+    assert store.ingest("youtube", {}, [video("Match highlights", "A late goal", "commentary")]) == 1
+    assert store.search("goal")[0]["title"] == "Match highlights"
@@ -0,0 +1,28 @@
+import asyncio
+from budget import BudgetManager
+from history_store import HistoryStore
+from pipeline_report import RunOptions, empty_report, finalize_report
+from scheduler import DeadlineScheduler
+
+ITEM = {"title": "Match highlights", "video_url": "https://example.com/v", "transcript": "a late goal",
+        "llm_analysis": {"context": "A late winner", "summary": ["goal"], "category": "Sport"}}
+
+def test_finalize_report_records_the_run_and_indexes_it(tmp_path):
+    budget = BudgetManager(ledger_path=str(tmp_path / "budget.json"))
+    history = HistoryStore(str(tmp_path / "history.db"))
+    options = RunOptions(budget=budget, history=history)
+    result = asyncio.run(finalize_report("youtube", DeadlineScheduler(), options, [ITEM], {"geo": "NZ", "video_limit": 1},
+                                         {"gl": "NZ"}, 1, ["a late goal"], transcript_stats={"captions": 1}, rising=[]))
+    assert list(result) == ["final_report", "transcript_stats", "partial", "schedule", "rising", "budget"]
+    assert result["partial"] is False and result["schedule"]["failed"] == 0
+    assert history.search("goal")[0]["title"] == "Match highlights"
+
+def test_empty_report_has_the_same_shape():
+    result = empty_report(DeadlineScheduler(), "No trends.")
+    assert result["final_report"] == [] and result["error"] == "No trends."
+    assert {"partial", "schedule"} <= set(result)
+
+def test_run_options_default_to_a_silent_progress_callback():
+    options = RunOptions()
+    assert options.progress("stage", {}) is None
+    assert options.budget is None and options.deadline_seconds is None
@@ -0,0 +1,44 @@
+import asyncio
+from scheduler import DeadlineScheduler, JobFailed, succeeded
+
+def run_stage(scheduler, jobs, concurrency=None):
+    return asyncio.run(scheduler.run("stage", jobs, concurrency))
+
+def test_failed_jobs_are_told_apart_from_jobs_cut_off_by_the_deadline():
+    async def ok():
+        return "done"
+
+    async def boom():
+        raise RuntimeError("backend down")
+
+    async def slow():
+        await asyncio.sleep(5)
+        return "late"
+
+    scheduler = DeadlineScheduler(deadline_seconds=0.2)
+    results = run_stage(scheduler, [(3, ok), (2, boom), (1, slow)])
+    assert results[0] == "done"
+    assert isinstance(results[1], JobFailed) and str(results[1].error) == "backend down"
+    assert results[2] is None
+    assert [succeeded(result) for result in results] == [True, False, False]
+    assert scheduler.stages["stage"] == {"completed": 1, "failed": 1, "cancelled": 1, "skipped": 0}
+    assert scheduler.partial
+    assert scheduler.report()["failed"] == 1
+
+def test_jobs_start_in_priority_order_and_a_failure_alone_is_not_partial():
+    started = []
+
+    def job(name, fail=False):
+        async def run():
+            started.append(name)
+            if fail:
+                raise ValueError(name)
+            return name
+        return run
+
+    scheduler = DeadlineScheduler()
+    results = run_stage(scheduler, [(1, job("low")), (3, job("high", fail=True)), (2, job("mid"))], concurrency=1)
+    assert started == ["high", "mid", "low"]
+    assert results[0] == "low" and results[2] == "mid" and isinstance(results[1], JobFailed)
+    assert not scheduler.partial
+    assert scheduler.failed == 1
@@ -0,0 +1,43 @@
+import asyncio
+import tiktok_analyzer
+
+VIDEOS = [{"video_number": number, "video_id": str(number), "description": f"Video {number}",
+           "link": f"https://www.tiktok.com/@user/video/{number}", "regions": {"NZ": number}} for number in (1, 2, 3)]
+
+async def fake_collect(api_key, regions, limit):
+    return [dict(video) for video in VIDEOS]
+
+async def fake_transcribe(client, video, cache, download_semaphore, transcribe_semaphore, limiter, workdir, budget=None):
+    if video["video_id"] == "2":
+        raise RuntimeError("download crashed")
+    return {"title": video["description"], "video_url": video["link"], "video_id": video["video_id"],
+            "transcript": "words", "status": "Success", "transcript_source": "openai_audio"}
+
+async def fake_analyze(router, semaphore, result, map_reduce=None, budget=None):
+    if result["video_id"] == "3":
+        raise RuntimeError("analysis crashed")
+    return {"context": "ok", "summary": [], "category": "News"}
+
+def test_failed_videos_are_reported_as_errors(monkeypatch, tmp_path):
+    monkeypatch.setattr(tiktok_analyzer, "collect_tiktok_trends", fake_collect)
+    monkeypatch.setattr(tiktok_analyzer, "transcribe_tiktok_video", fake_transcribe)
+    monkeypatch.setattr(tiktok_analyzer, "analyze_transcript_with_openai", fake_analyze)
+    report = asyncio.run(tiktok_analyzer.run_tiktok_analysis_pipeline(
+        "apify-key", "openai-key", cache=tiktok_analyzer.TranscriptCache(str(tmp_path))))
+    items = {item["video_id"]: item for item in report["final_report"]}
+    assert set(items) == {"1", "2", "3"}
+    assert items["1"]["llm_analysis"]["category"] == "News" and "error" not in items["1"]
+    assert items["2"]["error"] == "download crashed" and items["2"]["llm_analysis"]["category"] == "Error"
+    assert items["3"]["error"] == "analysis crashed" and items["3"]["llm_analysis"]["category"] == "Error"
+    assert report["schedule"]["failed"] == 2
+    assert not report["partial"]
+
+def test_a_run_without_trends_returns_an_empty_report(monkeypatch, tmp_path):
+    async def no_videos(api_key, regions, limit):
+        return []
+
+    monkeypatch.setattr(tiktok_analyzer, "collect_tiktok_trends", no_videos)
+    report = asyncio.run(tiktok_analyzer.run_tiktok_analysis_pipeline(
+        "apify-key", "openai-key", cache=tiktok_analyzer.TranscriptCache(str(tmp_path))))
+    assert report["final_report"] == [] and not report["partial"]
+    assert report["error"] == "No TikTok trends fetched."
@@ -0,0 +1,75 @@
+import asyncio
+from transcripts import (segment_request, plan_segments, stitch_segments, fetch_segmented_transcript_with_gemini, stream_transcript_with_gemini,
+                         TRANSCRIPT_PROMPT)
+
+def test_segment_request_clips_the_video_to_the_time_range():
+    url = "https://www.youtube.com/watch?v=abc123"
+    start, end = plan_segments(1500, segment_seconds=600, overlap_seconds=15)[1]
+    request = segment_request(url, start, end).model_dump(exclude_none=True)
+    video_part, prompt_part = request["parts"]
+    assert video_part["file_data"] == {"file_uri": url}
+    assert video_part["video_metadata"] == {"start_offset": "585s", "end_offset": "1200s"}
+    assert prompt_part == {"text": TRANSCRIPT_PROMPT}
+
+class FakeModels:
+    def __init__(self):
+        self.requests = []
+
+    async def generate_content(self, model, contents):
+        self.requests.append((model, contents))
+        offsets = contents.parts[0].video_metadata
+        return type("Response", (), {"text": f"from {offsets.start_offset} to {offsets.end_offset}"})()
+
+def test_segmented_transcript_sends_one_clipped_request_per_segment():
+    models = FakeModels()
+    client = type("Client", (), {"aio": type("Aio", (), {"models": models})()})()
+    video = {"link": "https://www.youtube.com/watch?v=abc123", "title": "Long video"}
+    result = asyncio.run(fetch_segmented_transcript_with_gemini(video, asyncio.Semaphore(2), client, "gemini-1.5-flash",
+                                                                duration=1500, segment_seconds=600))
+    assert result["status"] == "Success"
+    assert result["transcript_segments"] == 3
+    assert [model for model, _ in models.requests] == ["gemini-1.5-flash"] * 3
+    assert result["transcript"].startswith("from 0s to 600s")
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read == len(self.chunks):
+            raise StopAsyncIteration
+        self.read += 1
+        return type("Chunk", (), {"text": self.chunks[self.read - 1]})()
+
+class FakeStreamingModel:
+    def __init__(self, stream):
+        self.stream = stream
+        self.generation_config = None
+
+    async def generate_content_async(self, contents, stream, generation_config, request_options):
+        self.generation_config = generation_config
+        return self.stream
+
+def test_streamed_transcript_stops_reading_at_the_character_budget():
+    stream = FakeStream(["a" * 40, "b" * 40, "c" * 40])
+    model = FakeStreamingModel(stream)
+    text, truncated = asyncio.run(stream_transcript_with_gemini(model, "https://youtu.be/abc123", max_chars=60))
+    assert truncated
+    assert text == "a" * 40 + "b" * 20
+    assert stream.read == 2
+    assert model.generation_config == {"max_output_tokens": 30}
+
+def test_plan_segments_overlaps_ranges_and_respects_the_character_budget():
+    assert plan_segments(1500, segment_seconds=600, overlap_seconds=15) == [(0, 600), (585, 1200), (1185, 1500)]
+    assert plan_segments(300, segment_seconds=600) == [(0, 300)]
+    assert len(plan_segments(3600, segment_seconds=600, max_chars=1)) == 1
+
+def test_stitch_segments_drops_the_words_repeated_by_the_overlap():
+    assert stitch_segments(["and so the vote was counted late", "Vote was counted late, and the result came in"]) == \
+        "and so the vote was counted late and the result came in"
+    # Fewer shared words than min_overlap_words are kept as they are
+    assert stitch_segments(["the end", "end of it", ""]) == "the end end of it"
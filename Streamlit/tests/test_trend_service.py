@@ -0,0 +1,14 @@
+import json
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+from trend_service import request_params
+
+def test_youtube_params_are_normalized():
+    params = request_params(make_mocked_request("GET", "/trends/youtube?gl=nz&hl=EN&mode=fused&deadline=60"), "youtube")
+    assert params == {"gl": "NZ", "hl": "en", "limit": 10, "mode": "fused", "deadline": 60.0}
+
+def test_unknown_mode_is_a_bad_request():
+    with pytest.raises(web.HTTPBadRequest) as raised:
+        request_params(make_mocked_request("GET", "/trends/youtube?mode=three_hop"), "youtube")
+    assert "three_hop" in json.loads(raised.value.text)["error"]
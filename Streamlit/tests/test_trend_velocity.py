@@ -0,0 +1,22 @@
+from snapshot_store import SnapshotStore
+from trend_velocity import trend_momentum, rising_topics, momentum_boost
+
+HOUR = 3600
+
+def test_a_topic_climbing_the_list_is_rising_and_a_steady_one_is_not(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    now = 1_700_000_000
+    for step, climber_rank in enumerate([9, 9, 9, 9, 0]):
+        items = [("steady", 1, None), ("climber", climber_rank, None)]
+        if step == 4:
+            items.append(("newcomer", 5, None))
+        store.record("google", "NZ/past_24_hours", items, taken_at=now - (4 - step) * HOUR)
+    momentum = trend_momentum(store, "google", "NZ/past_24_hours", window_seconds=10 ** 10)
+    assert momentum["climber"]["rising"] and momentum["climber"]["rank_delta"] == -9
+    assert not momentum["steady"]["rising"] and momentum["steady"]["rank_delta"] == 0
+    assert momentum["newcomer"]["is_new"] and momentum["newcomer"]["rank_delta"] is None
+    assert [item["topic"] for item in rising_topics(momentum)] == ["climber"]
+    assert momentum_boost(momentum, "climber") > momentum_boost(momentum, "steady") == 1.0
+
+def test_no_snapshots_means_no_momentum(tmp_path):
+    assert trend_momentum(SnapshotStore(str(tmp_path / "snapshots.db")), "youtube", "NZ/en") == {}
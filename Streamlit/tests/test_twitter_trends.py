@@ -0,0 +1,10 @@
+import numpy as np
+from twitter_trends import parse_volumes
+
+def test_parse_volumes_handles_suffixes_separators_and_missing_values():
+    volumes = parse_volumes(["12.5K posts", "1,234 tweets", "Under 10K posts", "2M", 5400, None, "Trending", "1.2.3K"])
+    np.testing.assert_array_equal(volumes[:5], [12500.0, 1234.0, 10000.0, 2e6, 5400.0])
+    assert np.isnan(volumes[5:]).all()
+
+def test_parse_volumes_of_nothing_is_empty():
+    assert parse_volumes([]).shape == (0,)
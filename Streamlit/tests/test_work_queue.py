@@ -0,0 +1,55 @@
+import time
+import pytest
+from work_queue import SQLiteQueue, RedisQueue, InMemoryRedis
+
+LEASE_SECONDS = 0.05
+
+@pytest.fixture(params=["sqlite", "redis"])
+def queue(request, tmp_path):
+    if request.param == "sqlite":
+        queue = SQLiteQueue(str(tmp_path / "queue.db"), visibility_timeout=LEASE_SECONDS, max_attempts=2)
+    else:
+        queue = RedisQueue(InMemoryRedis(), visibility_timeout=LEASE_SECONDS, max_attempts=2)
+    yield queue
+    queue.close()
+
+def test_a_leased_task_is_not_handed_out_twice(queue):
+    task_id = queue.enqueue("scrape", {"query": "election"}, "sweep-1")
+    task = queue.lease("worker-a")
+    assert task["id"] == task_id and task["payload"] == {"query": "election"} and task["attempts"] == 1
+    assert queue.lease("worker-b") is None
+    assert queue.ack(task_id, "worker-a", {"ok": True})
+    assert queue.results("sweep-1", "scrape") == [{"ok": True}]
+
+def test_enqueue_with_a_task_id_is_idempotent(queue):
+    queue.enqueue("analyse", {"n": 1}, "sweep-1", task_id="t1")
+    queue.enqueue("analyse", {"n": 2}, "sweep-1", task_id="t1")
+    assert queue.lease("worker-a")["payload"] == {"n": 1}
+    assert queue.lease("worker-a") is None
+
+def test_an_expired_lease_is_taken_over_and_the_old_worker_loses_it(queue):
+    task_id = queue.enqueue("scrape", {}, "sweep-1")
+    queue.lease("worker-a")
+    time.sleep(LEASE_SECONDS * 2)
+    task = queue.lease("worker-b")
+    assert task["id"] == task_id and task["attempts"] == 2
+    assert not queue.heartbeat(task_id, "worker-a")
+    assert not queue.ack(task_id, "worker-a")
+    assert queue.heartbeat(task_id, "worker-b")
+
+def test_nack_retries_then_parks_the_task_as_dead(queue):
+    task_id = queue.enqueue("transcribe", {}, "sweep-1")
+    assert queue.nack(queue.lease("worker-a")["id"], "worker-a", "first failure")
+    assert queue.stats("sweep-1") == {"pending": 1}
+    assert queue.nack(queue.lease("worker-a")["id"], "worker-a", "second failure")
+    assert queue.stats("sweep-1") == {"dead": 1}
+    assert queue.lease("worker-a") is None
+
+def test_a_lease_expiring_on_the_last_attempt_parks_the_task_as_dead(queue):
+    queue.enqueue("scrape", {}, "sweep-1")
+    queue.lease("worker-a")
+    time.sleep(LEASE_SECONDS * 2)
+    queue.lease("worker-b")
+    time.sleep(LEASE_SECONDS * 2)
+    assert queue.lease("worker-c") is None
+    assert queue.stats("sweep-1") == {"dead": 1}
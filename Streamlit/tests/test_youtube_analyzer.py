@@ -0,0 +1,27 @@
+import asyncio
+from youtube_analyzer import analyze_video_with_gemini
+
+VIDEO = {"link": "https://www.youtube.com/watch?v=abc123", "title": "Trending video", "length": "3:00"}
+
+class FakeModel:
+    def __init__(self, text):
+        self.text = text
+
+    async def generate_content_async(self, contents, generation_config, request_options):
+        return type("Response", (), {"text": self.text})()
+
+def analyze(text, include_transcript=False):
+    return asyncio.run(analyze_video_with_gemini(VIDEO, asyncio.Semaphore(1), FakeModel(text), include_transcript))
+
+def test_fused_analysis_is_normalized_to_the_report_shape():
+    result = analyze('{"context": "A launch", "summary": "- first\\n- second", "category": "Tech", "transcript": "hello\\nworld"}',
+                     include_transcript=True)
+    assert result["status"] == "Success"
+    assert result["llm_analysis"] == {"context": "A launch", "summary": ["first", "second"], "category": "Tech"}
+    assert result["transcript"] == "hello world"
+
+def test_unparseable_fused_output_is_an_error_analysis():
+    result = analyze("not json")
+    assert result["status"] == "Failed"
+    assert result["llm_analysis"]["category"] == "Error"
+    assert analyze('["not", "an", "object"]')["llm_analysis"]["category"] == "Error"
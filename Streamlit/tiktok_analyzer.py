@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+import yt_dlp
+from apify_client import ApifyClientAsync
+from openai import AsyncOpenAI
+from resilience import call_with_retries, run_apify_actor, start_run_budget, RateLimiter
+from llm_backends import build_analysis_router, error_analysis
+from budget import BudgetManager, estimate_audio_transcription
+from trend_index import records_from_tiktok
+from cpu_pool import monitor_loop_lag
+from scheduler import DeadlineScheduler, JobFailed, succeeded, position_priority
+from pipeline_report import RunOptions, empty_report, finalize_report
+from youtube_analyzer import analyze_transcript_with_openai, failed_video_item
+
+# TikTok trending videos: audio is downloaded with yt-dlp and transcribed by the OpenAI audio API (which takes
+# an uploaded file, not a TikTok URL), then analyzed by the same format_trend_analysis stage as YouTube.
+TRANSCRIBE_MODEL = "gpt-4o-mini-transcribe"
+TRANSCRIBE_PER_MINUTE = 50 # OpenAI audio requests per minute
+DOWNLOAD_CONCURRENCY = 8
+TRANSCRIBE_CONCURRENCY = 10
+MAX_AUDIO_BYTES = 25 * 1024 * 1024 # OpenAI audio upload limit
+TRANSCRIPT_CACHE_DIR = os.getenv("TIKTOK_TRANSCRIPT_CACHE", "tiktok_transcripts")
+TIKTOK_TRENDS_ACTOR = "novi/tiktok-trend-api"
+APAC_REGIONS = ["NZ", "AU", "JP", "KR", "TW", "HK", "SG", "MY", "ID", "PH", "TH", "VN", "IN"]
+STREAM_QUEUE_SIZE = 500 # Items buffered between the region fetches and the consumer
+_VIDEO_ID = re.compile(r"/video/(\d+)")
+
+async def iterate_region_trends(client: ApifyClientAsync, region_code: str, limit: int):
+    """
+    Yields one region's trending videos in rank order, reading the run's dataset page by page.
+    """
+    run_input = {"isDownloadVideo": False, "isDownloadVideoCover": False, "limit": limit, "region": region_code}
+    print(f"Starting the TikTok Trends scraper for region '{region_code}'...")
+    actor_run = await run_apify_actor(client, TIKTOK_TRENDS_ACTOR, run_input)
+    if not actor_run:
+        raise RuntimeError(f"TikTok Trends actor run for '{region_code}' did not finish")
+    async for item in client.dataset(actor_run["defaultDatasetId"]).iterate_items(limit=limit):
+        yield item
+
+async def stream_tiktok_trends(api_key: str, regions: list, limit: int = 10):
+    """
+    Fetches all regions concurrently and yields (region, rank, item) as items arrive from any of them.
+    A region that fails is logged and skipped.
+    """
+    client = ApifyClientAsync(api_key)
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    finished = object()
+
+    async def fetch_region(region_code: str):
+        rank = 0
+        try:
+            async for item in iterate_region_trends(client, region_code, limit):
+                await queue.put((region_code, rank, item))
+                rank += 1
+            print(f"✅ TikTok region '{region_code}': {rank} videos.")
+        except Exception as e:
+            print(f"❌ An error occurred while fetching TikTok trends for '{region_code}': {e}")
+
+    async def fetch_all():
+        await asyncio.gather(*(fetch_region(region_code) for region_code in regions))
+        await queue.put(finished)
+
+    producer = asyncio.create_task(fetch_all())
+    try:
+        while (entry := await queue.get()) is not finished:
+            yield entry
+    finally:
+        producer.cancel()
+
+def tiktok_video_id(item: dict, link: str = None) -> str:
+    video_id = item.get("aweme_id") or item.get("id")
+    if video_id:
+        return str(video_id)
+    match = _VIDEO_ID.search(link or "")
+    return match.group(1) if match else None
+
+def tiktok_entry(item: dict) -> dict:
+    link = item.get("share_url")
+    return {"video_id": tiktok_video_id(item, link), "description": (item.get("desc") or "").strip(), "link": link,
+            "play_count": (item.get("statistics") or {}).get("play_count")}
+
+def preprocess_tiktok_data(raw_data: list) -> list:
+    return [{"video_number": i + 1, **tiktok_entry(item)} for i, item in enumerate(raw_data)]
+
+async def collect_tiktok_trends(api_key: str, regions: list, limit: int = 10) -> list:
+    """
+    Trending videos from several regions, fetched concurrently. A video trending in several regions appears
+    once, with its 1-based rank in each under "regions". Videos are ordered by their best rank in any region,
+    then by how many regions carry them, and numbered in that order.
+    """
+    merged = {}
+    received = 0
+    async for region_code, rank, item in stream_tiktok_trends(api_key, regions, limit):
+        received += 1
+        entry = tiktok_entry(item)
+        key = entry["video_id"] or entry["link"]
+        if key:
+            merged.setdefault(key, {**entry, "regions": {}})["regions"][region_code] = rank + 1
+    ordered = sorted(merged.values(), key=lambda video: (min(video["regions"].values()), -len(video["regions"])))
+    print(f"✅ {len(ordered)} unique TikTok videos from {received} items across {len(regions)} regions.")
+    return [{"video_number": number, **video} for number, video in enumerate(ordered, 1)]
+
+class TranscriptCache:
+    """
+    Transcripts by TikTok video id, one JSON file each, so a video is downloaded and transcribed only once.
+    """
+
+    def __init__(self, directory: str = TRANSCRIPT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.directory, f"{video_id}.json")
+
+    def get(self, video_id: str) -> dict:
+        if not video_id or not os.path.exists(self._path(video_id)):
+            return None
+        with open(self._path(video_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, video_id: str, entry: dict):
+        if not video_id:
+            return
+        temp_path = f"{self._path(video_id)}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(temp_path, self._path(video_id))
+
+def download_audio(url: str, directory: str) -> tuple:
+    """
+    Downloads the video's audio (or the whole video when TikTok offers no audio-only format) and returns
+    (path, duration in seconds or None).
+    """
+    options = {"format": "bestaudio/best", "outtmpl": os.path.join(directory, "%(id)s.%(ext)s"),
+               "quiet": True, "no_warnings": True, "noplaylist": True}
+    with yt_dlp.YoutubeDL(options) as ydl:
+        info = ydl.extract_info(url, download=True)
+        return ydl.prepare_filename(info), info.get("duration")
+
+async def transcribe_file(client: AsyncOpenAI, limiter: RateLimiter, path: str):
+    async with limiter:
+        with open(path, "rb") as audio:
+            return await client.audio.transcriptions.create(model=TRANSCRIBE_MODEL, file=audio, response_format="json")
+
+async def transcribe_tiktok_video(client: AsyncOpenAI, video: dict, cache: TranscriptCache, download_semaphore: asyncio.Semaphore,
+                                  transcribe_semaphore: asyncio.Semaphore, limiter: RateLimiter, workdir: str,
+                                  budget: BudgetManager = None) -> dict:
+    """
+    Returns the video in the shape the YouTube analysis stage takes ({"title", "video_url", "transcript", "status"}),
+    with "transcript_source" set to "cache", "openai_audio" or "none". With a `budget`, a video is only
+    transcribed if a typical-length transcription fits, and is charged by its actual audio length.
+    """
+    video_id = video.get("video_id")
+    result = {"title": video["description"] or f"TikTok video {video['video_number']}", "video_url": video["link"],
+              "video_id": video_id, "regions": video.get("regions"), "transcript": None, "status": "Failed",
+              "transcript_source": "none"}
+    cached = await asyncio.to_thread(cache.get, video_id)
+    if cached is not None:
+        return {**result, "transcript": cached["transcript"], "status": "Success" if cached["transcript"] else "Failed",
+                "transcript_source": "cache"}
+    if not video["link"]:
+        return result
+    if budget and not budget.can_afford(estimate_audio_transcription(None, TRANSCRIBE_MODEL)):
+        print(f"💸 Budget exhausted; not transcribing TikTok video {video_id}")
+        budget.steps["skip"] += 1
+        return result
+
+    path = None
+    try:
+        async with download_semaphore:
+            path, duration = await asyncio.to_thread(download_audio, video["link"], workdir)
+        if os.path.getsize(path) > MAX_AUDIO_BYTES:
+            print(f"⚠️ Audio for TikTok video {video_id} is over the upload limit; analyzing its description only.")
+            return result
+        async with transcribe_semaphore:
+            print(f"🎙️ Transcribing TikTok video {video_id}")
+            response = await call_with_retries("openai_audio", transcribe_file, client, limiter, path)
+        if budget:
+            budget.record("openai_audio", cost_usd=estimate_audio_transcription(duration, TRANSCRIBE_MODEL)["cost_usd"])
+        text = (response.text or "").strip()
+        # Music-only videos transcribe to nothing; that is cached too so they are not downloaded again.
+        await asyncio.to_thread(cache.put, video_id, {"transcript": text, "model": TRANSCRIBE_MODEL, "transcribed_at": time.time()})
+        return {**result, "transcript": text or None, "status": "Success" if text else "Failed", "transcript_source": "openai_audio"}
+    except Exception as e:
+        print(f"❌ Could not transcribe TikTok video {video_id}: {e}")
+        return result
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+@monitor_loop_lag
+async def run_tiktok_analysis_pipeline(apify_api_key: str, openai_api_key: str, gemini_api_key: str = None, region_code: str = "NZ",
+                                       limit: int = 10, regions: list = None, transcribe_per_minute: float = TRANSCRIBE_PER_MINUTE,
+                                       cache: TranscriptCache = None, options: RunOptions = None):
+    """
+    Runs the TikTok trend pipeline: trending videos from Apify (for every region in `regions`, fetched
+    concurrently and deduplicated by video id, else for `region_code`; `limit` per region), audio transcription by the OpenAI audio API
+    (at most `transcribe_per_minute` requests, transcripts cached by video id in `cache`), then the YouTube
+    analysis stage, with a description-only analysis for videos without speech.
+    `options` (RunOptions) carries the deadline, budget, trend index, history store and progress callback;
+    snapshots are not recorded for TikTok.
+    Returns {"final_report": [...], "transcript_stats": {...}, "partial": bool, "schedule": {...}}; when
+    nothing could be fetched the report is empty and "error" says why.
+    """
+    options = options or RunOptions()
+    budget, trend_index, progress = options.budget, options.trend_index, options.progress
+    scheduler = DeadlineScheduler(options.deadline_seconds)
+    start_run_budget()
+    regions = regions or [region_code]
+    videos = await collect_tiktok_trends(apify_api_key, regions, limit)
+    if not videos:
+        return empty_report(scheduler, "No TikTok trends fetched.")
+    progress("videos", {"count": len(videos)})
+    priorities = [position_priority(video["video_number"] - 1) for video in videos]
+    if trend_index:
+        trend_index.add(records_from_tiktok(videos))
+        priorities = [priority * trend_index.priority_boost(f"tiktok:{video.get('video_id') or video['video_number']}")
+                      for video, priority in zip(videos, priorities)]
+
+    cache = cache or TranscriptCache()
+    client = AsyncOpenAI(api_key=openai_api_key, max_retries=0)
+    limiter = RateLimiter(transcribe_per_minute, per=60.0)
+    download_semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+    transcribe_semaphore = asyncio.Semaphore(TRANSCRIBE_CONCURRENCY)
+    with tempfile.TemporaryDirectory(prefix="tiktok_audio_") as workdir:
+        transcript_jobs = [(priority, lambda video=video: transcribe_tiktok_video(client, video, cache, download_semaphore, transcribe_semaphore,
+                                                                                  limiter, workdir, budget))
+                           for video, priority in zip(videos, priorities)]
+        transcript_results = await scheduler.run("transcripts", transcript_jobs)
+    failed_items = [] # Videos whose transcription or analysis raised, reported as errors
+    for i, (video, result, priority) in enumerate(zip(videos, transcript_results, priorities)):
+        if isinstance(result, JobFailed):
+            failed_items.append({**failed_video_item(video["description"] or f"TikTok video {video['video_number']}", video["link"],
+                                                     priority, result.error),
+                                 "video_id": video.get("video_id"), "regions": video.get("regions")})
+            transcript_results[i] = None
+        elif result:
+            result["priority"] = round(priority, 3)
+    transcript_results = [result for result in transcript_results if result] # Drop videos cut off by the deadline
+    transcript_stats = {source: sum(1 for r in transcript_results if r["transcript_source"] == source)
+                        for source in ["cache", "openai_audio", "none"]}
+    print(f"📊 TikTok transcript sources: {transcript_stats} (rate limiter waited {limiter.waited_seconds:.1f}s)")
+    progress("transcribed", {"count": len(transcript_results), "sources": transcript_stats})
+
+    router = build_analysis_router(openai_api_key=openai_api_key, gemini_api_key=gemini_api_key, budget=budget)
+    analysis_semaphore = asyncio.Semaphore(10)
+    analysis_jobs = [(result["priority"], lambda result=result: analyze_transcript_with_openai(router, analysis_semaphore, result, None, budget))
+                     for result in transcript_results]
+    llm_analyses = await scheduler.run("analysis", analysis_jobs, concurrency=10)
+    progress("analysed", {"count": sum(1 for analysis in llm_analyses if succeeded(analysis))})
+
+    final_report_data = [{**item, "llm_analysis": error_analysis(), "error": str(analysis.error)} if isinstance(analysis, JobFailed)
+                         else {**item, "llm_analysis": analysis}
+                         for item, analysis in zip(transcript_results, llm_analyses) if analysis is not None]
+    final_report_data.extend(failed_items)
+    return await finalize_report("tiktok", scheduler, options, final_report_data, {"geo": ",".join(regions), "video_limit": limit},
+                                 {"regions": regions, "limit": limit}, len(videos),
+                                 [result.get("transcript") for result in transcript_results], router=router,
+                                 transcript_stats=transcript_stats)
@@ -0,0 +1,278 @@
+import asyncio
+import math
+import re
+from google import genai as google_genai
+from google.genai import types as genai_types
+from resilience import call_with_retries
+from cpu_pool import get_cpu_executor
+from budget import estimate_video_transcription
+
+# Transcript tiers, cheapest first. Gemini is only used when YouTube has no captions at all.
+TIER_MANUAL = "manual_captions"
+TIER_AUTO = "auto_captions"
+TIER_GEMINI = "gemini"
+TIER_NONE = "none"
+TRANSCRIPT_TIERS = [TIER_MANUAL, TIER_AUTO, TIER_GEMINI, TIER_NONE]
+
+# The analysis prompt only ever uses this many characters of a transcript.
+ANALYSIS_CHAR_BUDGET = 15000
+TRANSCRIPT_PROMPT = "Provide a full and accurate transcript of the audio in this video."
+
+# Segmented transcription: videos longer than one segment are split into overlapping time ranges. Clipping a
+# video to a time range needs the google-genai SDK; google-generativeai's Part has no video_metadata field.
+SEGMENT_SECONDS = 600
+SEGMENT_TIMEOUT_MS = 600_000
+SEGMENT_OVERLAP_SECONDS = 15
+SPOKEN_CHARS_PER_SECOND = 15 # Rough speech rate, used to skip segments past the character budget
+
+def extract_video_id(url):
+    patterns = [
+        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([^&]+)',
+        r'(?:https?://)?youtu\.be/([^?&]+)',
+        r'(?:https?://)?(?:www\.)?youtube\.com/embed/([^?&]+)'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    raise ValueError(f"Invalid or unsupported YouTube URL format: {url}")
+
+def preferred_languages(hl: str) -> list:
+    """
+    Returns the caption languages to try, the requested UI language first and English as a fallback.
+    """
+    languages = []
+    for code in [hl, "en"]:
+        if code and code not in languages:
+            languages.append(code)
+    return languages
+
+async def stream_transcript_with_gemini(model, url: str, max_chars: int) -> tuple:
+    """
+    Streams a Gemini transcript and stops reading once `max_chars` characters have arrived.
+    The SDK has no public way to abort the generation, so `max_output_tokens` is what caps the output spend.
+    Returns (transcript_text, truncated).
+    """
+    response = await model.generate_content_async(
+        [TRANSCRIPT_PROMPT, url],
+        stream=True,
+        # Roughly two characters per token, so the server stops near `max_chars` on its own.
+        generation_config={"max_output_tokens": max_chars // 2},
+        request_options={"timeout": 600}
+    )
+    parts = []
+    received = 0
+    truncated = False
+    async for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue # Chunk carries only metadata (e.g. the finish reason)
+        parts.append(text)
+        received += len(text)
+        if received >= max_chars:
+            truncated = True
+            break
+    return "".join(parts).replace('\n', ' ')[:max_chars], truncated
+
+async def fetch_transcript_with_gemini(video_data: dict, semaphore: asyncio.Semaphore, model, max_chars: int = None) -> dict:
+    """
+    Fetches a video transcript using the Gemini model, retried through the shared resilience layer.
+    When `max_chars` is set the transcript is streamed and cut off at that length.
+    """
+    async with semaphore:
+        url = video_data['link']
+        title = video_data['title']
+        print(f"📄 Retriving context with Gemini for: \"{title}\"")
+
+        try:
+            if max_chars:
+                transcript_text, truncated = await call_with_retries("gemini", stream_transcript_with_gemini, model, url, max_chars, base_delay=5)
+            else:
+                response = await call_with_retries("gemini", model.generate_content_async, [TRANSCRIPT_PROMPT, url],
+                                                   request_options={"timeout": 600}, base_delay=5)
+                transcript_text, truncated = response.text.replace('\n', ' '), False
+        except Exception as e:
+            print(f"❌ Gemini transcription failed for \"{title}\": {e}")
+            try:
+                video_id = extract_video_id(url)
+            except ValueError:
+                video_id = "unknown"
+            return {"title": title, "video_url": url, "video_id": video_id, "status": "Failed", "error": str(e)}
+
+        if truncated:
+            print(f"✂️ Truncated Gemini transcript for \"{title}\" to {max_chars} characters.")
+        video_id = extract_video_id(url)
+        return {"title": title, "video_url": url, "video_id": video_id, "status": "Success", "transcript": transcript_text, "transcript_truncated": truncated}
+
+def parse_duration(length) -> int:
+    """
+    Parses a YouTube length string such as "12:34" or "1:02:03" into seconds. Returns None if unknown.
+    """
+    if not length or not isinstance(length, str):
+        return None
+    try:
+        parts = [int(part) for part in length.strip().split(":")]
+    except ValueError:
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+def plan_segments(duration: int, segment_seconds: int = SEGMENT_SECONDS, overlap_seconds: int = SEGMENT_OVERLAP_SECONDS,
+                  max_chars: int = None) -> list:
+    """
+    Splits a video of `duration` seconds into (start, end) ranges that overlap by `overlap_seconds`.
+    With `max_chars`, ranges beyond what the character budget can use are dropped.
+    """
+    segments = []
+    start = 0
+    while start < duration:
+        end = min(start + segment_seconds, duration)
+        segments.append((max(0, start - overlap_seconds), end))
+        start = end
+    if max_chars:
+        needed = math.ceil(max_chars / (SPOKEN_CHARS_PER_SECOND * segment_seconds))
+        segments = segments[:max(1, needed)]
+    return segments
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+def stitch_segments(texts: list, max_overlap_words: int = 80, min_overlap_words: int = 3) -> str:
+    """
+    Joins segment transcripts in order, dropping the words that the overlapping time ranges repeated.
+    """
+    words = []
+    for text in texts:
+        next_words = text.split()
+        if not next_words:
+            continue
+        tail = [_normalize_word(w) for w in words[-max_overlap_words:]]
+        head = [_normalize_word(w) for w in next_words[:max_overlap_words]]
+        overlap = 0
+        for size in range(min(len(tail), len(head)), min_overlap_words - 1, -1):
+            if tail[-size:] == head[:size]:
+                overlap = size
+                break
+        words.extend(next_words[overlap:])
+    return " ".join(words)
+
+def new_segment_client(api_key: str) -> google_genai.Client:
+    return google_genai.Client(api_key=api_key, http_options=genai_types.HttpOptions(timeout=SEGMENT_TIMEOUT_MS))
+
+def segment_request(url: str, start: int, end: int) -> genai_types.Content:
+    """
+    Request contents for transcribing the `start`-`end` seconds of a YouTube video.
+    """
+    video_part = genai_types.Part(file_data=genai_types.FileData(file_uri=url),
+                                  video_metadata=genai_types.VideoMetadata(start_offset=f"{start}s", end_offset=f"{end}s"))
+    return genai_types.Content(role="user", parts=[video_part, genai_types.Part(text=TRANSCRIPT_PROMPT)])
+
+async def transcribe_segment(client: google_genai.Client, model_name: str, url: str, start: int, end: int,
+                             semaphore: asyncio.Semaphore) -> str:
+    async with semaphore:
+        response = await call_with_retries("gemini", client.aio.models.generate_content, model=model_name,
+                                           contents=segment_request(url, start, end), base_delay=5)
+        return (response.text or "").replace('\n', ' ')
+
+async def fetch_segmented_transcript_with_gemini(video_data: dict, semaphore: asyncio.Semaphore, client: google_genai.Client,
+                                                 model_name: str, duration: int, segment_seconds: int = SEGMENT_SECONDS,
+                                                 max_chars: int = None) -> dict:
+    """
+    Transcribes a long video as concurrent time-range segments under the shared Gemini semaphore,
+    then stitches them back together in order. `client` is a google-genai client (see `new_segment_client`).
+    """
+    url = video_data['link']
+    title = video_data['title']
+    video_id = extract_video_id(url)
+    all_segments = plan_segments(duration, segment_seconds)
+    segments = plan_segments(duration, segment_seconds, max_chars=max_chars)
+    print(f"📄 Transcribing \"{title}\" with Gemini in {len(segments)} segment(s) of {segment_seconds}s")
+
+    segment_tasks = [transcribe_segment(client, model_name, url, start, end, semaphore) for start, end in segments]
+    segment_results = await asyncio.gather(*segment_tasks, return_exceptions=True)
+    errors = [r for r in segment_results if isinstance(r, Exception)]
+    texts = [r if isinstance(r, str) else "" for r in segment_results]
+    if len(errors) == len(segment_results):
+        print(f"❌ All segments failed for \"{title}\": {errors[0]}")
+        return {"title": title, "video_url": url, "video_id": video_id, "status": "Failed", "error": str(errors[0])}
+    if errors:
+        print(f"⚠️ {len(errors)} of {len(segments)} segments failed for \"{title}\"; transcript has gaps.")
+
+    transcript_text = await get_cpu_executor().run(stitch_segments, texts)
+    truncated = len(segments) < len(all_segments)
+    if max_chars and len(transcript_text) > max_chars:
+        transcript_text, truncated = transcript_text[:max_chars], True
+    return {"title": title, "video_url": url, "video_id": video_id, "status": "Success", "transcript": transcript_text,
+            "transcript_truncated": truncated, "transcript_segments": len(segments)}
+
+async def resolve_transcript(video_data: dict, caption_fetcher, gemini_semaphore: asyncio.Semaphore,
+                             model, tier_stats: dict, languages: list, gemini_max_chars: int = None,
+                             segment_seconds: int = None, budget=None, segment_client: google_genai.Client = None) -> dict:
+    """
+    Resolves a transcript through the tiers: manual captions, auto-generated captions, then Gemini.
+    Records which tier served the video in `tier_stats` and on the result as `transcript_source`.
+    With `segment_seconds` and a google-genai `segment_client`, videos longer than one segment are
+    transcribed by Gemini in parallel segments.
+    With a `budget`, the Gemini tier is only used if its estimated cost fits, and is charged by estimate.
+    """
+    url = video_data['link']
+    title = video_data['title']
+    try:
+        video_id = extract_video_id(url)
+    except ValueError as e:
+        tier_stats[TIER_NONE] += 1
+        return {"title": title, "video_url": url, "video_id": "unknown", "status": "Failed", "error": str(e), "transcript_source": TIER_NONE}
+
+    print(f"📄 Looking up captions for: \"{title}\"")
+    try:
+        tier, transcript_text = await caption_fetcher.fetch(video_id, languages)
+    except Exception as e:
+        print(f"⚠️ Caption lookup failed for \"{title}\": {e}")
+        tier, transcript_text = None, None
+
+    if tier:
+        tier_stats[tier] += 1
+        return {"title": title, "video_url": url, "video_id": video_id, "status": "Success", "transcript": transcript_text,
+                "transcript_truncated": False, "transcript_source": tier}
+
+    if model is None:
+        tier_stats[TIER_NONE] += 1
+        return {"title": title, "video_url": url, "video_id": video_id, "status": "Failed", "error": "No captions available.", "transcript_source": TIER_NONE}
+
+    duration = parse_duration(video_data.get('length'))
+    if budget:
+        estimate = estimate_video_transcription(duration, gemini_max_chars or ANALYSIS_CHAR_BUDGET)
+        if not budget.can_afford(estimate):
+            print(f"💸 Budget too low for Gemini transcription of \"{title}\"")
+            tier_stats[TIER_NONE] += 1
+            return {"title": title, "video_url": url, "video_id": video_id, "status": "Failed", "error": "Transcription skipped: budget exhausted.", "transcript_source": TIER_NONE}
+        budget.record("gemini_transcription", input_tokens=estimate["tokens"], cost_usd=estimate["cost_usd"])
+    if segment_seconds and segment_client and duration and duration > segment_seconds:
+        result = await fetch_segmented_transcript_with_gemini(video_data, gemini_semaphore, segment_client,
+                                                              model.model_name.removeprefix("models/"), duration,
+                                                              segment_seconds, max_chars=gemini_max_chars)
+    else:
+        result = await fetch_transcript_with_gemini(video_data, gemini_semaphore, model, max_chars=gemini_max_chars)
+    tier = TIER_GEMINI if result.get("status") == "Success" else TIER_NONE
+    tier_stats[tier] += 1
+    result["transcript_source"] = tier
+    return result
+
+def new_tier_stats() -> dict:
+    return {tier: 0 for tier in TRANSCRIPT_TIERS}
+
+def summarize_tier_stats(tier_stats: dict) -> dict:
+    """
+    Converts raw tier counts into hit rates and prints a one-line summary per tier.
+    """
+    total = sum(tier_stats.values())
+    summary = {}
+    for tier in TRANSCRIPT_TIERS:
+        count = tier_stats.get(tier, 0)
+        rate = count / total if total else 0.0
+        summary[tier] = {"count": count, "rate": round(rate, 3)}
+        print(f"   {tier:<16} {count:>4} ({rate:.0%})")
+    return summary
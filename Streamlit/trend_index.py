@@ -0,0 +1,183 @@
+import math
+import re
+import time
+
+# Cross-platform trend index: normalized tokens and bigrams -> trend keys, built incrementally as each source
+# is fetched. Answers "which platforms carry this topic" with set intersections and merges records that
+# share distinctive terms into a cross-platform leaderboard.
+PLATFORMS = ["google", "youtube", "tiktok", "twitter", "pinterest"]
+MIN_LINK_SCORE = 2.5 # IDF-weighted shared-term score for two records on different platforms to be the same topic
+COMMON_TERM_SHARE = 0.3 # Terms in more than this share of records are too common to link topics
+CROSS_PLATFORM_BOOST = 0.5 # Priority multiplier per additional platform carrying the topic
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "how", "i", "in", "is",
+    "it", "its", "me", "my", "new", "of", "on", "or", "our", "so", "that", "the", "this", "to", "vs", "was", "we",
+    "what", "when", "who", "why", "will", "with", "you", "your", "fyp", "foryou", "foryoupage", "viral", "tiktok",
+    "video", "official", "live", "news", "today", "shorts",
+}
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_WORD = re.compile(r"[^\W_]+", re.UNICODE)
+
+def normalize_tokens(text: str) -> list:
+    """
+    Lower-cased word tokens without URLs, stopwords or single characters; hashtags keep their word.
+    """
+    words = _WORD.findall(_URL.sub(" ", (text or "").lower()))
+    return [w for w in words if len(w) > 1 and w not in STOPWORDS and not w.isdigit()]
+
+def index_terms(text: str) -> set:
+    tokens = normalize_tokens(text)
+    return set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+
+def trend_record(platform: str, trend_id: str, text: str, rank: int = None, volume: float = None, url: str = None) -> dict:
+    return {"key": f"{platform}:{trend_id}", "platform": platform, "trend_id": str(trend_id), "text": text,
+            "rank": rank, "volume": volume, "url": url}
+
+def records_from_google_trends(trends_data: dict) -> list:
+    records = []
+    for rank, trend in enumerate(trends_data.get("trends") or []):
+        text = " ".join([trend.get("query", "")] + (trend.get("keywords") or [])[:5])
+        records.append(trend_record("google", trend.get("query") or rank, text, rank, trend.get("search_volume")))
+    return records
+
+def records_from_youtube(videos: list) -> list:
+    return [trend_record("youtube", video.get("video_id") or video.get("link"), video.get("title", ""), rank,
+                         url=video.get("video_url") or video.get("link"))
+            for rank, video in enumerate(videos)]
+
+def records_from_tiktok(processed: list) -> list:
+    """
+    Records from `preprocess_tiktok_data` output ({"video_number", "description", "link"}).
+    """
+    return [trend_record("tiktok", item.get("video_id") or item["video_number"], item.get("description", ""),
+                         item["video_number"] - 1, item.get("play_count"), item.get("link"))
+            for item in processed if item.get("description")]
+
+def records_from_twitter(items: list) -> list:
+    records = []
+    for rank, item in enumerate(items):
+        name = item.get("trend") or item.get("name") or item.get("title") or ""
+        if name:
+            records.append(trend_record("twitter", name, name.lstrip("#"), item.get("rank", rank), item.get("volume")))
+    return records
+
+class TrendIndex:
+    def __init__(self):
+        self.records = {}
+        self.terms = {}
+        self.postings = {}
+
+    def add(self, records: list) -> int:
+        """
+        Adds (or replaces) records; returns how many were added.
+        """
+        for record in records:
+            key = record["key"]
+            if key in self.records:
+                self._remove(key)
+            terms = index_terms(record["text"])
+            self.records[key] = {**record, "indexed_at": time.time()}
+            self.terms[key] = terms
+            for term in terms:
+                self.postings.setdefault(term, set()).add(key)
+        return len(records)
+
+    def _remove(self, key: str):
+        for term in self.terms.pop(key, ()):
+            keys = self.postings.get(term)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[term]
+        self.records.pop(key, None)
+
+    def idf(self, term: str) -> float:
+        return math.log((1 + len(self.records)) / (1 + len(self.postings.get(term, ()))))
+
+    def lookup(self, topic: str) -> list:
+        """
+        Keys of records containing every token of `topic`.
+        """
+        tokens = normalize_tokens(topic)
+        if not tokens:
+            return []
+        postings = sorted((self.postings.get(token, set()) for token in tokens), key=len)
+        return list(set.intersection(*postings)) if postings[0] else []
+
+    def platforms_for(self, topic: str) -> dict:
+        """
+        Which platforms carry this topic: {platform: [record, ...]}.
+        """
+        found = {}
+        for key in self.lookup(topic):
+            record = self.records[key]
+            found.setdefault(record["platform"], []).append(record)
+        return found
+
+    def _distinctive(self, key: str) -> set:
+        limit = max(2, COMMON_TERM_SHARE * len(self.records))
+        return {term for term in self.terms.get(key, ()) if len(self.postings.get(term, ())) <= limit}
+
+    def related(self, key: str) -> dict:
+        """
+        Records on other platforms sharing distinctive terms with `key`, as {other_key: link_score}.
+        """
+        platform = self.records[key]["platform"]
+        scores = {}
+        for term in self._distinctive(key):
+            weight = self.idf(term) * (1.5 if " " in term else 1.0)
+            for other in self.postings[term]:
+                if self.records[other]["platform"] != platform:
+                    scores[other] = scores.get(other, 0.0) + weight
+        return {other: score for other, score in scores.items() if score >= MIN_LINK_SCORE}
+
+    def topics(self) -> list:
+        """
+        Groups records into cross-platform topics (connected components of `related` links).
+        """
+        parent = {key: key for key in self.records}
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+        for key in self.records:
+            for other in self.related(key):
+                parent[find(other)] = find(key)
+        groups = {}
+        for key in self.records:
+            groups.setdefault(find(key), []).append(self.records[key])
+        return list(groups.values())
+
+    def platform_count(self, key: str) -> int:
+        return 1 + len({self.records[other]["platform"] for other in self.related(key)})
+
+    def priority_boost(self, key: str) -> float:
+        """
+        Multiplier for a trend's scheduling priority: topics confirmed on more platforms go first.
+        """
+        if key not in self.records:
+            return 1.0
+        return 1.0 + CROSS_PLATFORM_BOOST * (self.platform_count(key) - 1)
+
+    def leaderboard(self, top: int = 20, min_platforms: int = 1) -> list:
+        """
+        Merged cross-platform ranking. Each record contributes 1 / (1 + rank) on its platform; a topic scores
+        its best record per platform, summed over platforms, so breadth across platforms ranks highest.
+        """
+        board = []
+        for group in self.topics():
+            best = {}
+            for record in group:
+                score = 1.0 / (1 + (record["rank"] or 0))
+                if score > best.get(record["platform"], (0.0, None))[0]:
+                    best[record["platform"]] = (score, record)
+            if len(best) < min_platforms:
+                continue
+            shared = set.intersection(*(self.terms[record["key"]] for _, record in best.values())) if len(best) > 1 else set()
+            label = max(shared, key=lambda term: (self.idf(term), len(term)), default=None) or max(best.values(), key=lambda pair: pair[0])[1]["text"][:80]
+            board.append({"topic": label, "platforms": sorted(best), "score": round(sum(score for score, _ in best.values()), 3),
+                          "records": [{"platform": platform, "text": record["text"][:200], "rank": record["rank"], "url": record["url"]}
+                                      for platform, (_, record) in sorted(best.items())]})
+        board.sort(key=lambda entry: (-len(entry["platforms"]), -entry["score"]))
+        return board[:top]
@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import json
+import os
+import numpy as np
+from apify_client import ApifyClientAsync
+from dotenv import load_dotenv
+from resilience import run_apify_actor
+
+# Interest over time for many search terms via the Apify Google Trends scraper. Terms are packed into
+# multi-term actor runs (TERMS_PER_RUN each, scraped independently so every series keeps its own 0-100 scale),
+# the runs go concurrently, and the per-term series are unpacked into one terms x time float32 array.
+GOOGLE_TRENDS_ACTOR = "emastra/google-trends-scraper"
+TERMS_PER_RUN = 20
+RUN_CONCURRENCY = 5
+TERM_FIELDS = ["searchTerm", "inputUrlOrTerm", "term"]
+
+def trend_keywords(trends_data: dict, per_trend: int = 1) -> list:
+    """
+    Search terms from a google_trends_trending_now response: each trend's query plus its first `per_trend`
+    keywords (those `generate_trend_queries` uses), without duplicates.
+    """
+    terms = []
+    for trend in trends_data.get("trends") or []:
+        terms.extend(([trend["query"]] if trend.get("query") else []) + (trend.get("keywords") or [])[:per_trend])
+    return unique_terms(terms)
+
+def unique_terms(terms: list) -> list:
+    seen = set()
+    unique = []
+    for term in terms:
+        key = term.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(term.strip())
+    return unique
+
+def batch_terms(terms: list, terms_per_run: int = TERMS_PER_RUN) -> list:
+    return [terms[start:start + terms_per_run] for start in range(0, len(terms), terms_per_run)]
+
+def interest_run_input(terms: list, geo: str, time_range: str) -> dict:
+    return {"searchTerms": terms, "isMultiple": False, "geo": geo, "timeRange": time_range,
+            "viewedFrom": geo.lower(), "isPublic": False, "skipDebugScreen": True}
+
+async def fetch_interest_batch(client: ApifyClientAsync, terms: list, geo: str, time_range: str, semaphore: asyncio.Semaphore) -> list:
+    async with semaphore:
+        print(f"Starting the Google Trends scraper for {len(terms)} terms...")
+        actor_run = await run_apify_actor(client, GOOGLE_TRENDS_ACTOR, interest_run_input(terms, geo, time_range))
+        if not actor_run:
+            raise RuntimeError(f"Google Trends actor run for {len(terms)} terms did not finish")
+        return [item async for item in client.dataset(actor_run["defaultDatasetId"]).iterate_items()]
+
+def unpack_interest(items: list, terms: list) -> dict:
+    """
+    {"terms": [...], "times": int64 unix seconds (T), "values": float32 (N x T, NaN where a term has no point)}
+    from the actor's per-term interestOverTime_timelineData.
+    """
+    index = {term.lower(): i for i, term in enumerate(terms)}
+    rows, times, values = [], [], []
+    for item in items:
+        term = next((item[field] for field in TERM_FIELDS if item.get(field)), "")
+        row = index.get(str(term).strip().lower())
+        timeline = item.get("interestOverTime_timelineData") or []
+        if row is None or not timeline:
+            continue
+        rows.extend([row] * len(timeline))
+        times.extend(int(point.get("time", 0)) for point in timeline)
+        values.extend((point.get("value") or [np.nan])[0] for point in timeline)
+    if not rows:
+        return {"terms": terms, "times": np.empty(0, dtype=np.int64), "values": np.full((len(terms), 0), np.nan, dtype=np.float32)}
+    unique_times, columns = np.unique(np.array(times, dtype=np.int64), return_inverse=True)
+    matrix = np.full((len(terms), len(unique_times)), np.nan, dtype=np.float32)
+    matrix[np.array(rows), columns] = np.array(values, dtype=np.float32)
+    return {"terms": terms, "times": unique_times, "values": matrix}
+
+def interest_summary(interest: dict) -> list:
+    """
+    Per-term latest value, peak and mean, computed across the whole array at once.
+    """
+    has_data = np.isfinite(interest["values"]).any(axis=1) if interest["values"].shape[1] else np.zeros(len(interest["terms"]), dtype=bool)
+    values = interest["values"][has_data]
+    if not len(values):
+        return []
+    present = np.isfinite(values)
+    last = values.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+    latest = values[np.arange(len(values)), last]
+    peak = np.nanmax(values, axis=1)
+    mean = np.nanmean(values, axis=1)
+    terms = [term for term, keep in zip(interest["terms"], has_data) if keep]
+    return [{"term": term, "latest": float(latest[i]), "peak": float(peak[i]), "mean": round(float(mean[i]), 2)}
+            for i, term in enumerate(terms)]
+
+async def collect_interest_over_time(api_key: str, terms: list, geo: str = "NZ", time_range: str = "now 1-d",
+                                     terms_per_run: int = TERMS_PER_RUN, concurrency: int = RUN_CONCURRENCY) -> dict:
+    """
+    Interest over time for every term, packed `terms_per_run` terms per actor run with at most `concurrency`
+    runs at once. Returns the `unpack_interest` arrays plus "runs" and "failed_terms".
+    """
+    terms = unique_terms(terms)
+    batches = batch_terms(terms, terms_per_run)
+    client = ApifyClientAsync(api_key)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(fetch_interest_batch(client, batch, geo, time_range, semaphore) for batch in batches),
+                                   return_exceptions=True)
+    items, failed = [], []
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            print(f"❌ Google Trends run for {len(batch)} terms failed: {result}")
+            failed.extend(batch)
+        else:
+            items.extend(result)
+    interest = unpack_interest(items, terms)
+    covered = int(np.isfinite(interest["values"]).any(axis=1).sum())
+    print(f"✅ Interest over time for {covered} of {len(terms)} terms from {len(batches)} actor runs.")
+    return {**interest, "runs": len(batches), "failed_terms": failed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect Google Trends interest over time for many terms via Apify.")
+    parser.add_argument("terms", nargs="*", help="Search terms; with --from-trending, the current trending-now keywords are added.")
+    parser.add_argument("--geo", default="NZ")
+    parser.add_argument("--time-range", default="now 1-d")
+    parser.add_argument("--from-trending", metavar="TIME", help="Add keywords from the trending-now list for this window, e.g. past_24_hours.")
+    parser.add_argument("--per-trend", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON here instead of stdout.")
+    args = parser.parse_args()
+    load_dotenv()
+    terms = list(args.terms)
+    if args.from_trending:
+        from google_analyzer import fetch_google_trends
+        terms += trend_keywords(fetch_google_trends(os.getenv("SearchAPI_KEY"), args.geo, args.from_trending), args.per_trend)
+    interest = asyncio.run(collect_interest_over_time(os.getenv("APIFY_KEY"), terms, args.geo, args.time_range))
+    collected = {"terms": interest["terms"], "times": interest["times"].tolist(),
+                 "values": [[None if np.isnan(v) else float(v) for v in row] for row in interest["values"]],
+                 "summary": interest_summary(interest), "runs": interest["runs"], "failed_terms": interest["failed_terms"]}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(collected, f, ensure_ascii=False)
+        print(f"✅ Saved to {args.output}")
+    else:
+        print(json.dumps(collected, ensure_ascii=False, indent=4))
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from aiohttp import web
+from dotenv import load_dotenv
+from google_analyzer import run_google_analysis_pipeline
+from youtube_analyzer import run_youtube_analysis_pipeline
+from caption_fetcher import proxies_from_env
+from cpu_pool import dumps_offloaded
+from budget import BudgetManager
+from trend_index import TrendIndex
+from history_store import HistoryStore
+from snapshot_store import SnapshotStore
+from pipeline_report import RunOptions
+
+# HTTP API over the analysis pipelines. Identical concurrent requests share one in-flight run (single-flight),
+# finished reports are served from a cache for CACHE_TTL_SECONDS, and callers that do not want to wait get a
+# job id whose progress they can stream:
+#   GET /trends/google?geo=NZ&time=past_24_hours[&news=1][&deadline=120][&wait=1]
+#   GET /trends/youtube?gl=NZ&hl=en&limit=10[&mode=fused][&deadline=120][&wait=1]
+#   GET /jobs/{job_id}            status, progress so far and, once done, the report
+#   GET /jobs/{job_id}/events     progress as newline-delimited JSON until the job finishes
+#   GET /search?q=topic           full-text search over past reports
+CACHE_TTL_SECONDS = int(os.getenv("TREND_CACHE_TTL", "900"))
+JOB_RETENTION_SECONDS = 3600
+ANALYSIS_MODES = ("two_hop", "fused")
+
+class Job:
+    def __init__(self, key: tuple):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.status = "running"
+        self.events = []
+        self.result = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.changed = asyncio.Condition()
+        self.task = None
+        self.pending_emits = set()
+
+    async def emit(self, stage: str, detail: dict):
+        async with self.changed:
+            self.events.append({"stage": stage, "detail": detail, "elapsed_seconds": round(time.time() - self.started_at, 2)})
+            self.changed.notify_all()
+
+    def progress_callback(self):
+        # The pipelines call progress synchronously; the event is recorded from a task on the same loop.
+        # The tasks are kept so the final event can wait for them and always comes last.
+        def progress(stage, detail):
+            task = asyncio.create_task(self.emit(stage, detail))
+            self.pending_emits.add(task)
+            task.add_done_callback(self.pending_emits.discard)
+        return progress
+
+    def describe(self) -> dict:
+        return {"job_id": self.id, "status": self.status, "params": dict(self.key[1]), "source": self.key[0],
+                "events": self.events, "error": self.error}
+
+class TrendService:
+    """
+    Runs each distinct request at most once at a time and caches finished reports by request parameters.
+    """
+
+    def __init__(self, keys: dict, cache_ttl: float = CACHE_TTL_SECONDS):
+        self.keys = keys
+        self.cache_ttl = cache_ttl
+        self.cache = {}
+        self.in_flight = {}
+        self.jobs = {}
+        self.stats = {"cache_hits": 0, "coalesced": 0, "runs": 0}
+        self.trend_index = TrendIndex()
+        self.history = HistoryStore()
+        self.snapshots = SnapshotStore()
+
+    def _run_pipeline(self, source: str, params: dict, progress):
+        options = RunOptions(deadline_seconds=params["deadline"], budget=BudgetManager(), trend_index=self.trend_index,
+                             history=self.history, snapshots=self.snapshots, progress=progress)
+        if source == "google":
+            return run_google_analysis_pipeline(
+                searchapi_key=self.keys["searchapi"], firecrawl_api_key=self.keys["firecrawl"], openai_api_key=self.keys["openai"],
+                geo=params["geo"], time=params["time"], gemini_api_key=self.keys["gemini"], news=params["news"],
+                options=options)
+        return run_youtube_analysis_pipeline(
+            searchapi_key=self.keys["searchapi"], openai_api_key=self.keys["openai"], gemini_api_key=self.keys["gemini"],
+            gl=params["gl"], hl=params["hl"], video_limit=params["limit"], analysis_mode=params["mode"],
+            caption_proxies=self.keys["caption_proxies"], options=options)
+
+    def cached(self, key: tuple):
+        entry = self.cache.get(key)
+        if entry and time.time() - entry[0] < self.cache_ttl:
+            return entry
+        self.cache.pop(key, None)
+        return None
+
+    async def _execute(self, job: Job, source: str, params: dict):
+        try:
+            job.result = await self._run_pipeline(source, params, job.progress_callback())
+            job.status = "done"
+            # A deadline-cut report, or one with failed items, is not reused as a complete one
+            if job.result.get("final_report") and not job.result.get("partial") and not job.result.get("schedule", {}).get("failed"):
+                self.cache[job.key] = (time.time(), job.result)
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            self.in_flight.pop(job.key, None)
+            await asyncio.gather(*job.pending_emits, return_exceptions=True)
+            await job.emit(job.status, {})
+
+    def submit(self, source: str, params: dict) -> Job:
+        """
+        Returns the running job for these parameters, starting one only if none is in flight.
+        """
+        key = (source, tuple(sorted(params.items())))
+        job = self.in_flight.get(key)
+        if job:
+            self.stats["coalesced"] += 1
+            return job
+        self._prune_jobs()
+        job = Job(key)
+        self.in_flight[key] = job
+        self.jobs[job.id] = job
+        self.stats["runs"] += 1
+        job.task = asyncio.create_task(self._execute(job, source, params))
+        print(f"🚀 Started job {job.id} for {source} {params}")
+        return job
+
+    def _prune_jobs(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [j.id for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+async def json_response(data, status: int = 200) -> web.Response:
+    # Reports can be megabytes of scraped text; encode them off the event loop.
+    return web.Response(text=await dumps_offloaded(data, ensure_ascii=False), status=status, content_type="application/json")
+
+def request_params(request: web.Request, source: str) -> dict:
+    query = request.query
+    deadline = float(query.get("deadline", "0")) or None
+    if source == "google":
+        return {"geo": query.get("geo", "NZ").upper(), "time": query.get("time", "past_24_hours"),
+                "news": query.get("news") in ("1", "true"), "deadline": deadline}
+    mode = query.get("mode", "two_hop")
+    if mode not in ANALYSIS_MODES:
+        raise web.HTTPBadRequest(text=json.dumps({"error": f"Unknown mode '{mode}'; expected one of {', '.join(ANALYSIS_MODES)}."}),
+                                 content_type="application/json")
+    return {"gl": query.get("gl", "NZ").upper(), "hl": query.get("hl", "en").lower(),
+            "limit": int(query.get("limit", "10")), "mode": mode, "deadline": deadline}
+
+async def handle_trends(request: web.Request) -> web.Response:
+    service = request.app["service"]
+    source = request.match_info["source"]
+    try:
+        params = request_params(request, source)
+    except ValueError as e:
+        return await json_response({"error": str(e)}, status=400)
+    key = (source, tuple(sorted(params.items())))
+
+    entry = service.cached(key)
+    if entry:
+        service.stats["cache_hits"] += 1
+        return await json_response({"status": "done", "cached": True, "age_seconds": round(time.time() - entry[0], 1),
+                                    "params": params, "report": entry[1]})
+
+    job = service.submit(source, params)
+    if request.query.get("wait") in ("1", "true"):
+        await asyncio.shield(job.task)
+        if job.status == "failed":
+            return await json_response(job.describe(), status=502)
+        return await json_response({"status": "done", "cached": False, "job_id": job.id, "params": params, "report": job.result})
+    return await json_response({"job_id": job.id, "status": job.status,
+                                "status_url": f"/jobs/{job.id}", "events_url": f"/jobs/{job.id}/events"}, status=202)
+
+async def handle_job(request: web.Request) -> web.Response:
+    job = request.app["service"].jobs.get(request.match_info["job_id"])
+    if not job:
+        return await json_response({"error": "Unknown or expired job id."}, status=404)
+    body = job.describe()
+    if job.status == "done":
+        body["report"] = job.result
+    return await json_response(body)
+
+async def handle_job_events(request: web.Request) -> web.StreamResponse:
+    """
+    Streams the job's progress events as newline-delimited JSON, replaying earlier ones first.
+    """
+    job = request.app["service"].jobs.get(request.match_info["job_id"])
+    if not job:
+        return await json_response({"error": "Unknown or expired job id."}, status=404)
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    sent = 0
+    finished = False
+    while not finished:
+        async with job.changed:
+            if sent == len(job.events):
+                await job.changed.wait()
+            pending = job.events[sent:]
+        for event in pending:
+            await response.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+            finished = finished or event["stage"] in ("done", "failed")
+        sent += len(pending)
+    await response.write_eof()
+    return response
+
+async def handle_search(request: web.Request) -> web.Response:
+    """
+    Full-text search over past reports: /search?q=topic[&source=google][&limit=20]. With history=1, returns
+    when the topic last trended and the most recent analyses instead of ranked matches.
+    """
+    history = request.app["service"].history
+    text = request.query.get("q", "")
+    if request.query.get("history") in ("1", "true"):
+        return await json_response(await asyncio.to_thread(history.topic_history, text))
+    results = await asyncio.to_thread(history.search, text, request.query.get("source"), int(request.query.get("limit", "20")))
+    return await json_response({"query": text, "results": results})
+
+async def handle_health(request: web.Request) -> web.Response:
+    service = request.app["service"]
+    return await json_response({"status": "ok", "in_flight": len(service.in_flight), "cached": len(service.cache), **service.stats})
+
+def create_app(keys: dict = None, cache_ttl: float = CACHE_TTL_SECONDS) -> web.Application:
+    if keys is None:
+        load_dotenv()
+        keys = {"searchapi": os.getenv("SearchAPI_KEY"), "firecrawl": os.getenv("FIRECRAWL_API_KEY"),
+                "openai": os.getenv("OPENAI_API_KEY"), "gemini": os.getenv("GEMINI_API_KEY"),
+                "caption_proxies": proxies_from_env(os.getenv("YOUTUBE_PROXIES"))}
+    app = web.Application()
+    app["service"] = TrendService(keys, cache_ttl)
+    app.router.add_get(r"/trends/{source:google|youtube}", handle_trends)
+    app.router.add_get("/jobs/{job_id}", handle_job)
+    app.router.add_get("/jobs/{job_id}/events", handle_job_events)
+    app.router.add_get("/search", handle_search)
+    app.router.add_get("/health", handle_health)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP service for Google and YouTube trend analysis.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cache-ttl", type=float, default=CACHE_TTL_SECONDS, help="Seconds a finished report stays fresh.")
+    args = parser.parse_args()
+    web.run_app(create_app(cache_ttl=args.cache_ttl), host=args.host, port=args.port)
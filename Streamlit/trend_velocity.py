@@ -0,0 +1,116 @@
+import argparse
+import time
+import numpy as np
+from snapshot_store import SnapshotStore, SNAPSHOT_DB_PATH
+
+# Trend momentum over snapshot history, vectorised across topics: rank deltas, velocity and acceleration of a
+# normalized popularity signal, and an exponentially weighted z-score of the latest snapshot against each
+# topic's own history. Only the last WINDOW_SECONDS are loaded, so the cost stays bounded as history grows.
+WINDOW_SECONDS = 7 * 24 * 3600
+EWMA_HALF_LIFE = 8 # Snapshots; two hours at a 15-minute cadence
+VAR_FLOOR = 0.01 # Signal is in [0, 1]; keeps a flat history from turning a small move into a huge z-score
+RISING_Z = 2.0
+MIN_SNAPSHOTS = 3 # With fewer, every topic looks new and nothing is flagged
+RISING_BOOST = 1.0 # Scheduling priority multiplier added for a rising-fast topic
+
+def popularity_signal(ranks: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+    """
+    Popularity in [0, 1] per topic and snapshot, 0 when off the list: log volume relative to the largest
+    when the source reports volumes, else 1 / (1 + rank).
+    """
+    if np.isfinite(volumes).any():
+        logs = np.log1p(np.nan_to_num(volumes, nan=0.0))
+        return logs / max(logs.max(), 1e-9)
+    return np.nan_to_num(1.0 / (1.0 + ranks), nan=0.0)
+
+def ewma_zscores(signal: np.ndarray, half_life: float = EWMA_HALF_LIFE) -> np.ndarray:
+    """
+    z-score of each snapshot against the exponentially weighted mean and variance of the snapshots before it.
+    Loops over time only; every step is vectorised over all topics. The first column is 0.
+    """
+    alpha = 1.0 - 0.5 ** (1.0 / half_life)
+    z = np.zeros_like(signal)
+    if signal.shape[1] == 0:
+        return z
+    mean = signal[:, 0].copy()
+    var = np.zeros(signal.shape[0])
+    for t in range(1, signal.shape[1]):
+        deviation = signal[:, t] - mean
+        z[:, t] = deviation / np.sqrt(var + VAR_FLOOR)
+        mean += alpha * deviation
+        var = (1.0 - alpha) * (var + alpha * deviation ** 2)
+    return z
+
+def momentum_arrays(snapshots: dict, half_life: float = EWMA_HALF_LIFE, rising_z: float = RISING_Z) -> dict:
+    """
+    Latest-snapshot momentum for every topic in `SnapshotStore.load` output, as arrays aligned with "topics".
+    Velocity and acceleration are per hour; a negative rank delta means the topic climbed.
+    """
+    ranks, times = snapshots["ranks"], snapshots["times"]
+    n, t = ranks.shape
+    signal = popularity_signal(ranks, snapshots["volumes"])
+    hours = np.diff(times) / 3600.0
+    velocity = np.diff(signal, axis=1) / hours if t > 1 else np.zeros((n, 0))
+    acceleration = np.diff(velocity, axis=1) / hours[1:] if t > 2 else np.zeros((n, 0))
+    z = ewma_zscores(signal, half_life)
+
+    present = np.isfinite(ranks[:, -1]) if t else np.zeros(n, dtype=bool)
+    last_velocity = velocity[:, -1] if t > 1 else np.zeros(n)
+    last_z = z[:, -1] if t else np.zeros(n)
+    return {
+        "present": present,
+        "is_new": present & ~np.isfinite(ranks[:, :-1]).any(axis=1) if t > 1 else present,
+        "rank": ranks[:, -1] if t else np.full(n, np.nan),
+        "rank_delta": ranks[:, -1] - ranks[:, -2] if t > 1 else np.full(n, np.nan),
+        "velocity": last_velocity,
+        "acceleration": acceleration[:, -1] if t > 2 else np.zeros(n),
+        "z": last_z,
+        "rising": present & (last_z >= rising_z) & (last_velocity > 0) & (t >= MIN_SNAPSHOTS),
+    }
+
+def trend_momentum(store: SnapshotStore, source: str, region: str, window_seconds: float = WINDOW_SECONDS,
+                   half_life: float = EWMA_HALF_LIFE, rising_z: float = RISING_Z) -> dict:
+    """
+    {topic: {"rank", "rank_delta", "velocity", "acceleration", "z", "is_new", "rising"}} for the topics on the
+    latest snapshot of this source and region.
+    """
+    snapshots = store.load(source, region, since=time.time() - window_seconds)
+    if not snapshots["topics"]:
+        return {}
+    arrays = momentum_arrays(snapshots, half_life, rising_z)
+    momentum = {}
+    for i in np.flatnonzero(arrays["present"]):
+        delta = arrays["rank_delta"][i]
+        momentum[snapshots["topics"][i]] = {
+            "rank": int(arrays["rank"][i]), "rank_delta": None if np.isnan(delta) else int(delta),
+            "velocity": round(float(arrays["velocity"][i]), 4), "acceleration": round(float(arrays["acceleration"][i]), 4),
+            "z": round(float(arrays["z"][i]), 2), "is_new": bool(arrays["is_new"][i]), "rising": bool(arrays["rising"][i]),
+        }
+    return momentum
+
+def rising_topics(momentum: dict) -> list:
+    """
+    Topics flagged as rising fast, highest z-score first.
+    """
+    return sorted(({"topic": topic, **stats} for topic, stats in momentum.items() if stats["rising"]), key=lambda item: -item["z"])
+
+def momentum_boost(momentum: dict, topic: str) -> float:
+    """
+    Multiplier for a topic's scheduling priority: rising-fast topics are scraped and analyzed first.
+    """
+    stats = momentum.get(topic) if momentum else None
+    return 1.0 + RISING_BOOST if stats and stats["rising"] else 1.0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show rising-fast topics from the snapshot history.")
+    parser.add_argument("source", choices=["google", "youtube", "twitter"])
+    parser.add_argument("region", help="e.g. NZ/past_24_hours for Google, NZ/en for YouTube, new-zealand for Twitter")
+    parser.add_argument("--window-days", type=float, default=WINDOW_SECONDS / 86400)
+    parser.add_argument("--db", default=SNAPSHOT_DB_PATH)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    momentum = trend_momentum(SnapshotStore(args.db), args.source, args.region, args.window_days * 86400)
+    rising = rising_topics(momentum)
+    print(f"📈 {len(rising)} of {len(momentum)} current topics rising fast ({1000 * (time.perf_counter() - started):.1f} ms)")
+    for item in rising:
+        print(f"   z={item['z']:>6}  rank {item['rank'] + 1:>3} ({item['rank_delta'] if item['rank_delta'] is not None else 'new'})  {item['topic']}")
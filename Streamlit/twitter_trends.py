@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import json
+import os
+import numpy as np
+from apify_client import ApifyClientAsync
+from dotenv import load_dotenv
+from resilience import run_apify_actor
+from trend_index import TrendIndex, trend_record
+from snapshot_store import SnapshotStore
+
+# Twitter/X trends for many countries at once. Each country is one Apify actor run; runs go concurrently,
+# tweet-volume strings ("12.5K posts") are parsed in one vectorised pass, and the output is the common trend
+# record, optionally added to the trend index and recorded as a snapshot per country.
+TWITTER_TRENDS_ACTOR = "fastcrawler/x-twitter-trends-scraper-2025"
+COUNTRY_CONCURRENCY = 8
+NAME_FIELDS = ["trend", "name", "title", "topic"]
+VOLUME_FIELDS = ["volume", "tweet_volume", "tweet_count", "posts", "post_count", "tweets"]
+RANK_FIELDS = ["rank", "position"]
+URL_FIELDS = ["url", "link"]
+VOLUME_MULTIPLIERS = {"k": 1e3, "m": 1e6, "b": 1e9}
+
+def first_field(item: dict, names: list):
+    return next((item[name] for name in names if item.get(name) not in (None, "")), None)
+
+def parse_volumes(values: list) -> np.ndarray:
+    """
+    Parses tweet-volume strings ("12.5K posts", "1,234 tweets", "Under 10K posts", "2M", 5400 or None) into
+    floats in one vectorised pass; NaN where no volume is given.
+    """
+    if not len(values):
+        return np.empty(0)
+    text = np.char.lower(np.array(["" if value is None else str(value) for value in values], dtype=str))
+    text = np.char.strip(np.char.replace(np.char.replace(text, ",", ""), "under", ""))
+    number = np.char.partition(text, " ")[:, 0]
+    multipliers = np.ones(len(number))
+    for suffix, multiplier in VOLUME_MULTIPLIERS.items():
+        multipliers[np.char.endswith(number, suffix)] = multiplier
+    number = np.char.rstrip(number, "kmb")
+    numeric = np.char.isdigit(np.char.replace(number, ".", "", count=1))
+    volumes = np.full(len(number), np.nan)
+    volumes[numeric] = number[numeric].astype(float) * multipliers[numeric]
+    return volumes
+
+async def fetch_country_trends(client: ApifyClientAsync, country: str, semaphore: asyncio.Semaphore) -> list:
+    async with semaphore:
+        print(f"Starting the Twitter Trends scraper for '{country}'...")
+        actor_run = await run_apify_actor(client, TWITTER_TRENDS_ACTOR, {"country": country})
+        if not actor_run:
+            raise RuntimeError(f"Twitter Trends actor run for '{country}' did not finish")
+        return [item async for item in client.dataset(actor_run["defaultDatasetId"]).iterate_items()]
+
+def twitter_records(items_by_country: dict) -> list:
+    """
+    Common trend records ({"key", "platform", "trend_id", "text", "rank", "volume", "url"} plus "region")
+    from raw actor items per country; volumes are parsed for all countries together.
+    """
+    rows = []
+    for country, items in items_by_country.items():
+        for position, item in enumerate(items):
+            name = first_field(item, NAME_FIELDS)
+            if name:
+                rank = first_field(item, RANK_FIELDS)
+                rows.append((country, str(name).strip(), int(rank) - 1 if str(rank).isdigit() else position,
+                             first_field(item, VOLUME_FIELDS), first_field(item, URL_FIELDS)))
+    volumes = parse_volumes([row[3] for row in rows])
+    return [{**trend_record("twitter", f"{country}/{name}", name.lstrip("#"), rank,
+                            None if np.isnan(volume) else int(volume), url), "region": country}
+            for (country, name, rank, _, url), volume in zip(rows, volumes)]
+
+async def collect_twitter_trends(api_key: str, countries: list, concurrency: int = COUNTRY_CONCURRENCY,
+                                 snapshots: SnapshotStore = None, trend_index: TrendIndex = None) -> dict:
+    """
+    Fetches every country concurrently (at most `concurrency` actor runs at a time) and returns
+    {"records": [...], "countries": {country: count}, "failed": {country: error}}. With a `snapshots` store,
+    each country's list is recorded as a snapshot; with a `trend_index`, the records are added to it.
+    """
+    client = ApifyClientAsync(api_key)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(fetch_country_trends(client, country, semaphore) for country in countries), return_exceptions=True)
+    items_by_country = {}
+    failed = {}
+    for country, result in zip(countries, results):
+        if isinstance(result, Exception):
+            print(f"❌ An error occurred while fetching Twitter trends for '{country}': {result}")
+            failed[country] = str(result)
+        else:
+            items_by_country[country] = result
+    records = twitter_records(items_by_country)
+    counts = {country: sum(1 for record in records if record["region"] == country) for country in items_by_country}
+    if snapshots:
+        for country in items_by_country:
+            items = [(record["text"].lower(), record["rank"], record["volume"]) for record in records if record["region"] == country]
+            await asyncio.to_thread(snapshots.record, "twitter", country, items)
+    if trend_index:
+        trend_index.add(records)
+    print(f"✅ {len(records)} Twitter trends from {len(counts)} of {len(countries)} countries.")
+    return {"records": records, "countries": counts, "failed": failed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect Twitter/X trends for several countries as structured JSON.")
+    parser.add_argument("countries", nargs="*", default=["new-zealand"], help="Country slugs, e.g. new-zealand australia japan")
+    parser.add_argument("--concurrency", type=int, default=COUNTRY_CONCURRENCY)
+    parser.add_argument("--output", help="Write the JSON here instead of stdout.")
+    parser.add_argument("--no-snapshots", action="store_true", help="Do not record the lists in the snapshot store.")
+    args = parser.parse_args()
+    load_dotenv()
+    collected = asyncio.run(collect_twitter_trends(os.getenv("APIFY_KEY"), args.countries, args.concurrency,
+                                                   snapshots=None if args.no_snapshots else SnapshotStore()))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(collected, f, ensure_ascii=False, indent=4)
+        print(f"✅ Saved to {args.output}")
+    else:
+        print(json.dumps(collected, ensure_ascii=False, indent=4))
@@ -0,0 +1,351 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+# Task queue shared by worker processes (see worker.py). A leased task is invisible to other workers until
+# its visibility timeout passes; a worker that crashes stops heartbeating, so its task becomes leasable again.
+VISIBILITY_TIMEOUT = 300
+MAX_TASK_ATTEMPTS = 3
+TASK_KINDS = ["scrape", "transcribe", "analyse"]
+# Pops a ready task and records its lease in one step, so a worker dying in between cannot drop the task.
+# KEYS: ready list, leases sorted set. ARGV: lease deadline, worker id, task key prefix.
+LEASE_SCRIPT = """
+local task_id = redis.call('RPOP', KEYS[1])
+if not task_id then return false end
+redis.call('ZADD', KEYS[2], ARGV[1], task_id)
+redis.call('HINCRBY', ARGV[3] .. task_id, 'attempts', 1)
+redis.call('HSET', ARGV[3] .. task_id, 'status', 'leased', 'worker_id', ARGV[2])
+return task_id
+"""
+# Creates a task unless one with that id already exists, so a re-run parent cannot enqueue a follow-up twice.
+# KEYS: task hash, sweep set, ready list. ARGV: task id, sweep id, kind, payload.
+ENQUEUE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('HSET', KEYS[1], 'sweep_id', ARGV[2], 'kind', ARGV[3], 'payload', ARGV[4], 'status', 'pending', 'attempts', 0)
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('LPUSH', KEYS[3], ARGV[1])
+return 1
+"""
+
+def new_sweep_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+class SQLiteQueue:
+    """
+    Queue backed by one SQLite file. Every worker on the machine (or on a shared volume) opens the same path.
+    """
+
+    def __init__(self, path: str = "trend_queue.db", visibility_timeout: float = VISIBILITY_TIMEOUT,
+                 max_attempts: int = MAX_TASK_ATTEMPTS):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                sweep_id TEXT,
+                kind TEXT,
+                payload TEXT,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                lease_until REAL,
+                worker_id TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (status, kind, lease_until)")
+
+    def enqueue(self, kind: str, payload: dict, sweep_id: str, task_id: str = None) -> str:
+        """
+        Adds a task. With a `task_id`, enqueueing the same id again is a no-op.
+        """
+        task_id = task_id or uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO tasks (id, sweep_id, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                               (task_id, sweep_id, kind, json.dumps(payload), time.time()))
+        return task_id
+
+    def lease(self, worker_id: str, kinds: list = None) -> dict:
+        """
+        Atomically claims the oldest pending task (or one whose lease expired) of the given kinds, or returns None.
+        An expired task that has already been leased `max_attempts` times is parked as 'dead' instead.
+        """
+        kinds = kinds or TASK_KINDS
+        now = time.time()
+        placeholders = ",".join("?" for _ in kinds)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"""UPDATE tasks SET status = 'dead', error = COALESCE(error, 'Lease expired on the last attempt.'),
+                                         lease_until = NULL, worker_id = NULL
+                        WHERE kind IN ({placeholders}) AND status = 'leased' AND lease_until < ? AND attempts >= ?""",
+                    (*kinds, now, self.max_attempts))
+                row = self._conn.execute(
+                    f"""SELECT id, sweep_id, kind, payload, attempts FROM tasks
+                        WHERE kind IN ({placeholders})
+                          AND (status = 'pending' OR (status = 'leased' AND lease_until < ? AND attempts < ?))
+                        ORDER BY created_at LIMIT 1""", (*kinds, now, self.max_attempts)).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute("UPDATE tasks SET status = 'leased', worker_id = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                                   (worker_id, now + self.visibility_timeout, row[0]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"id": row[0], "sweep_id": row[1], "kind": row[2], "payload": json.loads(row[3]), "attempts": row[4] + 1}
+
+    def heartbeat(self, task_id: str, worker_id: str) -> bool:
+        """
+        Extends the lease. Returns False if the lease was lost (expired and taken by another worker).
+        """
+        with self._lock:
+            cursor = self._conn.execute("UPDATE tasks SET lease_until = ? WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                                        (time.time() + self.visibility_timeout, task_id, worker_id))
+        return cursor.rowcount == 1
+
+    def ack(self, task_id: str, worker_id: str, result=None) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("UPDATE tasks SET status = 'done', result = ?, lease_until = NULL WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                                        (json.dumps(result), task_id, worker_id))
+        return cursor.rowcount == 1
+
+    def nack(self, task_id: str, worker_id: str, error: str) -> bool:
+        """
+        Releases a failed task for another attempt, or parks it as 'dead' after `max_attempts`.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                """UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'pending' END,
+                                    error = ?, lease_until = NULL, worker_id = NULL
+                   WHERE id = ? AND worker_id = ? AND status = 'leased'""",
+                (self.max_attempts, error, task_id, worker_id))
+        return cursor.rowcount == 1
+
+    def results(self, sweep_id: str, kind: str = "analyse") -> list:
+        with self._lock:
+            rows = self._conn.execute("SELECT result FROM tasks WHERE sweep_id = ? AND kind = ? AND status = 'done' ORDER BY created_at",
+                                      (sweep_id, kind)).fetchall()
+        return [json.loads(row[0]) for row in rows if row[0] is not None]
+
+    def stats(self, sweep_id: str = None) -> dict:
+        query = "SELECT status, COUNT(*) FROM tasks" + (" WHERE sweep_id = ?" if sweep_id else "") + " GROUP BY status"
+        with self._lock:
+            rows = self._conn.execute(query, (sweep_id,) if sweep_id else ()).fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._conn.close()
+
+class InMemoryRedis:
+    """
+    Local stand-in for the handful of Redis commands RedisQueue uses, so the Redis code path runs without a server.
+    Only shared between threads of one process; use a real Redis (or compatible store) across nodes.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def lpush(self, key, *values):
+        with self._lock:
+            items = self._data.setdefault(key, [])
+            for value in values:
+                items.insert(0, value)
+            return len(items)
+
+    def register_script(self, script):
+        """
+        Only LEASE_SCRIPT and ENQUEUE_SCRIPT are supported; they run under the store lock, which makes them
+        atomic as in Redis.
+        """
+        scripts = {LEASE_SCRIPT: self._lease_script, ENQUEUE_SCRIPT: self._enqueue_script}
+        if script not in scripts:
+            raise NotImplementedError("InMemoryRedis only runs the lease and enqueue scripts.")
+        return scripts[script]
+
+    def _lease_script(self, keys, args):
+        with self._lock:
+            items = self._data.get(keys[0])
+            if not items:
+                return None
+            task_id = items.pop()
+            self._data.setdefault(keys[1], {})[task_id] = float(args[0])
+            fields = self._data.setdefault(f"{args[2]}{task_id}", {})
+            fields["attempts"] = int(fields.get("attempts", 0)) + 1
+            fields.update({"status": "leased", "worker_id": args[1]})
+            return task_id
+
+    def _enqueue_script(self, keys, args):
+        with self._lock:
+            if keys[0] in self._data:
+                return 0
+            self._data[keys[0]] = {"sweep_id": args[1], "kind": args[2], "payload": args[3], "status": "pending", "attempts": 0}
+            self._data.setdefault(keys[1], set()).add(args[0])
+            self._data.setdefault(keys[2], []).insert(0, args[0])
+            return 1
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            fields = self._data.setdefault(key, {})
+            if mapping:
+                fields.update(mapping)
+            if field is not None:
+                fields[field] = value
+            return 1
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._data.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._data.get(key, {}))
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            self._data.setdefault(key, {}).update(mapping)
+            return len(mapping)
+
+    def zrem(self, key, *members):
+        with self._lock:
+            scores = self._data.get(key, {})
+            return sum(1 for member in members if scores.pop(member, None) is not None)
+
+    def zrangebyscore(self, key, min_score, max_score):
+        with self._lock:
+            scores = self._data.get(key, {})
+            return [m for m, s in sorted(scores.items(), key=lambda pair: pair[1]) if min_score <= s <= max_score]
+
+    def zscore(self, key, member):
+        with self._lock:
+            return self._data.get(key, {}).get(member)
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._data.get(key, set()))
+
+class RedisQueue:
+    """
+    Queue on a Redis-compatible store, for workers spread across nodes. Ready tasks sit in one list per kind,
+    leases in a sorted set scored by their deadline. `client` is a redis.Redis (decode_responses=True) or an
+    InMemoryRedis.
+    """
+
+    def __init__(self, client, prefix: str = "trends", visibility_timeout: float = VISIBILITY_TIMEOUT,
+                 max_attempts: int = MAX_TASK_ATTEMPTS):
+        self.client = client
+        self.prefix = prefix
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._lease_script = client.register_script(LEASE_SCRIPT)
+        self._enqueue_script = client.register_script(ENQUEUE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisQueue":
+        import redis
+        return cls(redis.Redis.from_url(url, decode_responses=True), **kwargs)
+
+    def _key(self, *parts) -> str:
+        return ":".join([self.prefix, *parts])
+
+    def enqueue(self, kind: str, payload: dict, sweep_id: str, task_id: str = None) -> str:
+        """
+        Adds a task. With a `task_id`, enqueueing the same id again is a no-op.
+        """
+        task_id = task_id or uuid.uuid4().hex
+        self._enqueue_script(keys=[self._key("task", task_id), self._key("sweep", sweep_id), self._key("ready", kind)],
+                             args=[task_id, sweep_id, kind, json.dumps(payload)])
+        return task_id
+
+    def _requeue_expired(self):
+        now = time.time()
+        for task_id in self.client.zrangebyscore(self._key("leases"), 0, now):
+            # zrem succeeds for exactly one worker, so an expired task is requeued once.
+            if not self.client.zrem(self._key("leases"), task_id):
+                continue
+            task_key = self._key("task", task_id)
+            if int(self.client.hget(task_key, "attempts") or 0) >= self.max_attempts:
+                error = self.client.hget(task_key, "error") or "Lease expired on the last attempt."
+                self.client.hset(task_key, mapping={"status": "dead", "error": error, "worker_id": ""})
+            else:
+                self.client.hset(task_key, mapping={"status": "pending", "worker_id": ""})
+                self.client.lpush(self._key("ready", self.client.hget(task_key, "kind")), task_id)
+
+    def lease(self, worker_id: str, kinds: list = None) -> dict:
+        self._requeue_expired()
+        for kind in kinds or TASK_KINDS:
+            task_id = self._lease_script(keys=[self._key("ready", kind), self._key("leases")],
+                                         args=[time.time() + self.visibility_timeout, worker_id, self._key("task", "")])
+            if task_id is None:
+                continue
+            task = self.client.hgetall(self._key("task", task_id))
+            return {"id": task_id, "sweep_id": task["sweep_id"], "kind": task["kind"],
+                    "payload": json.loads(task["payload"]), "attempts": int(task["attempts"])}
+        return None
+
+    def _owns(self, task_id: str, worker_id: str) -> bool:
+        return (self.client.hget(self._key("task", task_id), "worker_id") == worker_id
+                and self.client.zscore(self._key("leases"), task_id) is not None)
+
+    def heartbeat(self, task_id: str, worker_id: str) -> bool:
+        if not self._owns(task_id, worker_id):
+            return False
+        self.client.zadd(self._key("leases"), {task_id: time.time() + self.visibility_timeout})
+        return True
+
+    def ack(self, task_id: str, worker_id: str, result=None) -> bool:
+        if not self._owns(task_id, worker_id) or not self.client.zrem(self._key("leases"), task_id):
+            return False
+        self.client.hset(self._key("task", task_id), mapping={"status": "done", "result": json.dumps(result)})
+        return True
+
+    def nack(self, task_id: str, worker_id: str, error: str) -> bool:
+        if not self._owns(task_id, worker_id) or not self.client.zrem(self._key("leases"), task_id):
+            return False
+        task_key = self._key("task", task_id)
+        if int(self.client.hget(task_key, "attempts") or 0) >= self.max_attempts:
+            self.client.hset(task_key, mapping={"status": "dead", "error": error, "worker_id": ""})
+        else:
+            self.client.hset(task_key, mapping={"status": "pending", "error": error, "worker_id": ""})
+            self.client.lpush(self._key("ready", self.client.hget(task_key, "kind")), task_id)
+        return True
+
+    def _sweep_tasks(self, sweep_id: str) -> list:
+        return [self.client.hgetall(self._key("task", task_id)) for task_id in self.client.smembers(self._key("sweep", sweep_id))]
+
+    def results(self, sweep_id: str, kind: str = "analyse") -> list:
+        return [json.loads(task["result"]) for task in self._sweep_tasks(sweep_id)
+                if task.get("kind") == kind and task.get("status") == "done" and task.get("result")]
+
+    def stats(self, sweep_id: str = None) -> dict:
+        if sweep_id is None:
+            raise ValueError("RedisQueue.stats needs a sweep_id.")
+        counts = {}
+        for task in self._sweep_tasks(sweep_id):
+            counts[task.get("status")] = counts.get(task.get("status"), 0) + 1
+        return counts
+
+    def close(self):
+        pass
+
+def open_queue(url: str):
+    """
+    Opens a queue from a URL: "sqlite:///path/to/queue.db", "redis://host:6379/0", or "memory://" for the
+    in-process Redis stand-in.
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteQueue(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisQueue.from_url(url)
+    if url.startswith("memory://"):
+        return RedisQueue(InMemoryRedis())
+    raise ValueError(f"Unsupported queue URL: {url}")
@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import uuid
+import google.generativeai as genai
+from dotenv import load_dotenv
+from firecrawl import AsyncFirecrawlApp
+from work_queue import open_queue, new_sweep_id, TASK_KINDS
+from google_analyzer import fetch_google_trends, generate_trend_queries, search_and_scrape_task, analyze_scraped_content
+from youtube_analyzer import fetch_trending_videos, analyze_transcript_with_openai
+from transcripts import resolve_transcript, new_segment_client, new_tier_stats, preferred_languages, ANALYSIS_CHAR_BUDGET, SEGMENT_SECONDS
+from caption_fetcher import CaptionFetcher, proxies_from_env
+from llm_backends import build_analysis_router, error_analysis
+
+# Stateless worker processes that share a sweep through the work queue. Start as many as needed, on as
+# many nodes as share the queue:
+#   python worker.py produce google --geo NZ --time past_24_hours
+#   python worker.py produce youtube --geo NZ --hl en
+#   python worker.py work --kinds scrape,analyse
+#   python worker.py collect <sweep_id>
+DEFAULT_QUEUE_URL = "sqlite:///trend_queue.db"
+
+def produce_google_sweep(queue, searchapi_key: str, geo: str, time: str) -> str:
+    """
+    Enqueues one scrape task per query from `generate_trend_queries`. Returns the sweep id, or None.
+    """
+    trends_data = fetch_google_trends(api_key=searchapi_key, geo=geo, time=time)
+    all_queries = generate_trend_queries(trends_data) if trends_data else []
+    if not all_queries:
+        print("No queries were generated. Nothing to enqueue.")
+        return None
+    sweep_id = new_sweep_id()
+    for query in all_queries:
+        queue.enqueue("scrape", {"query": query}, sweep_id)
+    print(f"📥 Enqueued {len(all_queries)} scrape tasks for sweep {sweep_id}.")
+    return sweep_id
+
+def produce_youtube_sweep(queue, searchapi_key: str, gl: str, hl: str, video_limit: int = 10) -> str:
+    """
+    Enqueues one transcribe task per video on the YouTube trending list. Returns the sweep id, or None.
+    """
+    videos = fetch_trending_videos(searchapi_key, gl, hl, video_limit)
+    if not videos:
+        print("No trending videos found. Nothing to enqueue.")
+        return None
+    sweep_id = new_sweep_id()
+    for video in videos:
+        queue.enqueue("transcribe", {"video": video, "hl": hl}, sweep_id)
+    print(f"📥 Enqueued {len(videos)} transcribe tasks for sweep {sweep_id}.")
+    return sweep_id
+
+class Worker:
+    """
+    Leases tasks of the given kinds, runs up to `concurrency` at a time, heartbeats while a task runs and
+    acks it when done, or nacks it when the handler raises. Scrape and transcribe tasks enqueue a follow-up
+    analyse task with an id derived from their own, so a task that runs twice still has one follow-up.
+    """
+
+    def __init__(self, queue, kinds: list = None, concurrency: int = 10, idle_sleep: float = 2.0, drain: bool = False):
+        self.queue = queue
+        self.kinds = kinds or TASK_KINDS
+        self.concurrency = concurrency
+        self.idle_sleep = idle_sleep
+        self.drain = drain
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.in_flight = 0
+        self.processed = {"acked": 0, "nacked": 0, "lost": 0}
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.handlers = {"scrape": self._handle_scrape, "transcribe": self._handle_transcribe, "analyse": self._handle_analyse}
+
+    async def _enqueue_follow_up(self, task: dict, payload: dict):
+        await asyncio.to_thread(self.queue.enqueue, "analyse", payload, task["sweep_id"], f"{task['id']}:analyse")
+
+    # The pipeline functions log and swallow their own errors, so the handlers raise on a failed result;
+    # otherwise failed work would be acked and never retried or dead-lettered.
+    async def _handle_scrape(self, task: dict) -> dict:
+        result = await search_and_scrape_task(self.firecrawl_app, self.semaphore, task["payload"]["query"])
+        if not result:
+            raise RuntimeError(f"No content scraped for {task['payload']['query']}")
+        await self._enqueue_follow_up(task, {"source": "google", "item": result})
+        return {"scraped": True}
+
+    async def _handle_transcribe(self, task: dict) -> dict:
+        payload = task["payload"]
+        result = await resolve_transcript(payload["video"], self.caption_fetcher, self.semaphore, self.gemini_model,
+                                          self.tier_stats, preferred_languages(payload["hl"]), ANALYSIS_CHAR_BUDGET, SEGMENT_SECONDS,
+                                          segment_client=self.segment_client)
+        # On the last attempt a failed transcript still goes on to title-only analysis, as in the pipeline.
+        if result["status"] != "Success" and task["attempts"] < self.queue.max_attempts:
+            raise RuntimeError(f"Transcript failed: {result.get('error')}")
+        await self._enqueue_follow_up(task, {"source": "youtube", "item": result})
+        return {"status": result["status"]}
+
+    async def _handle_analyse(self, task: dict) -> dict:
+        item = task["payload"]["item"]
+        if task["payload"]["source"] == "google":
+            analysis = await analyze_scraped_content(self.router, self.semaphore, item)
+        else:
+            analysis = await analyze_transcript_with_openai(self.router, self.semaphore, item)
+        if not analysis or analysis == error_analysis():
+            raise RuntimeError("Analysis failed")
+        if task["payload"]["source"] == "google":
+            return {"trend_query": item["trend_query"], "scraped_content": item["scraped_content"], "llm_analysis": analysis}
+        return {**item, "llm_analysis": analysis}
+
+    async def _heartbeat(self, task_id: str):
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            if not await asyncio.to_thread(self.queue.heartbeat, task_id, self.worker_id):
+                print(f"⚠️ Lost the lease on task {task_id}; another worker may pick it up.")
+                return
+
+    async def _process(self, task: dict):
+        print(f"🛠️ [{self.worker_id}] {task['kind']} task {task['id']} (attempt {task['attempts']})")
+        heartbeat = asyncio.create_task(self._heartbeat(task["id"]))
+        try:
+            result = await self.handlers[task["kind"]](task)
+        except Exception as e:
+            print(f"❌ Task {task['id']} ({task['kind']}) failed: {e}")
+            await asyncio.to_thread(self.queue.nack, task["id"], self.worker_id, str(e))
+            self.processed["nacked"] += 1
+        else:
+            if await asyncio.to_thread(self.queue.ack, task["id"], self.worker_id, result):
+                self.processed["acked"] += 1
+            else:
+                print(f"⚠️ Task {task['id']} finished after its lease was lost; result discarded.")
+                self.processed["lost"] += 1
+        finally:
+            heartbeat.cancel()
+
+    async def _slot(self):
+        while True:
+            task = await asyncio.to_thread(self.queue.lease, self.worker_id, self.kinds)
+            if task is None:
+                # A task still running here may enqueue a follow-up, so draining only stops once all slots are idle.
+                if self.drain and self.in_flight == 0:
+                    return
+                await asyncio.sleep(self.idle_sleep)
+                continue
+            self.in_flight += 1
+            try:
+                await self._process(task)
+            finally:
+                self.in_flight -= 1
+
+    async def run(self):
+        load_dotenv()
+        if "scrape" in self.kinds:
+            self.firecrawl_app = AsyncFirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
+        if "analyse" in self.kinds:
+            self.router = build_analysis_router(openai_api_key=os.getenv("OPENAI_API_KEY"), gemini_api_key=os.getenv("GEMINI_API_KEY"))
+        if "transcribe" in self.kinds:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+            self.segment_client = new_segment_client(os.getenv("GEMINI_API_KEY"))
+            self.tier_stats = new_tier_stats()
+            async with CaptionFetcher(proxies=proxies_from_env(os.getenv("YOUTUBE_PROXIES"))) as self.caption_fetcher:
+                await asyncio.gather(*[self._slot() for _ in range(self.concurrency)])
+        else:
+            await asyncio.gather(*[self._slot() for _ in range(self.concurrency)])
+        print(f"✅ Worker {self.worker_id} finished: {self.processed}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed trend-sweep worker.")
+    parser.add_argument("--queue", default=os.getenv("TREND_QUEUE_URL", DEFAULT_QUEUE_URL),
+                        help="sqlite:///path.db or redis://host:port/db (default: TREND_QUEUE_URL or sqlite:///trend_queue.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    produce = commands.add_parser("produce", help="Enqueue a sweep.")
+    produce.add_argument("source", choices=["google", "youtube"])
+    produce.add_argument("--geo", default="NZ", help="Google Trends geo, or YouTube gl.")
+    produce.add_argument("--time", default="past_24_hours")
+    produce.add_argument("--hl", default="en")
+    produce.add_argument("--limit", type=int, default=10, help="YouTube video limit.")
+
+    work = commands.add_parser("work", help="Lease and run tasks.")
+    work.add_argument("--kinds", default=",".join(TASK_KINDS))
+    work.add_argument("--concurrency", type=int, default=10)
+    work.add_argument("--drain", action="store_true", help="Exit once the queue has no more work.")
+
+    collect = commands.add_parser("collect", help="Print the report of a sweep.")
+    collect.add_argument("sweep_id")
+    collect.add_argument("--output", help="Write the report to this JSON file instead of stdout.")
+
+    args = parser.parse_args()
+    load_dotenv()
+    queue = open_queue(args.queue)
+    try:
+        if args.command == "produce":
+            if args.source == "google":
+                produce_google_sweep(queue, os.getenv("SearchAPI_KEY"), args.geo, args.time)
+            else:
+                produce_youtube_sweep(queue, os.getenv("SearchAPI_KEY"), args.geo, args.hl, args.limit)
+        elif args.command == "work":
+            asyncio.run(Worker(queue, args.kinds.split(","), args.concurrency, drain=args.drain).run())
+        else:
+            report = {"sweep_id": args.sweep_id, "tasks": queue.stats(args.sweep_id), "final_report": queue.results(args.sweep_id)}
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    json.dump(report, f, indent=4, ensure_ascii=False)
+                print(f"✅ Wrote {len(report['final_report'])} items to {args.output}")
+            else:
+                print(json.dumps(report, indent=4, ensure_ascii=False))
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,56 @@
 import asyncio
 import json
-import re
 import requests
-from openai import AsyncOpenAI
 import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
 import os
+from transcripts import resolve_transcript, new_segment_client, new_tier_stats, summarize_tier_stats, preferred_languages, extract_video_id, parse_duration, ANALYSIS_CHAR_BUDGET, SEGMENT_SECONDS
+from caption_fetcher import CaptionFetcher
+from resilience import call_with_retries, call_with_retries_sync, start_run_budget, CircuitOpenError
+from llm_backends import AnalysisRouter, build_analysis_router, error_analysis, skipped_analysis, normalize_analysis
+from budget import BudgetManager, estimate_video_transcription
+from trend_index import records_from_youtube
+from snapshot_store import snapshot_items_from_youtube
+from trend_velocity import trend_momentum, rising_topics, momentum_boost
+from cpu_pool import monitor_loop_lag
+from compression import compress_many, print_compression_summary, COMPRESS_TARGET_CHARS
+from map_reduce import map_reduce_analysis, map_reduce_options, needs_map_reduce, MAP_REDUCE_THRESHOLD, CHUNK_CHARS, MAX_FAN_OUT
+from scheduler import DeadlineScheduler, JobFailed, succeeded, position_priority
+from pipeline_report import RunOptions, empty_report, finalize_report
 os.environ['GRPC_VERBOSITY'] = 'ERROR'
+FUSED_ANALYSIS_CHARS = 2000 # Expected size of a fused analysis response without a transcript, for budget estimates
 
-def extract_video_id(url):
-    patterns = [
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([^&]+)',
-        r'(?:https?://)?youtu\.be/([^?&]+)',
-        r'(?:https?://)?(?:www\.)?youtube\.com/embed/([^?&]+)'
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    raise ValueError(f"Invalid or unsupported YouTube URL format: {url}")
-
-async def fetch_transcript_with_gemini(video_data: dict, semaphore: asyncio.Semaphore, model) -> dict:
-    """
-    Fetches a video transcript using the Gemini model with error handling and retries.
-    """
-    async with semaphore:
-        url = video_data['link']
-        title = video_data['title']
-        print(f"📄 Retriving context with Gemini for: \"{title}\"")
-        
-        max_retries = 3
-        base_delay = 5
-
-        for attempt in range(max_retries):
-            try:
-                response = await model.generate_content_async(
-                    ["Provide a full and accurate transcript of the audio in this video.", url],
-                    request_options={"timeout": 600}
-                )
-                transcript_text = response.text.replace('\n', ' ')
-                video_id = extract_video_id(url)
-                return {"title": title, "video_url": url, "video_id": video_id, "status": "Success", "transcript": transcript_text}
-            except google_exceptions.ResourceExhausted:
-                if attempt < max_retries - 1:
-                    wait_time = base_delay * (2 ** attempt)
-                    print(f"Rate limit hit for \"{title}\". Retrying in {wait_time}s... (Attempt {attempt + 2}/{max_retries})")
-                    await asyncio.sleep(wait_time)
-                else:
-                    continue # Final attempt failed, loop will exit
-            except Exception as e:
-                # Handle other unexpected errors
-                print(f"❌ An unexpected error occurred for \"{title}\": {e}")
-                try:
-                    video_id = extract_video_id(url)
-                except ValueError:
-                    video_id = "unknown"
-                return {"title": title, "video_url": url, "video_id": video_id, "status": "Failed", "error": str(e)}
-
-        # This block is reached if all retries fail due to rate limiting
-        print(f"❌ All retry attempts failed for \"{title}\" due to persistent rate limiting.")
-        try:
-            video_id = extract_video_id(url)
-        except ValueError:
-            video_id = "unknown"
-        return {"title": title, "video_url": url, "video_id": video_id, "status": "Failed", "error": "All retry attempts failed due to rate limiting."}
-
-
-async def analyze_transcript_with_openai(client: AsyncOpenAI, semaphore: asyncio.Semaphore, transcript_data: dict) -> dict:
+async def analyze_transcript_with_openai(router: AnalysisRouter, semaphore: asyncio.Semaphore, transcript_data: dict, map_reduce: dict = None,
+                                         budget: BudgetManager = None) -> dict:
     """
-    Analyzes a transcript with OpenAI, with a fallback to title-only analysis.
+    Analyzes a transcript through the analysis router (OpenAI first), with a fallback to title-only analysis.
+    Transcripts longer than the map-reduce threshold are analyzed in full when `map_reduce` options are given.
+    With a `budget`, the transcript is shortened, dropped for title-only analysis, or the video is skipped
+    as the budget runs low.
     """
     async with semaphore:
         trend_title = transcript_data['title']
-        if transcript_data.get("status") == "Success" and transcript_data.get("transcript"):
+        transcript_text = transcript_data.get('analysis_content', transcript_data.get('transcript'))
+        has_transcript = transcript_data.get("status") == "Success" and bool(transcript_text)
+        step = "full"
+        if budget:
+            step, max_chars = budget.plan_analysis("transcript" if has_transcript else "title_only",
+                                                   len(transcript_text) if has_transcript and map_reduce else min(len(transcript_text or ""), ANALYSIS_CHAR_BUDGET))
+            if step == "skip":
+                print(f"💸 Budget exhausted; skipping analysis of \"{trend_title}\"")
+                return skipped_analysis()
+            if has_transcript and step != "title_only":
+                transcript_text = transcript_text[:max_chars]
+        if has_transcript and step != "title_only":
+            item_kind = "transcript"
             print(f"🧠 Analyzing TRANSCRIPT for: \"{trend_title}\"")
             prompt = (f"Please analyze the following transcript for the video titled '{trend_title}'. "
                       "Provide a one-sentence, instantly understandable context summary. "
                       "Then, provide a more detailed summary as 5 distinct bullet points. "
                       "Finally, classify the topic into a single category.\n\n"
-                      f"Content:\n{transcript_data['transcript'][:15000]}")
+                      f"Content:\n{transcript_text[:ANALYSIS_CHAR_BUDGET]}")
         else:
-            print(f"🧠 Analyzing TITLE ONLY for: \"{trend_title}\" (transcript failed)")
+            item_kind = "title_only"
+            print(f"🧠 Analyzing TITLE ONLY for: \"{trend_title}\" ({'budget low' if has_transcript else 'transcript failed'})")
             prompt = (f"A transcript for the video titled '{trend_title}' is not available. "
                       "Based SOLELY on this title, please perform a trend analysis. "
                       "Infer the likely topic and provide a one-sentence context summary. "
@@ -95,33 +65,104 @@ async def analyze_transcript_with_openai(client: AsyncOpenAI, semaphore: asyncio
                          "required": ["context", "summary", "category"]}
         }
         try:
-            response = await client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": prompt}], functions=[function_definition], function_call={"name": "format_trend_analysis"})
-            return json.loads(response.choices[0].message.function_call.arguments)
+            if item_kind == "transcript" and step == "full" and needs_map_reduce(transcript_text, map_reduce):
+                return await map_reduce_analysis(router, function_definition, f"the video titled '{trend_title}'",
+                                                 transcript_text, map_reduce)
+            return await router.analyze(prompt, function_definition, item_kind)
         except Exception as e:
-            print(f"❌ Error analyzing \"{trend_title}\" with OpenAI: {e}")
-            return {"context": "Error during analysis.", "summary": ["Could not generate summary points."], "category": "Error"}
+            print(f"❌ Error analyzing \"{trend_title}\": {e}")
+            return error_analysis()
 
-async def run_youtube_analysis_pipeline(searchapi_key: str, openai_api_key: str, gemini_api_key: str, gl: str, hl: str, video_limit: int = 10):
+def failed_video_item(title: str, url: str, priority: float, error: Exception) -> dict:
     """
-    Runs the full YouTube trend analysis pipeline.
+    Report entry for a video whose transcription or analysis raised, in the shape of an analyzed video.
+    """
+    try:
+        video_id = extract_video_id(url)
+    except (ValueError, TypeError):
+        video_id = "unknown"
+    return {"title": title, "video_url": url, "video_id": video_id, "status": "Failed", "error": str(error),
+            "llm_analysis": error_analysis(), "priority": round(priority, 3)}
+
+def fused_analysis_schema(include_transcript: bool) -> dict:
+    """
+    Gemini response schema mirroring the `format_trend_analysis` function, optionally with the transcript.
+    """
+    properties = {
+        "context": {"type": "STRING", "description": "A single, concise sentence that summarizes the core event."},
+        "summary": {"type": "ARRAY", "description": "A list of up to 5 brief, easy-to-understand bullet points summarizing the topic.", "items": {"type": "STRING"}},
+        "category": {"type": "STRING", "description": "A single category for the news topic."}
+    }
+    if include_transcript:
+        properties["transcript"] = {"type": "STRING", "description": "A transcript of the audio in the video."}
+    return {"type": "OBJECT", "properties": properties, "required": ["context", "summary", "category"]}
+
+async def analyze_video_with_gemini(video_data: dict, semaphore: asyncio.Semaphore, model, include_transcript: bool = False,
+                                    budget: BudgetManager = None) -> dict:
+    """
+    Single-hop analysis: Gemini watches the video and returns the `format_trend_analysis` structure directly.
+    The result has the same shape as a transcript result combined with its `llm_analysis`.
+    With a `budget`, the video is only analyzed if its estimated cost fits, and is charged by estimate.
+    """
+    async with semaphore:
+        url = video_data['link']
+        title = video_data['title']
+        try:
+            video_id = extract_video_id(url)
+        except ValueError:
+            video_id = "unknown"
+        print(f"🎬 Analyzing VIDEO with Gemini for: \"{title}\"")
+        prompt = (f"Please analyze the video titled '{title}'. "
+                  "Provide a one-sentence, instantly understandable context summary. "
+                  "Then, provide a more detailed summary as 5 distinct bullet points. "
+                  "Finally, classify the topic into a single category.")
+        if include_transcript:
+            prompt += " Also include a transcript of the audio."
+        if budget:
+            estimate = estimate_video_transcription(parse_duration(video_data.get('length')),
+                                                    ANALYSIS_CHAR_BUDGET if include_transcript else FUSED_ANALYSIS_CHARS)
+            if not budget.can_afford(estimate):
+                print(f"💸 Budget too low for Gemini video analysis of \"{title}\"")
+                return {"title": title, "video_url": url, "video_id": video_id, "status": "Failed",
+                        "error": "Analysis skipped: budget exhausted.", "llm_analysis": skipped_analysis()}
+            budget.record("gemini_video_analysis", input_tokens=estimate["tokens"], cost_usd=estimate["cost_usd"])
+        try:
+            response = await call_with_retries(
+                "gemini", model.generate_content_async,
+                [prompt, url],
+                generation_config={"response_mime_type": "application/json", "response_schema": fused_analysis_schema(include_transcript)},
+                request_options={"timeout": 600},
+                base_delay=5
+            )
+            analysis = json.loads(response.text)
+            if not isinstance(analysis, dict):
+                raise ValueError(f"Expected a JSON object, got {type(analysis).__name__}")
+        except Exception as e:
+            print(f"❌ Error analyzing \"{title}\" with Gemini: {e}")
+            return {"title": title, "video_url": url, "video_id": video_id, "status": "Failed", "error": str(e), "llm_analysis": error_analysis()}
+
+        result = {"title": title, "video_url": url, "video_id": video_id, "status": "Success"}
+        transcript_text = analysis.pop("transcript", None)
+        if isinstance(transcript_text, str) and transcript_text:
+            result["transcript"] = transcript_text.replace('\n', ' ')
+        result["llm_analysis"] = normalize_analysis(analysis)
+        return result
+
+def fetch_trending_videos(searchapi_key: str, gl: str, hl: str, video_limit: int = 10) -> list:
+    """
+    Fetches the YouTube trending list from SearchAPI.io as [{'link', 'title', 'length'}].
+    Returns None when the request fails and an empty list when there is nothing to process.
     """
-    if not gemini_api_key:
-        print("Error: GEMINI_API_KEY is required for the YouTube analysis pipeline.")
-        return None
-        
-    # Configure the Gemini client
-    genai.configure(api_key=gemini_api_key)
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-    
-    # Fetch trending videos from SearchAPI.io
     api_url = "https://www.searchapi.io/api/v1/search"
     params = {"engine": "youtube_trends", "gl": gl, "hl": hl, "api_key": searchapi_key}
     print("Fetching YouTube trends from SearchAPI.io...")
-    try:
-        response = requests.get(api_url, params=params)
+    def fetch_trending():
+        response = requests.get(api_url, params=params, timeout=60)
         response.raise_for_status()
-        data = response.json()
-    except requests.exceptions.RequestException as e:
+        return response.json()
+    try:
+        data = call_with_retries_sync("searchapi", fetch_trending)
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
         print(f"An error occurred during the API request: {e}")
         return None
 
@@ -129,7 +170,7 @@ async def run_youtube_analysis_pipeline(searchapi_key: str, openai_api_key: str,
         print("Warning: 'trending' key not found in the API response.")
         return []
     
-    videos_to_process = [{'link': v.get('link'), 'title': v.get('title')} for v in data['trending'] if v.get('link') and v.get('title')]
+    videos_to_process = [{'link': v.get('link'), 'title': v.get('title'), 'length': v.get('length')} for v in data['trending'] if v.get('link') and v.get('title')]
     
     if video_limit is not None and video_limit > 0:
         print(f"Limiting to the top {video_limit} trending videos.")
@@ -137,29 +178,137 @@ async def run_youtube_analysis_pipeline(searchapi_key: str, openai_api_key: str,
 
     if not videos_to_process:
         print("No videos with both a link and title were found.")
-        return []
+    return videos_to_process
+
+@monitor_loop_lag
+async def run_youtube_analysis_pipeline(searchapi_key: str, openai_api_key: str, gemini_api_key: str, gl: str, hl: str, video_limit: int = 10,
+                                        stream_transcripts: bool = True, analysis_mode: str = "two_hop",
+                                        include_transcript: bool = False, segment_seconds: int = SEGMENT_SECONDS,
+                                        caption_proxies: list = None, map_reduce: bool = False,
+                                        map_reduce_threshold: int = MAP_REDUCE_THRESHOLD, chunk_chars: int = CHUNK_CHARS,
+                                        fan_out: int = MAX_FAN_OUT, compress: bool = False,
+                                        compress_target_chars: int = COMPRESS_TARGET_CHARS, options: RunOptions = None):
+    """
+    Runs the full YouTube trend analysis pipeline.
+    With `stream_transcripts`, Gemini transcription stops once the analysis character budget is reached.
+    With `analysis_mode="fused"`, Gemini analyzes each video in one call instead of transcript then OpenAI.
+    Videos longer than `segment_seconds` are transcribed in parallel segments (set to None to disable).
+    Caption requests rotate through `caption_proxies` when given.
+    With `map_reduce`, transcripts longer than `map_reduce_threshold` are analyzed in full by map-reduce,
+    so Gemini transcripts are no longer cut at the single-prompt budget.
+    With `compress`, transcripts are extractively compressed to `compress_target_chars` before analysis.
+    Videos are processed in trending-list order.
+    `options` (RunOptions) carries the deadline, budget, trend index, history and snapshot stores and progress
+    callback; the budget covers Gemini transcription and analysis.
+    Returns {"final_report": [...], "transcript_stats": {...}, "partial": bool, "schedule": {...}}; when
+    nothing could be fetched the report is empty and "error" says why.
+    """
+    options = options or RunOptions()
+    budget, trend_index, snapshots, progress = options.budget, options.trend_index, options.snapshots, options.progress
+    scheduler = DeadlineScheduler(options.deadline_seconds)
+    if not gemini_api_key:
+        return empty_report(scheduler, "GEMINI_API_KEY is required for the YouTube analysis pipeline.")
+        
+    start_run_budget()
+
+    # Configure the Gemini client
+    genai.configure(api_key=gemini_api_key)
+    gemini_model = genai.GenerativeModel('gemini-1.5-flash')
     
-    # Fetch transcripts using Gemini
+    videos_to_process = await asyncio.to_thread(fetch_trending_videos, searchapi_key, gl, hl, video_limit)
+    if videos_to_process is None:
+        return empty_report(scheduler, "Could not fetch the YouTube trending list.")
+    if not videos_to_process:
+        return empty_report(scheduler, "No trending videos to process.")
+    progress("videos", {"count": len(videos_to_process)})
+    priorities = [position_priority(position) for position in range(len(videos_to_process))]
+    if trend_index:
+        trend_index.add(records_from_youtube(videos_to_process))
+        priorities = [priority * trend_index.priority_boost(f"youtube:{video['link']}")
+                      for video, priority in zip(videos_to_process, priorities)]
+    rising = None
+    if snapshots:
+        region = f"{gl}/{hl}"
+        await asyncio.to_thread(snapshots.record, "youtube", region, snapshot_items_from_youtube(videos_to_process))
+        momentum = await asyncio.to_thread(trend_momentum, snapshots, "youtube", region)
+        priorities = [priority * momentum_boost(momentum, video["link"]) for video, priority in zip(videos_to_process, priorities)]
+        titles = {video["link"]: video["title"] for video in videos_to_process}
+        rising = [{**item, "title": titles.get(item["topic"])} for item in rising_topics(momentum)]
+        print(f"📈 {len(rising)} of {len(momentum)} trending videos rising fast.")
+
+    if analysis_mode == "fused":
+        video_semaphore = asyncio.Semaphore(10)
+        video_jobs = [(priority, lambda video=video: analyze_video_with_gemini(video, video_semaphore, gemini_model, include_transcript, budget))
+                      for video, priority in zip(videos_to_process, priorities)]
+        fused_results = await scheduler.run("fused_analysis", video_jobs, concurrency=10)
+        final_report_data = [failed_video_item(video["title"], video["link"], priority, item.error) if isinstance(item, JobFailed) else item
+                             for video, priority, item in zip(videos_to_process, priorities, fused_results) if item]
+        progress("analysed", {"count": sum(1 for item in fused_results if succeeded(item))})
+        return await finalize_report("youtube", scheduler, options, final_report_data, {"geo": gl, "video_limit": video_limit},
+                                     {"gl": gl, "hl": hl, "mode": analysis_mode}, len(videos_to_process),
+                                     [item.get("transcript") for item in final_report_data], rising=rising)
+
+    # Fetch transcripts: YouTube captions first, Gemini only for videos without captions
     transcript_semaphore = asyncio.Semaphore(10)
-    transcript_tasks = [
-        fetch_transcript_with_gemini(video, transcript_semaphore, gemini_model)
-        for video in videos_to_process
-    ]
-    transcript_results = await asyncio.gather(*transcript_tasks)
+    tier_stats = new_tier_stats()
+    languages = preferred_languages(hl)
+    gemini_max_chars = ANALYSIS_CHAR_BUDGET if stream_transcripts and not map_reduce else None
+    segment_client = new_segment_client(gemini_api_key) if segment_seconds else None
+    async with CaptionFetcher(proxies=caption_proxies) as caption_fetcher:
+        # All start at once (captions are cheap); Gemini fallbacks queue on the semaphore in priority order.
+        transcript_jobs = [
+            (priority, lambda video=video: resolve_transcript(video, caption_fetcher, transcript_semaphore, gemini_model, tier_stats,
+                                                              languages, gemini_max_chars, segment_seconds, budget, segment_client))
+            for video, priority in zip(videos_to_process, priorities)
+        ]
+        transcript_results = await scheduler.run("transcripts", transcript_jobs)
+    failed_items = [] # Videos whose transcription or analysis raised, reported as errors
+    for i, (video, result, priority) in enumerate(zip(videos_to_process, transcript_results, priorities)):
+        if isinstance(result, JobFailed):
+            failed_items.append(failed_video_item(video["title"], video["link"], priority, result.error))
+            transcript_results[i] = None
+        elif result:
+            result["priority"] = round(priority, 3)
+    transcript_results = [result for result in transcript_results if result] # Drop videos cut off by the deadline
+    print("\n📊 Transcript sources:")
+    transcript_stats = summarize_tier_stats(tier_stats)
+    progress("transcribed", {"count": len(transcript_results), "sources": transcript_stats})
         
-    # Analyze transcripts (or titles) with OpenAI
-    print(f"\n✅ Transcripts fetched. Now analyzing {len(transcript_results)} items with OpenAI...")
-    client = AsyncOpenAI(api_key=openai_api_key)
+    if compress:
+        to_compress = [r for r in transcript_results if r.get("status") == "Success" and r.get("transcript")]
+        originals = [r["transcript"] for r in to_compress]
+        compressed = await compress_many(originals, compress_target_chars)
+        for result, (text, ratio) in zip(to_compress, compressed):
+            result["analysis_content"] = text
+            result["compression_ratio"] = round(ratio, 3)
+        print_compression_summary(compressed, [len(text) for text in originals])
+
+    # Analyze transcripts (or titles), routed across OpenAI, Gemini and a local server with failover
+    print(f"\n✅ Transcripts fetched. Now analyzing {len(transcript_results)} items...")
+    router = build_analysis_router(openai_api_key=openai_api_key, gemini_api_key=gemini_api_key, budget=budget)
     analysis_semaphore = asyncio.Semaphore(10)
-    analysis_tasks = [analyze_transcript_with_openai(client, analysis_semaphore, result) for result in transcript_results]
-    llm_analyses = await asyncio.gather(*analysis_tasks)
+    mr_options = map_reduce_options(map_reduce_threshold, chunk_chars, fan_out) if map_reduce else None
+    analysis_jobs = [(result["priority"], lambda result=result: analyze_transcript_with_openai(router, analysis_semaphore, result, mr_options, budget))
+                     for result in transcript_results]
+    llm_analyses = await scheduler.run("analysis", analysis_jobs, concurrency=10)
+    progress("analysed", {"count": sum(1 for analysis in llm_analyses if succeeded(analysis))})
     
     # Combine results into the final report
     final_report_data = []
     for i, original_result in enumerate(transcript_results):
+        if llm_analyses[i] is None: # Not analyzed before the deadline
+            continue
         combined_item = original_result.copy()
-        combined_item["llm_analysis"] = llm_analyses[i]
+        combined_item.pop("analysis_content", None)
+        if isinstance(llm_analyses[i], JobFailed):
+            combined_item["llm_analysis"] = error_analysis()
+            combined_item["error"] = str(llm_analyses[i].error)
+        else:
+            combined_item["llm_analysis"] = llm_analyses[i]
         final_report_data.append(combined_item)
-        
-    print(f"✅ YouTube analysis pipeline complete. Returning {len(final_report_data)} items.")
-    return {"final_report": final_report_data}
\ No newline at end of file
+    final_report_data.extend(failed_items)
+
+    return await finalize_report("youtube", scheduler, options, final_report_data, {"geo": gl, "video_limit": video_limit},
+                                 {"gl": gl, "hl": hl, "mode": analysis_mode}, len(videos_to_process),
+                                 [result.get("transcript") for result in transcript_results], router=router,
+                                 transcript_stats=transcript_stats, rising=rising)
\ No newline at end of file
@@ -1,6 +1,8 @@
 import os
 import requests
 import json
+import tempfile
+import yt_dlp
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -11,17 +13,21 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 API_URL = "https://api.openai.com/v1/audio/transcriptions"  # Change if your endpoint is different
 
 def transcribe_tiktok(tiktok_url):
-    payload = {
-        "model": "gpt-4o-mini-transcribe",
-        "response_format": "json",
-        "task": "transcription",
-        "tiktokUrl": tiktok_url
-    }
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {API_KEY}"
-    }
-    response = requests.post(API_URL, headers=headers, json=payload)
+    # The audio endpoint takes an uploaded file, not a TikTok URL: download the audio first.
+    # For the trending list in batch, use run_tiktok_analysis_pipeline in Streamlit/tiktok_analyzer.py.
+    with tempfile.TemporaryDirectory() as workdir:
+        options = {"format": "bestaudio/best", "outtmpl": os.path.join(workdir, "%(id)s.%(ext)s"), "quiet": True}
+        with yt_dlp.YoutubeDL(options) as ydl:
+            audio_path = ydl.prepare_filename(ydl.extract_info(tiktok_url, download=True))
+        payload = {
+            "model": "gpt-4o-mini-transcribe",
+            "response_format": "json"
+        }
+        headers = {
+            "Authorization": f"Bearer {API_KEY}"
+        }
+        with open(audio_path, "rb") as audio:
+            response = requests.post(API_URL, headers=headers, data=payload, files={"file": audio}, timeout=300)
     if response.status_code == 200:
         print("Transcription Result:")
         print(json.dumps(response.json(), indent=2, ensure_ascii=False))
@@ -1,39 +1,43 @@
 import os
 import json
+import argparse
 from apify_client import ApifyClient
 from dotenv import load_dotenv
 
+# For many countries at once, with parsed volumes and snapshot history, use Streamlit/twitter_trends.py.
+
+def get_twitter_trends(client: ApifyClient, country: str) -> list:
+    print(f"Starting the Twitter Trends scraper for '{country}'...")
+    actor_run = client.actor("fastcrawler/x-twitter-trends-scraper-2025").call(run_input={"country": country})
+    print("Scraping finished. Fetching results...")
+    return list(client.dataset(actor_run["defaultDatasetId"]).iterate_items())
+
 def main():
+    parser = argparse.ArgumentParser(description="Fetch Twitter/X trends as JSON.")
+    parser.add_argument("countries", nargs="*", default=["new-zealand"])
+    parser.add_argument("--output", default="twitter_trends.json")
+    args = parser.parse_args()
+
     load_dotenv()
     apify_api_key = os.getenv("APIFY_KEY")
+    if not apify_api_key:
+        print("Error: APIFY_KEY environment variable not found.")
+        return
 
     client = ApifyClient(apify_api_key)
-
-    run_input = {
-      "country": "new-zealand"
-    }
-
-    try:
-        print("Starting the Twitter Trends scraper...")
-        actor_run = client.actor("fastcrawler/x-twitter-trends-scraper-2025").call(run_input=run_input)
-
-        print("Scraping finished. Fetching results...")
-        dataset_items = client.dataset(actor_run["defaultDatasetId"]).list_items().items
-        
-        if not dataset_items:
-            print("No results found.")
-        else:
-            print("\n--- Scraped Data ---")
-            for item in dataset_items:
-                print(json.dumps(item, indent=4))
-            print("--------------------\n")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    results = {}
+    for country in args.countries:
+        try:
+            results[country] = get_twitter_trends(client, country)
+        except Exception as e:
+            print(f"An error occurred for '{country}': {e}")
+
+    if not any(results.values()):
+        print("No results found.")
+        return
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+    print(f"✅ Saved {sum(len(items) for items in results.values())} trends for {len(results)} countries to {args.output}")
 
 if __name__ == "__main__":
     main()
-
-
-
-
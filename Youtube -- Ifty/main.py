@@ -5,6 +5,7 @@ import json
 import re
 import asyncio
 from openai import AsyncOpenAI
+from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled, CouldNotRetrieveTranscript
 import google.generativeai as genai
 from google.api_core import exceptions as google_exceptions
 
@@ -26,6 +27,42 @@ def extract_video_id(url):
             return match.group(1)
     raise ValueError(f"Invalid or unsupported YouTube URL format: {url}")
 
+def fetch_captions(video_id, languages=('en',)):
+    # Manually created captions first, then auto-generated ones. Returns (tier, text) or (None, None).
+    # Uses the youtube-transcript-api 1.x instance API (list() and snippet objects).
+    try:
+        transcript_list = YouTubeTranscriptApi().list(video_id)
+    except TranscriptsDisabled:
+        return None, None
+    for tier, finder in [("manual_captions", transcript_list.find_manually_created_transcript),
+                         ("auto_captions", transcript_list.find_generated_transcript)]:
+        try:
+            entries = finder(languages).fetch()
+        except NoTranscriptFound:
+            continue
+        transcript_text = " ".join(snippet.text for snippet in entries).replace('\n', ' ')
+        if transcript_text.strip():
+            return tier, transcript_text
+    return None, None
+
+async def fetch_transcript_tiered(video_data: dict, semaphore: asyncio.Semaphore, model, tier_stats: dict) -> dict:
+    url = video_data['link']
+    title = video_data['title']
+    try:
+        video_id = extract_video_id(url)
+        tier, transcript_text = await asyncio.to_thread(fetch_captions, video_id)
+    except (ValueError, CouldNotRetrieveTranscript, requests.exceptions.RequestException) as e:
+        print(f"⚠️ Caption lookup failed for \"{title}\": {e}")
+        tier, transcript_text = None, None
+
+    if tier:
+        tier_stats[tier] += 1
+        return {"title": title, "video_url": url, "video_id": video_id, "status": "Success", "transcript": transcript_text}
+
+    result = await fetch_transcript_with_gemini(video_data, semaphore, model)
+    tier_stats["gemini" if result.get("status") == "Success" else "none"] += 1
+    return result
+
 async def fetch_transcript_with_gemini(video_data: dict, semaphore: asyncio.Semaphore, model) -> dict:
     async with semaphore:
         url = video_data['link']
@@ -151,12 +188,17 @@ async def main():
             return
 
         transcript_semaphore = asyncio.Semaphore(10)
+        tier_stats = {"manual_captions": 0, "auto_captions": 0, "gemini": 0, "none": 0}
         transcript_tasks = [
-            fetch_transcript_with_gemini(video, transcript_semaphore, gemini_model)
+            fetch_transcript_tiered(video, transcript_semaphore, gemini_model, tier_stats)
             for video in videos_to_process
         ]
         transcript_results = await asyncio.gather(*transcript_tasks)
 
+        print("\n📊 Transcript sources:")
+        for tier, count in tier_stats.items():
+            print(f"   {tier:<16} {count:>4} ({count / len(transcript_results):.0%})")
+
         print(f"\n✅ Transcripts fetched. Now analyzing {len(transcript_results)} items with OpenAI...")
         client = AsyncOpenAI(api_key=openai_api_key)
         analysis_semaphore = asyncio.Semaphore(10)